@@ -0,0 +1,111 @@
+# benchmarks/bench_frames.py — Per-frame allocation churn: pooled Frames vs the old copy-per-consumer path
+"""
+Usage:
+    python benchmarks/bench_frames.py [--n 60] [--size 1920x1080]
+
+For each capture source, one "frame" is what the GUI refresh plus the agent
+step consume: the GUI needs RGB888 bytes for a QImage, the agent a PIL image.
+
+  vnc  legacy  snapshot_rgb() copy -> Image.fromarray -> .convert("RGB") twice -> tobytes()
+  vnc  frame   FramePool buffer filled in place; GUI reads frame.array, agent frame.image
+  http legacy  PNG decode -> .convert("RGB") x3 -> tobytes()
+  http frame   PNG decode (kept, already RGB); GUI reads frame.array, agent frame.image
+
+tracemalloc sees NumPy buffers and Python bytes, not PIL's internal pixel
+storage, so "peak/frame" understates the legacy path (its PIL conversions are
+invisible here). Figures are also given in units of one W*H*3 frame.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image
+
+from src.frame import Frame, FramePool
+from src.rfb import RFBClient
+from src.sandbox import _decode_screenshot
+
+
+def _fake_vnc(w: int, h: int) -> RFBClient:
+    """An RFBClient whose framebuffer is filled locally (no server needed)."""
+    client = RFBClient("127.0.0.1", 0)
+    client.width, client.height = w, h
+    client._fb = np.random.default_rng(0).integers(0, 255, (h, w, 4), dtype=np.uint8)
+    client._first_frame.set()
+    return client
+
+
+def _measure(step, n: int):
+    step()  # warm up (pool buffers, imports)
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    peaks = []
+    t0 = time.perf_counter()
+    for _ in range(n):
+        tracemalloc.reset_peak()
+        step()
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.stop()
+    return sum(peaks) / n, elapsed / n
+
+
+def _report(name: str, peak: float, per_frame: float, frame_bytes: int) -> None:
+    print(f"{name:<12} peak traced/frame={peak / 2**20:8.2f} MiB ({peak / frame_bytes:4.1f} frames)  "
+          f"time/frame={per_frame * 1000:7.2f} ms")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=60)
+    ap.add_argument("--size", default="1920x1080")
+    args = ap.parse_args()
+    w, h = (int(v) for v in args.size.lower().split("x"))
+
+    client = _fake_vnc(w, h)
+    pool = FramePool()
+
+    def vnc_legacy():
+        img = Image.fromarray(client.snapshot_rgb(), "RGB")
+        agent = img.convert("RGB")
+        gui = img.convert("RGB").tobytes("raw", "RGB")
+        return agent, gui
+
+    def vnc_frame():
+        frame = Frame(array=client.snapshot_rgb(out=pool.acquire(w, h)))
+        gui = np.ascontiguousarray(frame.array).data
+        return frame.image, gui
+
+    png = BytesIO()
+    Image.fromarray(client.snapshot_rgb()).save(png, format="PNG", compress_level=1)
+    res = {"success": True, "image_bytes": png.getvalue()}
+
+    def http_legacy():
+        img = Image.open(BytesIO(res["image_bytes"])).convert("RGB")
+        agent = img.convert("RGB")
+        gui = img.convert("RGB").tobytes("raw", "RGB")
+        return agent, gui
+
+    def http_frame():
+        frame = Frame(image=_decode_screenshot(res))
+        gui = np.ascontiguousarray(frame.array).data
+        return frame.image, gui
+
+    print(f"{args.n} frames at {w}x{h} (GUI refresh + agent step per frame)")
+    for name, step in (("vnc legacy", vnc_legacy), ("vnc frame", vnc_frame),
+                       ("http legacy", http_legacy), ("http frame", http_frame)):
+        _report(name, *_measure(step, args.n), w * h * 3)
+    print(f"pool allocations: {pool.allocations} (buffers reused across frames)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/bench_grounding.py — Click accuracy on a replay corpus: coarse vs coarse-to-fine (zoom) grounding
+"""
+Usage:
+    python benchmarks/bench_grounding.py --corpus DIR [--always]
+
+DIR holds full-resolution screenshots and a labels.json (same format as
+bench_vlm_encoding.py):
+
+    [{"image": "tray.png", "objective": "Open the network menu", "box": [x0, y0, x1, y1]}, ...]
+
+(box in normalized 0..1 screen coordinates). For every labelled shot the
+executor model proposes a click on the MAX_DIM screenshot (exactly as the agent
+does); the zoom pass then re-asks on a ZOOM_REGION_PX full-resolution crop,
+either only when needs_zoom() says so (default) or for every click (--always).
+A miss is a click outside the labelled box, i.e. a wasted step in a live run.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image
+
+from src.config import cfg
+from src.frame import Frame
+from src.grounding import needs_zoom, refine_click
+from src.sandbox import _downscale
+from src.vision import vlm_frame
+
+
+class _ReplaySandbox:
+    """Just enough of Sandbox for refine_click: geometry and region screenshots of a still image."""
+
+    def __init__(self, img: Image.Image):
+        self.img = img
+
+    def get_screen_size(self):
+        return self.img.size
+
+    def screenshot(self, region=None, max_dim=None):
+        img = self.img.crop(region) if region else self.img
+        return _downscale(img, max_dim) if max_dim else img
+
+
+def _hit(out, box) -> bool:
+    try:
+        x, y = float(out["x"]), float(out["y"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return box[0] <= x <= box[2] and box[1] <= y <= box[3]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", required=True)
+    ap.add_argument("--always", action="store_true", help="zoom on every click, not only uncertain/small ones")
+    args = ap.parse_args()
+
+    from src.llm_client import ask_next_action, load_llm
+
+    with open(os.path.join(args.corpus, "labels.json"), "r", encoding="utf-8") as f:
+        labels = json.load(f)
+    llm = load_llm()
+
+    coarse_hits = fine_hits = zoomed = 0
+    coarse_t, zoom_t = [], []
+    for lb in labels:
+        img = Image.open(os.path.join(args.corpus, lb["image"])).convert("RGB")
+        t0 = time.perf_counter()
+        out = ask_next_action(llm, lb["objective"], vlm_frame(Frame(image=img)), [])
+        coarse_t.append(time.perf_counter() - t0)
+        coarse_ok = _hit(out, lb["box"])
+        coarse_hits += coarse_ok
+
+        fine = out
+        if (out.get("action") or "").upper() in ("CLICK", "DOUBLE_CLICK", "RIGHT_CLICK") \
+                and (args.always or needs_zoom(out)):
+            t0 = time.perf_counter()
+            fine, refined = refine_click(llm, _ReplaySandbox(img), lb["objective"], out)
+            zoom_t.append(time.perf_counter() - t0)
+            zoomed += 1
+        fine_ok = _hit(fine, lb["box"])
+        fine_hits += fine_ok
+        print(f"{lb['image']:<28} coarse={'hit ' if coarse_ok else 'MISS'}  zoom={'hit ' if fine_ok else 'MISS'}")
+
+    n = len(labels) or 1
+    print(f"\n{len(labels)} labelled clicks, MAX_DIM={cfg.MAX_DIM}, ZOOM_REGION_PX={cfg.ZOOM_REGION_PX}")
+    print(f"coarse          hits={coarse_hits}/{len(labels)} ({100.0 * coarse_hits / n:.0f}%)  "
+          f"latency={statistics.mean(coarse_t or [0.0]):.2f} s")
+    print(f"coarse-to-fine  hits={fine_hits}/{len(labels)} ({100.0 * fine_hits / n:.0f}%)  "
+          f"zoom passes={zoomed}  extra latency/zoom={statistics.mean(zoom_t or [0.0]):.2f} s")
+
+
+if __name__ == "__main__":
+    main()
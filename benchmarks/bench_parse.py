@@ -0,0 +1,99 @@
+# benchmarks/bench_parse.py — /cmd screenshot parsing: text parser vs streaming parser
+"""
+Usage:
+    python benchmarks/bench_parse.py [--width 1920 --height 1080 --repeat 10]
+
+Feeds a synthetic screenshot response (JSON and SSE framing) to
+  - "text":   r.text -> _parse_sse_or_json -> base64.b64decode (previous path)
+  - "stream": _CmdStreamParser fed 256 KiB chunks (current _post_cmd path)
+and reports median parse time and tracemalloc peak per response.
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+from PIL import Image
+
+from src.sandbox import _CmdStreamParser, _STREAM_CHUNK, _parse_sse_or_json
+
+
+def _screenshot_png(w: int, h: int) -> bytes:
+    # gradient desktop with noisy "windows" so the PNG has a realistic size
+    rng = np.random.default_rng(0)
+    arr = np.zeros((h, w, 3), dtype=np.uint8)
+    arr[..., 0] = np.linspace(0, 255, w, dtype=np.uint8)[None, :]
+    arr[..., 2] = np.linspace(255, 0, h, dtype=np.uint8)[:, None]
+    for _ in range(6):
+        x, y = rng.integers(0, w // 2), rng.integers(0, h // 2)
+        arr[y:y + h // 3, x:x + w // 3] = rng.integers(0, 256, (h // 3, w // 3, 3), dtype=np.uint8)
+    buf = BytesIO()
+    Image.fromarray(arr).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _chunks(body: bytes):
+    return [body[i:i + _STREAM_CHUNK] for i in range(0, len(body), _STREAM_CHUNK)]
+
+
+def parse_text(chunks) -> bytes:
+    text = b"".join(chunks).decode("utf-8")  # what requests' r.text does
+    res = _parse_sse_or_json(text)
+    return base64.b64decode(res["image_data"])
+
+
+def parse_stream(chunks) -> bytes:
+    p = _CmdStreamParser()
+    for c in chunks:
+        p.feed(c)
+    return p.close()["image_bytes"]
+
+
+def _measure(fn, chunks, repeat: int):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(chunks)
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(chunks)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--width", type=int, default=1920)
+    ap.add_argument("--height", type=int, default=1080)
+    ap.add_argument("--repeat", type=int, default=10)
+    args = ap.parse_args()
+
+    png = _screenshot_png(args.width, args.height)
+    payload = json.dumps({"success": True, "image_data": base64.b64encode(png).decode("ascii")})
+    bodies = {
+        "json": payload.encode(),
+        "sse": f"data: {payload}\n\n".encode(),
+    }
+    print(f"PNG {len(png) / 1e6:.2f} MB, base64 body {len(bodies['json']) / 1e6:.2f} MB")
+
+    for framing, body in bodies.items():
+        chunks = _chunks(body)
+        assert parse_text(chunks) == parse_stream(chunks) == png
+        for name, fn in (("text", parse_text), ("stream", parse_stream)):
+            t, peak = _measure(fn, chunks, args.repeat)
+            print(f"{framing:<5} {name:<7} median={t * 1000:7.2f} ms  peak={peak / 1e6:6.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_reset.py — Desktop reset: stop + cold start() vs Sandbox.reset(baseline)
+"""
+Usage:
+    python benchmarks/bench_reset.py [--n 3] [--modes session,commit]
+
+Needs a running Docker daemon and the sandbox image (uses src/config.py, but
+with its own container name). Each round opens a couple of windows so there is
+something to clean up, then times:
+
+  restart  sandbox.stop(); sandbox.start()
+  session  sandbox.reset(baseline) with RESET_MODE="session"
+  commit   sandbox.reset(baseline) with RESET_MODE="commit"
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.config import cfg as base_cfg
+from src.sandbox import Sandbox
+
+
+def _dirty(sb: Sandbox) -> None:
+    """Leave some state behind: a terminal and a file in $HOME."""
+    sb._exec_sh("touch /home/*/bench_reset_leftover 2>/dev/null; "
+                "(DISPLAY=:1 xfce4-terminal >/dev/null 2>&1 &) ; true")
+    time.sleep(1.0)
+
+
+def _report(name: str, samples) -> None:
+    print(f"{name:<8} mean={statistics.mean(samples):6.2f} s  min={min(samples):6.2f} s  max={max(samples):6.2f} s")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=3)
+    ap.add_argument("--modes", default="session,commit")
+    ap.add_argument("--name", default="cua_bench_reset")
+    args = ap.parse_args()
+
+    c = copy.copy(base_cfg)
+    c.SANDBOX_NAME = args.name
+    sb = Sandbox(c)
+    sb.start()
+    try:
+        results = {"restart": []}
+        for _ in range(args.n):
+            _dirty(sb)
+            t0 = time.perf_counter()
+            sb.stop()
+            sb.start()
+            results["restart"].append(time.perf_counter() - t0)
+
+        for mode in [m for m in args.modes.split(",") if m]:
+            baseline = sb.capture_baseline(mode=mode)
+            results[mode] = []
+            for _ in range(args.n):
+                _dirty(sb)
+                results[mode].append(sb.reset(baseline))
+
+        print(f"\n{args.n} rounds, container {args.name} ({sb.docker.name} backend)")
+        for name, samples in results.items():
+            _report(name, samples)
+        base = statistics.mean(results["restart"])
+        for name, samples in results.items():
+            if name != "restart":
+                print(f"{name}: {base / statistics.mean(samples):.1f}x faster than restart")
+    finally:
+        sb.stop()
+        sb.close()
+
+
+if __name__ == "__main__":
+    main()
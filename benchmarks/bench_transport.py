@@ -0,0 +1,70 @@
+# benchmarks/bench_transport.py — Per-command round trip: bare requests vs pooled Sandbox
+"""
+Usage:
+    python benchmarks/bench_transport.py [--n 500]
+
+Runs against the local stand-in computer-server (tests/standin_server.py),
+so it measures client-side connection overhead only.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import requests
+
+from src.sandbox import Sandbox, _parse_sse_or_json
+from tests.standin_server import StandinServer
+
+
+def _report(name: str, samples) -> None:
+    ms = sorted(s * 1000.0 for s in samples)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(f"{name:<22} mean={statistics.mean(ms):7.3f} ms  p50={statistics.median(ms):7.3f} ms  p95={p95:7.3f} ms")
+
+
+def bench_bare(url: str, n: int):
+    out = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        r = requests.post(url, json={"command": "move_cursor", "params": {"x": i, "y": i}}, timeout=5)
+        _parse_sse_or_json(r.text)
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def bench_pooled(sb: Sandbox, n: int):
+    out = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        sb._post_cmd("move_cursor", {"x": i, "y": i})
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=500)
+    args = ap.parse_args()
+
+    with StandinServer() as srv:
+        sb = Sandbox(srv.cfg())
+        bare = bench_bare(sb.cmd_url, args.n)
+        conns_bare = srv.connections
+        pooled = bench_pooled(sb, args.n)
+        conns_pooled = srv.connections - conns_bare
+        sb.close()
+
+    print(f"{args.n} x move_cursor against stand-in server")
+    _report(f"requests.post ({conns_bare} conn)", bare)
+    _report(f"pooled ({conns_pooled} conn)", pooled)
+    print(f"speedup (mean): {statistics.mean(bare) / statistics.mean(pooled):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
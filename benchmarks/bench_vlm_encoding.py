@@ -0,0 +1,145 @@
+# benchmarks/bench_vlm_encoding.py — VLM screenshot payload: PNG vs JPEG vs WebP
+"""
+Usage:
+    python benchmarks/bench_vlm_encoding.py [--corpus DIR] [--settings PNG,JPEG/85/4:2:0,WEBP/80]
+                                            [--repeat 5] [--llm]
+
+For every setting, on each screenshot of the corpus (resized to MAX_DIM first,
+exactly as the agent does) it reports encode time and base64 payload size.
+
+--llm also loads the executor model and, per setting, times
+create_chat_completion (via ask_next_action) end to end. If the corpus has a
+labels.json, the returned click is checked against the labelled target box:
+
+    [{"image": "firefox.png", "objective": "Open Firefox", "box": [x0, y0, x1, y1]}, ...]
+
+(box in normalized 0..1 screen coordinates). Without --corpus a synthetic
+desktop (gradient wallpaper, windows, text) is used for the size/time part.
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image, ImageDraw
+
+from src.config import cfg
+from src.frame import Frame
+from src.vision import frame_to_data_uri, vlm_frame
+
+DEFAULT_SETTINGS = "PNG,JPEG/90/4:4:4,JPEG/85/4:2:0,JPEG/70/4:2:0,WEBP/85,WEBP/70"
+
+
+def _parse_settings(text: str):
+    out = []
+    for item in [t for t in text.split(",") if t]:
+        parts = item.split("/")
+        fmt = parts[0].upper()
+        quality = int(parts[1]) if len(parts) > 1 else 85
+        subsampling = parts[2] if len(parts) > 2 else "4:4:4"
+        out.append((fmt, quality, subsampling))
+    return out
+
+
+def _label(setting) -> str:
+    fmt, q, sub = setting
+    if fmt == "PNG":
+        return "PNG"
+    return f"{fmt} q{q}" + (f" {sub}" if fmt == "JPEG" else "")
+
+
+def _synthetic_desktop(w: int = 1920, h: int = 1080) -> Image.Image:
+    img = Image.linear_gradient("L").resize((w, h)).convert("RGB")
+    img = Image.merge("RGB", (img.getchannel(0), img.getchannel(0).transpose(Image.Transpose.FLIP_LEFT_RIGHT),
+                              Image.new("L", (w, h), 140)))
+    d = ImageDraw.Draw(img)
+    for i, (x, y) in enumerate([(120, 90), (700, 260), (1100, 500)]):
+        d.rectangle((x, y, x + 640, y + 420), fill=(245, 245, 245), outline=(60, 60, 60))
+        d.rectangle((x, y, x + 640, y + 28), fill=(50 + 60 * i, 90, 160))
+        for line in range(14):
+            d.text((x + 16, y + 44 + line * 26), f"Window {i} - line {line}: The quick brown fox 0123456789",
+                   fill=(20, 20, 20))
+    d.rectangle((0, h - 40, w, h), fill=(30, 30, 40))
+    return img
+
+
+def _load_corpus(path):
+    if not path:
+        return [("synthetic", _synthetic_desktop())], []
+    files = sorted(glob.glob(os.path.join(path, "*.png")) + glob.glob(os.path.join(path, "*.jpg")))
+    images = [(os.path.basename(f), Image.open(f).convert("RGB")) for f in files]
+    labels_path = os.path.join(path, "labels.json")
+    labels = []
+    if os.path.exists(labels_path):
+        with open(labels_path, "r", encoding="utf-8") as f:
+            labels = json.load(f)
+    return images, labels
+
+
+def _encode_stats(images, setting, repeat: int):
+    times, sizes = [], []
+    for _, img in images:
+        for _ in range(repeat):
+            shot = vlm_frame(Frame(image=img))  # fresh frame: nothing memoized yet
+            t0 = time.perf_counter()
+            uri = frame_to_data_uri(shot, *setting)
+            times.append(time.perf_counter() - t0)
+        sizes.append(len(uri))
+    return statistics.mean(times), statistics.mean(sizes)
+
+
+def _llm_stats(llm, images, labels, setting):
+    from src.llm_client import ask_next_action
+
+    cfg.VLM_IMAGE_FORMAT, cfg.VLM_IMAGE_QUALITY, cfg.VLM_JPEG_SUBSAMPLING = setting
+    by_name = dict(images)
+    jobs = [(by_name[lb["image"]], lb["objective"], lb["box"]) for lb in labels if lb["image"] in by_name]
+    if not jobs:
+        jobs = [(img, "Latency probe: return NOOP.", None) for _, img in images]
+    latencies, hits, scored = [], 0, 0
+    for img, objective, box in jobs:
+        t0 = time.perf_counter()
+        out = ask_next_action(llm, objective, vlm_frame(Frame(image=img)), [])
+        latencies.append(time.perf_counter() - t0)
+        if box is not None:
+            scored += 1
+            x, y = float(out.get("x", -1)), float(out.get("y", -1))
+            hits += box[0] <= x <= box[2] and box[1] <= y <= box[3]
+    acc = f"{hits}/{scored} ({100.0 * hits / scored:.0f}%)" if scored else "n/a (no labels.json)"
+    return statistics.mean(latencies), acc
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", default="")
+    ap.add_argument("--settings", default=DEFAULT_SETTINGS)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--llm", action="store_true", help="also time create_chat_completion + grounding accuracy")
+    args = ap.parse_args()
+
+    images, labels = _load_corpus(args.corpus)
+    settings = _parse_settings(args.settings)
+    print(f"{len(images)} screenshot(s), MAX_DIM={cfg.MAX_DIM}, {args.repeat} encodes each")
+    for s in settings:
+        enc, size = _encode_stats(images, s, args.repeat)
+        print(f"{_label(s):<20} encode={enc * 1000:7.2f} ms  payload={size / 1024:8.1f} KiB (base64)")
+
+    if args.llm:
+        from src.llm_client import load_llm
+
+        llm = load_llm()
+        print("\nend-to-end create_chat_completion (ask_next_action)")
+        for s in settings:
+            lat, acc = _llm_stats(llm, images, labels, s)
+            print(f"{_label(s):<20} latency={lat:6.2f} s  grounding={acc}")
+
+
+if __name__ == "__main__":
+    main()
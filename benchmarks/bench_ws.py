@@ -0,0 +1,77 @@
+# benchmarks/bench_ws.py — Input-event latency: HTTP /cmd (pooled) vs persistent WebSocket
+"""
+Usage:
+    python benchmarks/bench_ws.py [--n 1000] [--threads 4]
+
+Runs against the local stand-in computer-server (tests/standin_server.py).
+Measures per-command round trips for tiny input events, sequentially and with
+several threads issuing commands at once (GUI + agent), for both transports.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.sandbox import Sandbox
+from tests.standin_server import StandinServer
+
+
+def _report(name: str, samples) -> None:
+    ms = sorted(s * 1000.0 for s in samples)
+    pct = lambda q: ms[min(len(ms) - 1, int(len(ms) * q))]
+    print(f"{name:<24} mean={statistics.mean(ms):7.3f}  p50={pct(0.50):7.3f}  "
+          f"p95={pct(0.95):7.3f}  p99={pct(0.99):7.3f}  max={ms[-1]:7.3f} ms")
+
+
+def _run(sb: Sandbox, n: int, threads: int):
+    out = []
+    lock = threading.Lock()
+
+    def worker(count):
+        local = []
+        for i in range(count):
+            t0 = time.perf_counter()
+            sb._post_cmd("move_cursor", {"x": i, "y": i})
+            local.append(time.perf_counter() - t0)
+        with lock:
+            out.extend(local)
+
+    ts = [threading.Thread(target=worker, args=(n // threads,)) for _ in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1000)
+    ap.add_argument("--threads", type=int, default=4)
+    args = ap.parse_args()
+
+    with StandinServer() as srv:
+        http = Sandbox(srv.cfg(SANDBOX_TRANSPORT="http"))
+        ws = Sandbox(srv.cfg(SANDBOX_TRANSPORT="ws"))
+        _run(http, 50, 1), _run(ws, 50, 1)  # warm up connections
+
+        print(f"{args.n} x move_cursor against stand-in server (latency in ms)")
+        seq_http, seq_ws = _run(http, args.n, 1), _run(ws, args.n, 1)
+        _report("http sequential", seq_http)
+        _report("ws sequential", seq_ws)
+        par_http, par_ws = _run(http, args.n, args.threads), _run(ws, args.n, args.threads)
+        _report(f"http {args.threads} threads", par_http)
+        _report(f"ws {args.threads} threads", par_ws)
+        print(f"ws vs http (sequential mean): {statistics.mean(seq_http) / statistics.mean(seq_ws):.2f}x")
+        http.close()
+        ws.close()
+
+
+if __name__ == "__main__":
+    main()
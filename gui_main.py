@@ -16,10 +16,14 @@ from PyQt6.QtWidgets import (
     QTextEdit, QGridLayout, QFrame, QSizePolicy
 )
 
+import numpy as np
+
 from src.config import cfg
 from src.sandbox import Sandbox
 from src.llm_client import load_llm, ask_next_action
-from src.vision import capture_screen, capture_screen_raw, draw_preview
+from src.frame import Frame
+from src.vision import capture_frame, capture_screen, draw_preview, export_previews
+from src.screen_change import wait_for_screen_stable
 from src.guards import validate_xy, should_stop_on_repeat
 from src.actions import execute_action
 from transformers import MarianMTModel, MarianTokenizer
@@ -105,14 +109,15 @@ def run_single_command(
 
         _log(f"\n==================== STEP {step} ====================")
 
-        time.sleep(getattr(cfg, "WAIT_BEFORE_SCREENSHOT_SEC", 0.8))
+        since = time.time()
+        wait_for_screen_stable(sandbox)
 
-        img = capture_screen(sandbox, cfg.SCREENSHOT_PATH)
+        img = capture_screen(sandbox, cfg.SCREENSHOT_PATH, newer_than=since)
 
         out: Dict[str, Any] | None = None
 
         for attempt in range(getattr(cfg, "MODEL_RETRY", 2) + 1):
-            out = ask_next_action(llm, objective, cfg.SCREENSHOT_PATH, trim_history(history))
+            out = ask_next_action(llm, objective, img, trim_history(history))
             action = (out.get("action") or "NOOP").upper()
 
             if action == "BITTI":
@@ -162,14 +167,20 @@ def pil_to_qpixmap(pil_img) -> QPixmap:
     """
     Prevent QImage raw buffer corruption:
     - provide stride (bytesPerLine)
-    - qimg.copy() to detach (fixes buffer lifetime issues)
+    - keep the pixel buffer referenced until QPixmap.fromImage() has copied it
+    A Frame (src/frame.py) is wrapped in place: no PIL conversion, no tobytes().
     """
-    rgb = pil_img.convert("RGB")
-    w, h = rgb.size
-    data = rgb.tobytes("raw", "RGB")
+    if isinstance(pil_img, Frame):
+        arr = np.ascontiguousarray(pil_img.array)
+        h, w = arr.shape[:2]
+        data = arr.data
+    else:
+        rgb = pil_img if pil_img.mode == "RGB" else pil_img.convert("RGB")
+        w, h = rgb.size
+        data = rgb.tobytes("raw", "RGB")
     bytes_per_line = 3 * w
-    qimg = QImage(data, w, h, bytes_per_line, QImage.Format.Format_RGB888).copy()
-    return QPixmap.fromImage(qimg)
+    qimg = QImage(data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
+    return QPixmap.fromImage(qimg)  # deep copy into the pixmap
 
 
 def scale_crop_to_label(pm: QPixmap, label_w: int, label_h: int) -> QPixmap:
@@ -265,8 +276,10 @@ class VMView(QLabel):
             return
 
         self._pressed_btn = btn
-        self.sandbox.mouse_move_norm(nx, ny)
-        self.sandbox.mouse_down(btn)
+        # move + press in one pipelined round trip
+        with self.sandbox.batch():
+            self.sandbox.mouse_move_norm(nx, ny)
+            self.sandbox.mouse_down(btn)
 
     def mouseMoveEvent(self, e: QMouseEvent):
         if not self.input_enabled:
@@ -550,6 +563,7 @@ class AgentWindow(QMainWindow):
             except Exception:
                 self.signals.log.emit("[GUI] ERROR:\n" + traceback.format_exc())
             finally:
+                export_previews()
                 self.signals.busy.emit(False)
 
         self.worker_thread = threading.Thread(target=worker, daemon=True)
@@ -557,7 +571,8 @@ class AgentWindow(QMainWindow):
 
     def _refresh_vm_screenshot(self):
         try:
-            img = capture_screen_raw(self.sandbox)
+            # reuse any frame the agent captured within one refresh interval
+            img = capture_frame(self.sandbox, max_age=self.timer.interval() / 1000.0)
             pm = pil_to_qpixmap(img)
             self.vm_view.set_frame(pm)
         except Exception:
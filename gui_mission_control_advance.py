@@ -21,10 +21,14 @@ from PyQt6.QtWidgets import (
     QTextEdit,
 )
 
+import numpy as np
+
 from src.config import cfg
 from src.sandbox import Sandbox
 from src.llm_client import load_llm, ask_next_action
-from src.vision import capture_screen, capture_screen_raw, draw_preview
+from src.frame import Frame
+from src.vision import capture_frame, capture_screen, draw_preview, export_previews
+from src.screen_change import wait_for_screen_stable
 from src.guards import validate_xy, should_stop_on_repeat
 from src.actions import execute_action
 from src.design_system import build_stylesheet
@@ -72,11 +76,17 @@ def _extract_xy(out: Dict[str, Any]) -> Tuple[float, float]:
 # ═══════════════════════════════════════════
 
 def pil_to_qpixmap(pil_img) -> QPixmap:
-    rgb = pil_img.convert("RGB")
-    w, h = rgb.size
-    data = rgb.tobytes("raw", "RGB")
+    # Frames (src/frame.py) are wrapped in place; fromImage() makes the only copy
+    if isinstance(pil_img, Frame):
+        arr = np.ascontiguousarray(pil_img.array)
+        h, w = arr.shape[:2]
+        data = arr.data
+    else:
+        rgb = pil_img if pil_img.mode == "RGB" else pil_img.convert("RGB")
+        w, h = rgb.size
+        data = rgb.tobytes("raw", "RGB")
     bpl = 3 * w
-    qimg = QImage(data, w, h, bpl, QImage.Format.Format_RGB888).copy()
+    qimg = QImage(data, w, h, bpl, QImage.Format.Format_RGB888)
     return QPixmap.fromImage(qimg)
 
 
@@ -139,8 +149,10 @@ class VMView(QLabel):
         btn = btn_map.get(e.button())
         if btn is None: return
         self._pressed_btn = btn
-        self.sandbox.mouse_move_norm(nx, ny)
-        self.sandbox.mouse_down(btn)
+        # move + press in one pipelined round trip
+        with self.sandbox.batch():
+            self.sandbox.mouse_move_norm(nx, ny)
+            self.sandbox.mouse_down(btn)
 
     def mouseMoveEvent(self, e: QMouseEvent):
         if not self.input_enabled: return
@@ -482,13 +494,14 @@ def run_single_command(
             return "STOPPED"
 
         signals.log.emit(f"═══ STEP {step} ═══", "info")
-        time.sleep(getattr(cfg, "WAIT_BEFORE_SCREENSHOT_SEC", 0.2))
-        img = capture_screen(sandbox, cfg.SCREENSHOT_PATH)
+        since = time.time()
+        wait_for_screen_stable(sandbox)
+        img = capture_screen(sandbox, cfg.SCREENSHOT_PATH, newer_than=since)
 
         out: Optional[Dict[str, Any]] = None
 
         for attempt in range(getattr(cfg, "MODEL_RETRY", 2) + 1):
-            out = ask_next_action(llm, objective, cfg.SCREENSHOT_PATH, trim_history(history))
+            out = ask_next_action(llm, objective, img, trim_history(history))
             action = (out.get("action") or "NOOP").upper()
             if action == "BITTI":
                 return "DONE(BITTI)"
@@ -698,7 +711,8 @@ class MissionControlWindowV2(QMainWindow):
         if not self.sandbox or not self.vm_view:
             return
         try:
-            img = capture_screen_raw(self.sandbox)
+            # reuse any frame the agent captured within one refresh interval
+            img = capture_frame(self.sandbox, max_age=self.refresh_timer.interval() / 1000.0)
             pm = pil_to_qpixmap(img)
             self.vm_view.set_frame(pm)
         except Exception:
@@ -815,6 +829,7 @@ class MissionControlWindowV2(QMainWindow):
             except Exception:
                 self.signals.log.emit("ERROR:\n" + traceback.format_exc(), "error")
             finally:
+                export_previews()
                 self.signals.busy.emit(False)
 
         self.worker_thread = threading.Thread(target=worker, daemon=True)
@@ -831,6 +846,7 @@ class MissionControlWindowV2(QMainWindow):
             except Exception:
                 self.signals.log.emit("ERROR:\n" + traceback.format_exc(), "error")
             finally:
+                export_previews()
                 self.signals.busy.emit(False)
 
         self.worker_thread = threading.Thread(target=worker, daemon=True)
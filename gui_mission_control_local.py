@@ -21,16 +21,23 @@ from PyQt6.QtWidgets import (
     QTextEdit, QSpinBox, QCheckBox,
 )
 
+import numpy as np
+
 from src.config import cfg
 from src.sandbox import Sandbox
 from src.llm_client import load_llm, ask_next_action
-from src.vision import capture_screen, capture_screen_raw, draw_preview
-from src.guards import validate_xy, should_stop_on_repeat
-from src.actions import execute_action
+from src.frame import Frame
+from src.vision import capture_frame, capture_screen, draw_preview, export_previews, source_frame
+from src.screen_change import reuse_frame, stamp_frame, wait_for_screen_stable, wait_until_idle
+from src.guards import detect_screen_loop, validate_xy, should_stop_on_repeat
+from src.frame_ring import export_trajectory, ring_of
+from src.actions import execute_action, had_no_effect
+from src.grounding import needs_zoom, refine_click
+from src.element_memory import default_memory, memory_key
 from src.design_system import build_stylesheet
 from src.panels import TopBar, CommandPanel, InspectorPanel, LogPanel
 from src.planner import Plan, PlanStep, Planner
-from src.verifier import VerifierResult
+from src.verifier import VerifierResult, no_effect_result
 
 
 # ═══════════════════════════════════════════
@@ -72,11 +79,17 @@ def _extract_xy(out: Dict[str, Any]) -> Tuple[float, float]:
 # ═══════════════════════════════════════════
 
 def pil_to_qpixmap(pil_img) -> QPixmap:
-    rgb = pil_img.convert("RGB")
-    w, h = rgb.size
-    data = rgb.tobytes("raw", "RGB")
+    # Frames (src/frame.py) are wrapped in place; fromImage() makes the only copy
+    if isinstance(pil_img, Frame):
+        arr = np.ascontiguousarray(pil_img.array)
+        h, w = arr.shape[:2]
+        data = arr.data
+    else:
+        rgb = pil_img if pil_img.mode == "RGB" else pil_img.convert("RGB")
+        w, h = rgb.size
+        data = rgb.tobytes("raw", "RGB")
     bpl = 3 * w
-    qimg = QImage(data, w, h, bpl, QImage.Format.Format_RGB888).copy()
+    qimg = QImage(data, w, h, bpl, QImage.Format.Format_RGB888)
     return QPixmap.fromImage(qimg)
 
 
@@ -139,8 +152,10 @@ class VMView(QLabel):
         btn = btn_map.get(e.button())
         if btn is None: return
         self._pressed_btn = btn
-        self.sandbox.mouse_move_norm(nx, ny)
-        self.sandbox.mouse_down(btn)
+        # move + press in one pipelined round trip
+        with self.sandbox.batch():
+            self.sandbox.mouse_move_norm(nx, ny)
+            self.sandbox.mouse_down(btn)
 
     def mouseMoveEvent(self, e: QMouseEvent):
         if not self.input_enabled: return
@@ -659,13 +674,14 @@ def run_single_command(
             return "STOPPED"
 
         signals.log.emit(f"═══ STEP {step} ═══", "info")
-        time.sleep(getattr(cfg, "WAIT_BEFORE_SCREENSHOT_SEC", 0.2))
-        img = capture_screen(sandbox, cfg.SCREENSHOT_PATH)
+        since = time.time()
+        wait_for_screen_stable(sandbox)
+        img = capture_screen(sandbox, cfg.SCREENSHOT_PATH, newer_than=since)
 
         out: Optional[Dict[str, Any]] = None
 
         for attempt in range(getattr(cfg, "MODEL_RETRY", 2) + 1):
-            out = ask_next_action(llm, objective, cfg.SCREENSHOT_PATH, trim_history(history))
+            out = ask_next_action(llm, objective, img, trim_history(history))
             action = (out.get("action") or "NOOP").upper()
             if action == "BITTI":
                 return "DONE(BITTI)"
@@ -745,6 +761,7 @@ def run_hierarchical_loop(
     max_replan = getattr(cfg, "PLANNER_MAX_REPLAN", 2)
     global_step_count = 0
     replan_count = 0
+    vlm_calls_saved = 0  # by waiting out loading screens (IdleWait.calls_saved)
     context = ""
 
     while replan_count <= max_replan:
@@ -773,6 +790,9 @@ def run_hierarchical_loop(
         # ── Execute plan ──────────────────────────────────────
         history: List[Dict[str, Any]] = []
         plan_completed = True
+        carried = None  # verifier frame, reused while the screen is unchanged
+        memory = default_memory()
+        ring = ring_of(sandbox)
 
         for step_idx, step in enumerate(plan.steps):
             if stop_event and stop_event.is_set():
@@ -785,6 +805,7 @@ def run_hierarchical_loop(
             attempts = 0
             verifier_hint = ""
             step_done = False
+            step_started = time.time()
 
             while attempts < step.max_attempts:
                 if stop_event and stop_event.is_set():
@@ -801,17 +822,35 @@ def run_hierarchical_loop(
                     f"  Attempt {attempts}/{step.max_attempts} "
                     f"(action #{global_step_count})", "info")
 
-                # 1. Screenshot
-                time.sleep(cfg.WAIT_BEFORE_SCREENSHOT_SEC)
-                img = capture_screen(sandbox, cfg.SCREENSHOT_PATH)
+                # 1. Screenshot (the verifier's frame if nothing changed since)
+                img = reuse_frame(sandbox, carried)
+                if img is not None:
+                    img_ts = carried.ts
+                    if ring is not None:
+                        ring.push(img, "executor")  # still an attempt on this screen (detect_screen_loop)
+                else:
+                    since = time.time()
+                    wait_for_screen_stable(sandbox)
+                    img = capture_screen(sandbox, cfg.SCREENSHOT_PATH, label="executor", newer_than=since)
+                    img_ts = time.time()
+
+                looping, why = detect_screen_loop(ring, since=step_started)
+                if looping:
+                    signals.log.emit(f"  [GUARD] {why}", "warn")
+                    verifier_hint = f"{verifier_hint} {why} Try a different approach.".strip()
 
                 # 2. Ask executor
                 enriched = _build_executor_objective(objective, step, verifier_hint)
-                out: Optional[Dict[str, Any]] = None
+                recalled = memory.recall(img, memory_key(objective, step.title)) if memory is not None and attempts == 1 else None
+                out: Optional[Dict[str, Any]] = recalled.as_action() if recalled else None
+                if recalled:
+                    signals.log.emit(f"  🧠 Remembered '{recalled.label}' ({recalled.score:.2f}), no model call", "info")
 
                 for retry in range(cfg.MODEL_RETRY + 1):
+                    if out is not None:
+                        break
                     out = ask_next_action(
-                        llm, enriched, cfg.SCREENSHOT_PATH, trim_history(history))
+                        llm, enriched, img, trim_history(history))
                     action = (out.get("action") or "NOOP").upper()
 
                     if action == "BITTI":
@@ -845,39 +884,64 @@ def run_hierarchical_loop(
                 signals.action_update.emit(out)
                 signals.step_update.emit(global_step_count, action, str(detail))
 
-                # 3. Repeat guard
+                # 3. Repeat guard (before spending a zoom call)
                 stop, why = should_stop_on_repeat(history, out)
                 if stop:
                     signals.log.emit(f"  [GUARD] {why}", "warn")
                     verifier_hint = f"Repeat blocked: {why}. Try something different."
                     continue
 
+                # 3b. Zoom in on small / uncertain click targets
+                if recalled is None and needs_zoom(out):
+                    out, refined = refine_click(llm, sandbox, enriched, out)
+                    if refined:
+                        signals.log.emit(f"  🔎 Zoomed click → ({out['x']:.3f}, {out['y']:.3f})", "info")
+                        signals.action_update.emit(out)
+
                 # 4. Preview
                 if action in ("CLICK", "DOUBLE_CLICK", "RIGHT_CLICK"):
                     preview_path = cfg.PREVIEW_PATH_TEMPLATE.format(i=global_step_count)
                     draw_preview(img, float(out["x"]), float(out["y"]), preview_path)
 
                 # 5. Execute
-                execute_action(sandbox, out)
+                res = execute_action(sandbox, out)
                 history.append(out)
-
-                # 6. Post-action screenshot
-                time.sleep(cfg.WAIT_BEFORE_SCREENSHOT_SEC)
-                capture_screen(sandbox, cfg.SCREENSHOT_PATH)
-
-                # 7. Verify
-                signals.log.emit(f"  🔍 Verifying...", "info")
-                try:
-                    vr = verify_step(llm, step, cfg.SCREENSHOT_PATH)
-                except Exception as e:
-                    signals.log.emit(f"  ⚠ Verifier error: {e}", "warn")
-                    vr = VerifierResult(
-                        step_id=step.id, done=False,
-                        evidence=[f"verifier error: {e}"],
-                        failure_type="OTHER",
-                        suggested_fix="retry",
-                        confidence=0.1,
-                    )
+                carried = None
+
+                # 6. Wait for the screen to settle (spinners / page loads included)
+                since = time.time()
+                idle = wait_until_idle(sandbox)
+
+                # 7. Verify (skipped when the action changed nothing on screen)
+                no_effect = had_no_effect(sandbox, res, since)
+                if not no_effect and idle.was_busy:
+                    vlm_calls_saved += idle.calls_saved
+                    signals.log.emit(
+                        f"  ⏳ Loading for {idle.waited:.1f}s "
+                        f"({'done' if idle.idle else 'still moving, verifying anyway'}), "
+                        f"VLM calls saved: {vlm_calls_saved}", "info")
+
+                if no_effect:
+                    signals.log.emit(f"  🔍 No visible change, skipping verifier.", "warn")
+                    vr = no_effect_result(step.id)
+                    carried = stamp_frame(sandbox, img, img_ts, res.before)
+                else:
+                    busy = None if idle.idle else idle.busy_box()
+                    after = capture_screen(sandbox, cfg.SCREENSHOT_PATH, label="verifier", newer_than=since)
+                    carried = stamp_frame(sandbox, after, newer_than=since)
+                    signals.log.emit(f"  🔍 Verifying...", "info")
+                    try:
+                        vr = verify_step(llm, step, after, before=img, source=source_frame(sandbox, after),
+                                         busy=busy)
+                    except Exception as e:
+                        signals.log.emit(f"  ⚠ Verifier error: {e}", "warn")
+                        vr = VerifierResult(
+                            step_id=step.id, done=False,
+                            evidence=[f"verifier error: {e}"],
+                            failure_type="OTHER",
+                            suggested_fix="retry",
+                            confidence=0.1,
+                        )
 
                 signals.verifier_result.emit(vr.to_dict())
                 evidence_str = "; ".join(vr.evidence[:2]) if vr.evidence else ""
@@ -888,9 +952,13 @@ def run_hierarchical_loop(
                 if vr.done:
                     signals.log.emit(f"  ✓ [{step.id}] Verified!", "success")
                     signals.plan_step_status.emit(step.id, "done")
+                    if memory is not None and recalled is None:
+                        memory.remember(img, out, memory_key(objective, step.title))
                     step_done = True
                     break
                 else:
+                    if recalled is not None:
+                        memory.forget(recalled.entry_id)
                     verifier_hint = (
                         f"Not satisfied. Failure: {vr.failure_type}. "
                         f"Fix: {vr.suggested_fix}. Evidence: {evidence_str}"
@@ -1087,7 +1155,8 @@ class MissionControlLocalWindow(QMainWindow):
         if not self.sandbox or not self.vm_view:
             return
         try:
-            img = capture_screen_raw(self.sandbox)
+            # reuse any frame the agent captured within one refresh interval
+            img = capture_frame(self.sandbox, max_age=self.refresh_timer.interval() / 1000.0)
             pm = pil_to_qpixmap(img)
             self.vm_view.set_frame(pm)
         except Exception:
@@ -1171,6 +1240,8 @@ class MissionControlLocalWindow(QMainWindow):
 
     def _run_hierarchical(self, objective: str) -> None:
         """Run the full Plan→Execute→Verify loop."""
+        started = time.time()
+
         def worker():
             try:
                 res = run_hierarchical_loop(
@@ -1186,6 +1257,8 @@ class MissionControlLocalWindow(QMainWindow):
                 self.signals.log.emit(
                     "ERROR:\n" + traceback.format_exc(), "error")
             finally:
+                export_trajectory(self.sandbox, since=started)
+                export_previews()
                 self.signals.busy.emit(False)
 
         self.worker_thread = threading.Thread(target=worker, daemon=True)
@@ -1203,6 +1276,7 @@ class MissionControlLocalWindow(QMainWindow):
                 self.signals.log.emit(
                     "ERROR:\n" + traceback.format_exc(), "error")
             finally:
+                export_previews()
                 self.signals.busy.emit(False)
 
         self.worker_thread = threading.Thread(target=worker, daemon=True)
@@ -7,7 +7,8 @@ from typing import Any, Dict, List, Optional
 from src.config import cfg
 from src.sandbox import Sandbox
 from src.llm_client import load_llm, ask_next_action
-from src.vision import capture_screen, draw_preview
+from src.vision import capture_screen, draw_preview, export_previews
+from src.screen_change import wait_for_screen_stable
 from src.guards import validate_xy, should_stop_on_repeat
 from src.actions import execute_action
 
@@ -95,16 +96,17 @@ def main() -> None:
         while True:
             print(f"\n==================== STEP {step} ====================")
 
-            time.sleep(cfg.WAIT_BEFORE_SCREENSHOT_SEC)
+            since = time.time()
+            wait_for_screen_stable(sandbox)
 
-            # Capture current screenshot
-            img = capture_screen(sandbox, cfg.SCREENSHOT_PATH)
+            # Capture current screenshot (the settle wait's last sample)
+            img = capture_screen(sandbox, cfg.SCREENSHOT_PATH, newer_than=since)
 
             out: Dict[str, Any] | None = None
 
             # Ask the model for the next action
             for attempt in range(cfg.MODEL_RETRY + 1):
-                out = ask_next_action(llm, objective, cfg.SCREENSHOT_PATH, trim_history(history))
+                out = ask_next_action(llm, objective, img, trim_history(history))
                 action = (out.get("action") or "NOOP").upper()
 
                 # Done statement
@@ -164,6 +166,7 @@ def main() -> None:
 
         # Loop for a single objective ends here,
         # then ask the user for a new command
+        export_previews()
         print("Ready for the next command.")
 
 
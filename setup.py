@@ -9,6 +9,7 @@ setup(
         "requests>=2.31",
         "Pillow>=10.0",
         "numpy>=1.24",
+        "aiohttp>=3.9",
         "opencv-python>=4.8",
         "huggingface_hub>=0.20",
         "transformers>=4.40",
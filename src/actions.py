@@ -2,79 +2,144 @@
 from __future__ import annotations
 
 import time
-from typing import Any, Dict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import numpy as np
 
 from src.sandbox import Sandbox
 from src.config import cfg
+from src.screen_change import change_fraction, grab_thumb, wait_for_change
+
+# actions expected to change what is on screen (checked when CONFIRM_ACTION_CHANGE is on)
+_VISUAL_ACTIONS = ("CLICK", "DOUBLE_CLICK", "RIGHT_CLICK", "TYPE", "PRESS", "HOTKEY", "SCROLL")
+
+
+@dataclass
+class ActionResult:
+    action: str
+    changed: Optional[bool] = None   # None: not checked (non-visual action or confirmation off)
+    change: float = 0.0              # fraction of thumbnail pixels that changed
+    waited: float = 0.0              # seconds spent waiting for the effect
+    before: Optional[np.ndarray] = field(default=None, repr=False)  # pre-action thumbnail
 
 
 def _pause_after_action() -> None:
     time.sleep(getattr(cfg, "PAUSE_AFTER_ACTION_SEC", getattr(cfg, "PAUSE_AFTER_CLICK_SEC", 0.25)))
 
 
-def execute_action(sandbox: Sandbox, act: Dict[str, Any]) -> None:
-    """Execute one action dict produced by the model."""
-    a = (act.get("action") or "NOOP").upper()
+def _change_dim() -> int:
+    return int(getattr(cfg, "ACTION_CHANGE_DIM", 480))
 
-    if a == "NOOP":
-        return
-
-    if a == "WAIT":
-        secs = float(act.get("seconds") or 0.5)
-        time.sleep(max(0.0, min(30.0, secs)))
-        return
 
+def _perform(sandbox: Sandbox, a: str, act: Dict[str, Any]) -> None:
     if a == "CLICK":
         sandbox.left_click_norm(float(act["x"]), float(act["y"]))
-        _pause_after_action()
-        return
-
-    if a == "DOUBLE_CLICK":
+    elif a == "DOUBLE_CLICK":
         sandbox.double_click_norm(float(act["x"]), float(act["y"]))
-        _pause_after_action()
-        return
-
-    if a == "RIGHT_CLICK":
+    elif a == "RIGHT_CLICK":
         sandbox.right_click_norm(float(act["x"]), float(act["y"]))
-        _pause_after_action()
-        return
-
-    if a == "TYPE":
+    elif a == "TYPE":
         sandbox.type_text(str(act.get("text") or ""))
-        _pause_after_action()
-        return
-
-    if a == "PRESS":
+    elif a == "PRESS":
         sandbox.press_key(str(act.get("key") or ""))
-        _pause_after_action()
-        return
-
-    if a == "HOTKEY":
+    elif a == "HOTKEY":
         keys = act.get("keys") or []
         sandbox.hotkey([str(k) for k in keys])
-        _pause_after_action()
-        return
-
-    if a == "SCROLL":
+    elif a == "SCROLL":
         amount = act.get("scroll")
         if amount is None:
             amount = act.get("amount", 0)
         sandbox.scroll(int(amount or 0))
+
+
+def _execute_visual(sandbox: Sandbox, a: str, act: Dict[str, Any], confirm: bool) -> ActionResult:
+    """
+    Run a screen-changing action. With confirm, return as soon as a thumbnail
+    differs from the pre-action one (or after ACTION_CHANGE_TIMEOUT) instead of
+    the fixed PAUSE_AFTER_CLICK_SEC, and report whether anything changed.
+    """
+    before = None
+    if confirm:
+        try:
+            before = grab_thumb(sandbox, _change_dim())
+        except Exception as e:
+            print(f"[ACTION] pre-action sample failed ({e}) -> fixed pause.")
+
+    _perform(sandbox, a, act)
+    if before is None:
+        _pause_after_action()
+        return ActionResult(a)
+
+    t0 = time.time()
+    try:
+        changed, frac = wait_for_change(
+            sandbox, before,
+            timeout=float(getattr(cfg, "ACTION_CHANGE_TIMEOUT", 1.0)),
+            interval=float(getattr(cfg, "ACTION_CHANGE_INTERVAL", 0.05)),
+            threshold=float(getattr(cfg, "ACTION_CHANGE_THRESHOLD", 0.00002)),
+            max_dim=_change_dim(),
+        )
+    except Exception as e:
+        print(f"[ACTION] change sampling failed ({e}) -> fixed pause.")
         _pause_after_action()
-        return
+        return ActionResult(a)
+    if not changed:
+        print(f"[ACTION] {a}: no visible change within {time.time() - t0:.2f}s.")
+    return ActionResult(a, changed=changed, change=frac, waited=time.time() - t0, before=before)
+
+
+def had_no_effect(sandbox: Sandbox, result: Any, since: Optional[float] = None) -> bool:
+    """
+    True if `result` (from execute_action) saw no visible change AND the screen
+    still matches the pre-action thumbnail now (late effects count), so the
+    caller can skip a VLM verification call. `since`: accept a frame captured
+    after that time (the post-action wait's last sample). Off with SKIP_VERIFY_ON_NO_CHANGE=False.
+    """
+    if not isinstance(result, ActionResult) or result.changed is not False or result.before is None:
+        return False
+    if not getattr(cfg, "SKIP_VERIFY_ON_NO_CHANGE", True):
+        return False
+    try:
+        now = grab_thumb(sandbox, _change_dim(), since)
+    except Exception:
+        return False
+    return change_fraction(result.before, now) < float(getattr(cfg, "ACTION_CHANGE_THRESHOLD", 0.00002))
+
+
+def execute_action(sandbox: Sandbox, act: Dict[str, Any], confirm: Optional[bool] = None) -> ActionResult:
+    """
+    Execute one action dict produced by the model.
+    confirm (default CONFIRM_ACTION_CHANGE): wait for a visible change instead
+    of a fixed pause; the result's `changed` says whether one was seen.
+    """
+    a = (act.get("action") or "NOOP").upper()
+
+    if a == "NOOP":
+        return ActionResult(a)
+
+    if a == "WAIT":
+        secs = float(act.get("seconds") or 0.5)
+        time.sleep(max(0.0, min(30.0, secs)))
+        return ActionResult(a)
+
+    if a in _VISUAL_ACTIONS:
+        if confirm is None:
+            confirm = bool(getattr(cfg, "CONFIRM_ACTION_CHANGE", True))
+        return _execute_visual(sandbox, a, act, confirm)
 
     # Optional actions (manual / advanced)
     if a == "MOVE":
         sandbox.mouse_move_norm(float(act.get("x", 0.5)), float(act.get("y", 0.5)))
-        return
+        return ActionResult(a)
 
     if a == "MOUSE_DOWN":
         sandbox.mouse_down(int(act.get("button", 1)))
-        return
+        return ActionResult(a)
 
     if a == "MOUSE_UP":
         sandbox.mouse_up(int(act.get("button", 1)))
-        return
+        return ActionResult(a)
 
     if a == "DRAG_TO":
         sandbox.drag_to_norm(
@@ -82,9 +147,9 @@ def execute_action(sandbox: Sandbox, act: Dict[str, Any]) -> None:
             float(act.get("y", 0.5)),
             int(act.get("button", 1)),
         )
-        return
+        return ActionResult(a)
 
     if a == "BITTI":
-        return
+        return ActionResult(a)
 
     raise ValueError(f"Unknown action: {a} (act={act})")
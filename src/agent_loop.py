@@ -8,11 +8,15 @@ from typing import Any, Callable, Dict, List, Optional
 from src.config import cfg
 from src.sandbox import Sandbox
 from src.llm_client import ask_next_action
-from src.vision import capture_screen, draw_preview
-from src.guards import validate_xy, should_stop_on_repeat
-from src.actions import execute_action
+from src.vision import capture_screen, draw_preview, export_previews, source_frame
+from src.screen_change import reuse_frame, stamp_frame, wait_for_screen_stable, wait_until_idle
+from src.guards import detect_screen_loop, validate_xy, should_stop_on_repeat
+from src.actions import execute_action, had_no_effect
+from src.grounding import needs_zoom, refine_click
+from src.element_memory import default_memory, memory_key
+from src.frame_ring import export_trajectory, ring_of
 from src.planner import Plan, PlanStep, Planner
-from src.verifier import verify_step, VerifierResult
+from src.verifier import no_effect_result, verify_step, VerifierResult
 
 
 # ─── History helpers ─────────────────────────────────────────────────
@@ -63,8 +67,24 @@ def run_agent_loop(
     Hierarchical agent loop:
     1. Generate plan
     2. For each step: execute → verify → advance/retry/replan
-    Returns final status string.
+    Returns final status string. The screens seen on the way (this objective
+    only) are written to TRAJECTORY_PATH from the sandbox's frame ring.
     """
+    started = time.time()
+    try:
+        return _run_plans(sandbox, llm, planner, objective, log_fn)
+    finally:
+        export_trajectory(sandbox, since=started)
+        export_previews()
+
+
+def _run_plans(
+    sandbox: Sandbox,
+    llm,
+    planner: Planner,
+    objective: str,
+    log_fn: Optional[Callable[[str], None]] = None,
+) -> str:
 
     def _log(msg: str) -> None:
         if log_fn:
@@ -74,6 +94,7 @@ def run_agent_loop(
     max_replan = getattr(cfg, "PLANNER_MAX_REPLAN", 2)
     global_step_count = 0
     replan_count = 0
+    vlm_calls_saved = 0
 
     # ── Initial plan ──────────────────────────────────────────────
     _log(f"\n{'='*60}")
@@ -107,6 +128,9 @@ def run_agent_loop(
 
         global_step_count = result["global_step_count"]
         status = result["status"]
+        if result.get("vlm_calls_saved"):
+            vlm_calls_saved += result["vlm_calls_saved"]
+            _log(f"[AGENT] Loading detector saved ~{vlm_calls_saved} VLM call(s) so far.")
 
         if status == "COMPLETED":
             _log(f"\n[AGENT] ✓ Objective completed successfully!")
@@ -153,8 +177,14 @@ def _execute_plan(
       - global_step_count: updated count
       - stuck_step: step title if stuck (for replan context)
       - failure_info: last verifier failure info
+      - vlm_calls_saved: model calls avoided by waiting out loading screens
     """
     history: List[Dict[str, Any]] = []
+    vlm_calls_saved = 0  # by waiting out loading screens (IdleWait.calls_saved)
+    # last frame whose screen no action has touched since (see reuse_frame)
+    carried = None
+    memory = default_memory()
+    ring = ring_of(sandbox)
 
     for step_idx, step in enumerate(plan.steps):
         log_fn(f"\n{'─'*50}")
@@ -168,6 +198,7 @@ def _execute_plan(
         attempts = 0
         verifier_hint = ""
         step_done = False
+        step_started = time.time()
 
         while attempts < step.max_attempts:
             attempts += 1
@@ -178,20 +209,41 @@ def _execute_plan(
                 return {
                     "status": "MAX_STEPS_EXCEEDED",
                     "global_step_count": global_step_count,
+                    "vlm_calls_saved": vlm_calls_saved,
                 }
 
             log_fn(f"\n  [ATTEMPT {attempts}/{step.max_attempts}] (global action #{global_step_count})")
 
             # ── 1. Capture screenshot ─────────────────────────────
-            time.sleep(cfg.WAIT_BEFORE_SCREENSHOT_SEC)
-            img = capture_screen(sandbox, cfg.SCREENSHOT_PATH)
+            img = reuse_frame(sandbox, carried)
+            if img is not None:
+                log_fn(f"  [CAPTURE] Screen unchanged since verification, reusing that frame.")
+                img_ts = carried.ts
+                if ring is not None:
+                    ring.push(img, "executor")  # still an attempt on this screen (detect_screen_loop)
+            else:
+                since = time.time()
+                wait_for_screen_stable(sandbox)
+                img = capture_screen(sandbox, cfg.SCREENSHOT_PATH, label="executor", newer_than=since)
+                img_ts = time.time()
+
+            looping, why = detect_screen_loop(ring, since=step_started)
+            if looping:
+                log_fn(f"  [GUARD] {why}")
+                verifier_hint = f"{verifier_hint} {why} Try a different approach.".strip()
 
             # ── 2. Ask executor for next action ───────────────────
             enriched_objective = _build_executor_objective(objective, step, verifier_hint)
 
-            out: Optional[Dict[str, Any]] = None
+            # a click remembered for this step, found by template matching, needs no model call
+            recalled = memory.recall(img, memory_key(objective, step.title)) if memory is not None and attempts == 1 else None
+            out: Optional[Dict[str, Any]] = recalled.as_action() if recalled else None
+            if recalled:
+                log_fn(f"  [MEMORY] '{recalled.label}' matched (score={recalled.score:.2f}), no executor call.")
             for retry in range(cfg.MODEL_RETRY + 1):
-                out = ask_next_action(llm, enriched_objective, cfg.SCREENSHOT_PATH, _trim_history(history))
+                if out is not None:
+                    break
+                out = ask_next_action(llm, enriched_objective, img, _trim_history(history))
                 action = (out.get("action") or "NOOP").upper()
 
                 # If executor says BITTI, treat step as done
@@ -226,13 +278,21 @@ def _execute_plan(
 
             log_fn(f"  [EXECUTOR] {json.dumps(out, ensure_ascii=False)}")
 
-            # ── 3. Apply repeat guard ─────────────────────────────
+            # ── 3. Apply repeat guard (before spending a zoom call) ─
             stop, why = should_stop_on_repeat(history, out)
             if stop:
                 log_fn(f"  [GUARD] {why}")
                 verifier_hint = f"Action was blocked by repeat guard: {why}. Try something different."
                 continue
 
+            # ── 3b. Zoom in on small / uncertain click targets ────
+            if recalled is None and needs_zoom(out):
+                coarse = (out["x"], out["y"])
+                out, refined = refine_click(llm, sandbox, enriched_objective, out)
+                if refined:
+                    log_fn(f"  [ZOOM] ({float(coarse[0]):.3f}, {float(coarse[1]):.3f}) -> "
+                           f"({out['x']:.3f}, {out['y']:.3f})")
+
             # ── 4. Draw preview (optional) ────────────────────────
             action = (out.get("action") or "").upper()
             if action in ("CLICK", "DOUBLE_CLICK", "RIGHT_CLICK"):
@@ -240,27 +300,47 @@ def _execute_plan(
                 draw_preview(img, float(out["x"]), float(out["y"]), preview_path)
 
             # ── 5. Execute action ─────────────────────────────────
-            execute_action(sandbox, out)
+            res = execute_action(sandbox, out)
             history.append(out)
+            carried = None
 
-            # ── 6. Capture post-action screenshot ─────────────────
-            time.sleep(cfg.WAIT_BEFORE_SCREENSHOT_SEC)
-            capture_screen(sandbox, cfg.SCREENSHOT_PATH)
+            # ── 6. Wait for the screen to settle and finish loading ──
+            # (spinners / progress bars pass a settle check; they are waited out here)
+            since = time.time()
+            idle = wait_until_idle(sandbox)
 
             # ── 7. Verify step completion ─────────────────────────
-            log_fn(f"  [VERIFIER] Checking step completion...")
-            try:
-                vr: VerifierResult = verify_step(llm, step, cfg.SCREENSHOT_PATH)
-            except Exception as e:
-                log_fn(f"  [VERIFIER] ERROR: {e}")
-                vr = VerifierResult(
-                    step_id=step.id,
-                    done=False,
-                    evidence=[f"verifier error: {e}"],
-                    failure_type="OTHER",
-                    suggested_fix="retry the step",
-                    confidence=0.1,
-                )
+            no_effect = had_no_effect(sandbox, res, since)
+            if not no_effect and idle.was_busy:
+                vlm_calls_saved += idle.calls_saved
+                log_fn(f"  [LOADING] Busy region {idle.region or ''} for {idle.waited:.1f}s "
+                       f"({'idle now' if idle.idle else 'still moving, verifying anyway'}), "
+                       f"~{idle.calls_saved} VLM call(s) saved.")
+
+            if no_effect:
+                # nothing on screen changed: no need to ask the VLM
+                log_fn(f"  [VERIFIER] Skipped: the action had no visible effect.")
+                vr = no_effect_result(step.id)
+                carried = stamp_frame(sandbox, img, img_ts, res.before)
+            else:
+                # a region still moving after LOADING_TIMEOUT (video, animation) is named, not waited on
+                busy = None if idle.idle else idle.busy_box()
+                after = capture_screen(sandbox, cfg.SCREENSHOT_PATH, label="verifier", newer_than=since)
+                carried = stamp_frame(sandbox, after, newer_than=since)
+                log_fn(f"  [VERIFIER] Checking step completion...")
+                try:
+                    vr = verify_step(llm, step, after, before=img, source=source_frame(sandbox, after),
+                                     busy=busy)
+                except Exception as e:
+                    log_fn(f"  [VERIFIER] ERROR: {e}")
+                    vr = VerifierResult(
+                        step_id=step.id,
+                        done=False,
+                        evidence=[f"verifier error: {e}"],
+                        failure_type="OTHER",
+                        suggested_fix="retry the step",
+                        confidence=0.1,
+                    )
 
             log_fn(f"  [VERIFIER] done={vr.done}, confidence={vr.confidence:.2f}, "
                    f"failure_type={vr.failure_type}")
@@ -273,15 +353,20 @@ def _execute_plan(
                 return {
                     "status": "NEEDS_REPLAN",
                     "global_step_count": global_step_count,
+                    "vlm_calls_saved": vlm_calls_saved,
                     "stuck_step": step.title,
                     "failure_info": f"Global stop: {vr.evidence}",
                 }
 
             if vr.done:
                 log_fn(f"  [STEP {step.id}] ✓ Verified as complete!")
+                if memory is not None and recalled is None:
+                    memory.remember(img, out, memory_key(objective, step.title))
                 step_done = True
                 break
             else:
+                if recalled is not None:
+                    memory.forget(recalled.entry_id)
                 # Build hint for next attempt
                 verifier_hint = (
                     f"Previous attempt did NOT satisfy success criteria. "
@@ -297,6 +382,7 @@ def _execute_plan(
             return {
                 "status": "NEEDS_REPLAN",
                 "global_step_count": global_step_count,
+                "vlm_calls_saved": vlm_calls_saved,
                 "stuck_step": step.title,
                 "failure_info": verifier_hint or "max attempts exhausted",
             }
@@ -305,6 +391,7 @@ def _execute_plan(
     return {
         "status": "COMPLETED",
         "global_step_count": global_step_count,
+        "vlm_calls_saved": vlm_calls_saved,
     }
 
 
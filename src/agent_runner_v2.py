@@ -1,13 +1,14 @@
 # agent_runner_v2.py — Plan-based agent execution
 from __future__ import annotations
 
-import time
 import threading
+import time
 from typing import Any, Dict, List, Optional, Callable, Tuple
 
 from src.config import cfg
 from src.sandbox import Sandbox
-from src.vision import capture_screen, draw_preview
+from src.vision import capture_screen, draw_preview, export_previews
+from src.screen_change import wait_for_screen_stable
 from src.guards import validate_xy, should_stop_on_repeat
 from src.actions import execute_action
 from src.llm_client import ask_next_action
@@ -71,13 +72,14 @@ def run_single_substep(
             return "STOPPED"
 
         _log(f"    [Step {step}]", "info")
-        time.sleep(getattr(cfg, "WAIT_BEFORE_SCREENSHOT_SEC", 0.1))
-        img = capture_screen(sandbox, cfg.SCREENSHOT_PATH)
+        since = time.time()
+        wait_for_screen_stable(sandbox)
+        img = capture_screen(sandbox, cfg.SCREENSHOT_PATH, newer_than=since)
 
         out: Optional[Dict[str, Any]] = None
 
         for attempt in range(getattr(cfg, "MODEL_RETRY", 2) + 1):
-            out = ask_next_action(llm, objective, cfg.SCREENSHOT_PATH, trim_history(history))
+            out = ask_next_action(llm, objective, img, trim_history(history))
             action = (out.get("action") or "NOOP").upper()
 
             if action == "BITTI":
@@ -133,7 +135,21 @@ def run_planned_command(
     """
     Execute a list of planned sub-steps sequentially.
     Each sub-step becomes the objective for Qwen3-VL.
+    The plan's click previews are exported at the end (export_previews).
     """
+    try:
+        return _run_plan_steps(sandbox, llm, plan_steps, log, stop_event)
+    finally:
+        export_previews()
+
+
+def _run_plan_steps(
+    sandbox: Sandbox,
+    llm,
+    plan_steps: List[str],
+    log: Optional[Callable[[str, str], None]],
+    stop_event: Optional[threading.Event],
+) -> str:
     def _log(msg: str, level: str = "info"):
         if log:
             log(msg, level)
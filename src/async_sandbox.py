@@ -0,0 +1,243 @@
+# async_sandbox.py — asyncio-native computer-server client (same surface as Sandbox)
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+from PIL import Image
+
+from src.sandbox import (
+    ContainerLifecycle,
+    _CmdStreamParser,
+    _STREAM_CHUNK,
+    _clip_box,
+    _decode_screenshot,
+    _downscale,
+    _norm_to_px,
+    _parse_resolution,
+    _parse_screen_size,
+    _safe_getattr,
+)
+
+
+async def _aparse_sse_or_json(resp: aiohttp.ClientResponse) -> Any:
+    """
+    Async counterpart of _parse_sse_or_json: the body is fed chunk by chunk to
+    the same incremental parser Sandbox uses, so both clients accept exactly
+    the same payloads (and screenshots are decoded without a str round trip).
+    """
+    parser = _CmdStreamParser()
+    async for chunk in resp.content.iter_chunked(_STREAM_CHUNK):
+        parser.feed(chunk)
+    return parser.close()
+
+
+class AsyncSandbox:
+    """
+    asyncio version of Sandbox for driving many containers from one event loop.
+
+    HTTP goes through one aiohttp.ClientSession (keep-alive, HTTP_POOL_SIZE
+    connections). Pass `session=` to share one connector across dozens of
+    sandboxes. Docker lifecycle (Engine API or docker CLI) is blocking, so start()
+    and stop() run it in a worker thread; everything after that is non-blocking.
+    """
+
+    def __init__(self, cfg, session: Optional[aiohttp.ClientSession] = None):
+        self.cfg = cfg
+        # Lifecycle (docker run/rm) and derived names/ports, shared with the sync client.
+        self._lifecycle = ContainerLifecycle(cfg)
+
+        self.container_name = self._lifecycle.container_name
+        self.base_url = self._lifecycle.base_url
+        self.cmd_url = self._lifecycle.cmd_url
+        self.status_url = self._lifecycle.status_url
+        self.host_vnc_port = self._lifecycle.host_vnc_port
+        self.host_novnc_port = self._lifecycle.host_novnc_port
+
+        self.api_ready_timeout = self._lifecycle.api_ready_timeout
+        self.api_ready_interval = self._lifecycle.api_ready_interval
+        self.http_timeout = self._lifecycle.http_timeout
+        self.cmd_timeouts = self._lifecycle.cmd_timeouts
+        self.pool_size = int(_safe_getattr(cfg, "HTTP_POOL_SIZE", 8))
+
+        self._session = session
+        self._owns_session = session is None
+
+        # geometry from VNC_RESOLUTION / frames; see Sandbox.get_screen_size
+        self._screen_cache: Optional[Tuple[int, int]] = None
+
+    async def __aenter__(self) -> "AsyncSandbox":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+            )
+            self._owns_session = True
+        return self._session
+
+    async def close(self) -> None:
+        """Close the HTTP session if this sandbox created it (the container keeps running)."""
+        if self._owns_session and self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._lifecycle.close()
+
+    # -----------------------
+    # Lifecycle
+    # -----------------------
+    async def start(self) -> None:
+        await asyncio.to_thread(self._lifecycle._ensure_container)
+        self._lifecycle._watch_container = True
+        self._screen_cache = _parse_resolution(self._lifecycle.vnc_resolution) or self._screen_cache
+        await self._wait_api_ready(timeout=self.api_ready_timeout)
+
+    async def stop(self) -> None:
+        await asyncio.to_thread(self._lifecycle.stop)
+
+    # -----------------------
+    # Readiness
+    # -----------------------
+    async def _wait_api_ready(self, timeout: float) -> None:
+        """
+        Same strategy as Sandbox._wait_api_ready: short probes of /status, then
+        /cmd get_screen_size, exponential backoff, container-state checks.
+        """
+        print(f"[SANDBOX] Waiting up to {int(timeout)}s for API to become ready at {self.cmd_url} ...")
+        lc = self._lifecycle
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        last_err: Optional[Exception] = None
+        session = self._get_session()
+        probe = aiohttp.ClientTimeout(total=lc.api_probe_timeout, connect=lc.api_probe_connect_timeout)
+        delay = lc.api_ready_min_interval
+        next_state_check = t0 + lc.api_state_interval
+        has_status = True
+
+        while loop.time() - t0 < timeout:
+            if loop.time() >= next_state_check:
+                await asyncio.to_thread(lc._check_container_alive)
+                next_state_check = loop.time() + lc.api_state_interval
+
+            if has_status:
+                try:
+                    async with session.get(self.status_url, timeout=probe) as r:
+                        if r.status == 200:
+                            print(f"[SANDBOX] API ready (/status) after {loop.time() - t0:.2f}s: {self.container_name}")
+                            return
+                        if r.status == 404:
+                            has_status = False
+                except Exception as e:
+                    last_err = e
+
+            try:
+                res = await self._post_cmd("get_screen_size", {}, timeout=lc.api_probe_timeout)
+                if isinstance(res, dict) and res.get("success") is True:
+                    print(f"[SANDBOX] API ready (/cmd) after {loop.time() - t0:.2f}s: {self.container_name}")
+                    return
+            except Exception as e:
+                last_err = e
+
+            await asyncio.sleep(max(0.0, min(delay, timeout - (loop.time() - t0))))
+            delay = min(delay * 2.0, lc.api_ready_interval)
+
+        raise TimeoutError(f"Sandbox API did not become ready in time. Last error: {last_err}")
+
+    # -----------------------
+    # Low-level /cmd
+    # -----------------------
+    async def _post_cmd(self, command: str, params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        body = {"command": command, "params": params or {}}
+        if timeout is None:
+            timeout = self.cmd_timeouts.get(command, self.http_timeout)
+        session = self._get_session()
+        async with session.post(self.cmd_url, json=body, timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+            parsed = await _aparse_sse_or_json(r)
+        if not isinstance(parsed, dict):
+            raise ValueError(f"Unexpected parsed type from /cmd: {type(parsed)}")
+        return parsed
+
+    # -----------------------
+    # Public actions
+    # -----------------------
+    async def screenshot(self, region: Optional[Tuple[int, int, int, int]] = None,
+                         max_dim: Optional[int] = None) -> Image.Image:
+        """Same contract as Sandbox.screenshot (crop/scale done client-side here)."""
+        res = await self._post_cmd("screenshot", {})
+        # PNG decode (and crop/scale) is CPU-bound; keep it off the event loop.
+        img = await asyncio.to_thread(_decode_screenshot, res)
+        self._screen_cache = img.size
+        if region is None and max_dim is None:
+            return img
+
+        def _finish() -> Image.Image:
+            out = img.crop(_clip_box(region, img.size)) if region is not None else img
+            return _downscale(out, max_dim) if max_dim else out
+        return await asyncio.to_thread(_finish)
+
+    async def get_screen_size(self) -> Tuple[int, int]:
+        if self._screen_cache is not None:
+            return self._screen_cache
+
+        res = await self._post_cmd("get_screen_size", {})
+        w, h = _parse_screen_size(res)
+        self._screen_cache = (w, h)
+        return w, h
+
+    def invalidate_screen_size(self) -> None:
+        self._screen_cache = None
+
+    async def _norm_to_px(self, x: float, y: float) -> Tuple[int, int]:
+        w, h = await self.get_screen_size()
+        return _norm_to_px(x, y, w, h)
+
+    async def left_click_norm(self, x: float, y: float) -> None:
+        px, py = await self._norm_to_px(x, y)
+        await self._post_cmd("left_click", {"x": px, "y": py})
+
+    async def right_click_norm(self, x: float, y: float) -> None:
+        px, py = await self._norm_to_px(x, y)
+        await self._post_cmd("right_click", {"x": px, "y": py})
+
+    async def double_click_norm(self, x: float, y: float) -> None:
+        px, py = await self._norm_to_px(x, y)
+        await self._post_cmd("double_click", {"x": px, "y": py})
+
+    async def type_text(self, text: str) -> None:
+        await self._post_cmd("type_text", {"text": str(text)})
+
+    async def press_key(self, key: str) -> None:
+        await self._post_cmd("press_key", {"key": str(key)})
+
+    async def hotkey(self, keys) -> None:
+        await self._post_cmd("hotkey", {"keys": list(keys)})
+
+    async def scroll(self, amount: int) -> None:
+        await self._post_cmd("scroll", {"amount": int(amount)})
+
+    async def mouse_move_norm(self, x: float, y: float) -> None:
+        px, py = await self._norm_to_px(x, y)
+        await self._post_cmd("move_cursor", {"x": px, "y": py})
+
+    async def mouse_down(self, button: int = 1) -> None:
+        await self._post_cmd("mouse_down", {"button": int(button)})
+
+    async def mouse_up(self, button: int = 1) -> None:
+        await self._post_cmd("mouse_up", {"button": int(button)})
+
+    async def drag_to_norm(self, x: float, y: float, button: int = 1) -> None:
+        px, py = await self._norm_to_px(x, y)
+        await self._post_cmd("drag_to", {"x": px, "y": py, "button": int(button)})
+
+    async def key_down(self, key: str) -> None:
+        await self._post_cmd("key_down", {"key": str(key)})
+
+    async def key_up(self, key: str) -> None:
+        await self._post_cmd("key_up", {"key": str(key)})
+
+    async def wait(self, seconds: float) -> None:
+        await asyncio.sleep(float(seconds))
@@ -0,0 +1,114 @@
+# capture.py — Pluggable screenshot backends for Sandbox.screenshot()
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from src.frame import Frame, FramePool
+from src.rfb import RFBClient
+
+
+class CaptureBackend(ABC):
+    name: str = ""
+
+    @abstractmethod
+    def grab(self) -> Image.Image:
+        """Return the current screen as an RGB image."""
+        ...
+
+    def grab_region(self, box: Tuple[int, int, int, int]) -> Image.Image:
+        """Region (left, top, right, bottom) of the current screen; backends may avoid the full copy."""
+        return self.grab().crop(box)
+
+    def grab_frame(self) -> Frame:
+        """Current screen as a Frame; backends with raw pixels fill a pooled buffer instead of a PIL image."""
+        return Frame(image=self.grab())
+
+    def close(self) -> None:
+        pass
+
+
+class HttpCapture(CaptureBackend):
+    """computer-server `/cmd screenshot`: one full base64 PNG per frame."""
+
+    name = "http"
+
+    def __init__(self, sandbox):
+        self._sandbox = sandbox
+
+    def grab(self) -> Image.Image:
+        return self._sandbox._screenshot_http()
+
+
+class VncCapture(CaptureBackend):
+    """
+    Serves frames from a persistent RFB connection to the container's VNC port.
+    Incremental updates are applied in the background, so grab() is a memory
+    copy with no HTTP call. The connection is opened lazily and re-opened if the
+    reader thread died (container restart, VNC server crash).
+    """
+
+    name = "vnc"
+
+    def __init__(self, host: str, port: int, password: str = "", timeout: float = 10.0,
+                 update_interval: float = 0.03):
+        self.host = host
+        self.port = int(port)
+        self.password = password
+        self.timeout = float(timeout)
+        self.update_interval = float(update_interval)
+        self._client: Optional[RFBClient] = None
+        self._pool = FramePool()
+
+    def _get_client(self) -> RFBClient:
+        if self._client is not None and self._client.alive:
+            return self._client
+        if self._client is not None:
+            self._client.close()
+        client = RFBClient(self.host, self.port, self.password, self.timeout, self.update_interval)
+        try:
+            client.start()
+        except Exception:
+            client.close()
+            raise
+        print(f"[CAPTURE] VNC framebuffer connected: {self.host}:{self.port} "
+              f"({client.width}x{client.height})")
+        self._client = client
+        return client
+
+    def grab(self) -> Image.Image:
+        return self.grab_frame().image
+
+    def grab_frame(self) -> Frame:
+        # BGRX framebuffer -> RGB straight into a recycled buffer: no per-frame allocation
+        client = self._get_client()
+        buf = self._pool.acquire(client.width, client.height)
+        return Frame(array=client.snapshot_rgb(timeout=self.timeout, out=buf))
+
+    def grab_region(self, box: Tuple[int, int, int, int]) -> Image.Image:
+        # slice the framebuffer under the lock: only the region is copied
+        arr = self._get_client().snapshot_rgb(timeout=self.timeout, box=box)
+        return Image.fromarray(arr, "RGB")
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+def make_capture_backend(sandbox, cfg) -> CaptureBackend:
+    """Pick the backend named by cfg.CAPTURE_BACKEND ("http" | "vnc")."""
+    kind = str(getattr(cfg, "CAPTURE_BACKEND", "http")).lower()
+    if kind == "vnc":
+        return VncCapture(
+            host=sandbox.api_host,
+            port=sandbox.host_vnc_port,
+            password=getattr(cfg, "VNC_PASSWORD", ""),
+            timeout=float(getattr(cfg, "VNC_CONNECT_TIMEOUT", 10.0)),
+            update_interval=float(getattr(cfg, "VNC_UPDATE_INTERVAL", 0.03)),
+        )
+    if kind != "http":
+        print(f"[WARN] Unknown CAPTURE_BACKEND '{kind}', using http.")
+    return HttpCapture(sandbox)
@@ -65,6 +65,27 @@ class CFG:
     NOVNC_PORT: int = 6901
     API_PORT: int = 8001
 
+    # Screenshot source: "http" (/cmd screenshot PNG) | "vnc" (persistent RFB framebuffer)
+    CAPTURE_BACKEND: str = "http"
+    VNC_PASSWORD: str = ""              # only if the VNC server asks for VNC auth
+    VNC_UPDATE_INTERVAL: float = 0.03   # min seconds between incremental update requests
+
+    # Container lifecycle: "auto" (Docker Engine API over the unix socket, CLI fallback) | "api" | "cli"
+    DOCKER_BACKEND: str = "auto"
+    DOCKER_HOST: str = ""               # "" -> $DOCKER_HOST, then unix:///var/run/docker.sock
+
+    # Warm pool (src/sandbox_pool.py): slot i -> container f"{POOL_NAME_PREFIX}_{i}",
+    # host ports POOL_PORT_BASE + 3*i + (API, VNC, noVNC)
+    POOL_SIZE: int = 2
+    POOL_NAME_PREFIX: str = "cua_pool"
+    POOL_PORT_BASE: int = 20000
+    POOL_RECYCLE: str = "replace"       # "replace" (fresh container) | "reset" (baseline) | "reuse"
+
+    # Sandbox.reset(baseline): "session" (kill processes newer than the baseline and
+    # restore RESET_PATHS from a tarball) | "commit" (re-create from a committed image)
+    RESET_MODE: str = "session"
+    RESET_PATHS: tuple = ("/home",)
+
     # Docker run settings
     DOCKER_SHM_SIZE: str = "512m"
     VNC_RESOLUTION: str = "1920x1080"
@@ -80,9 +101,28 @@ class CFG:
     PAUSE_AFTER_CLICK_SEC: float = 0.25
 
     SCREENSHOT_PATH: str = "./img/screen.png"
+    # Also write each VLM screenshot to SCREENSHOT_PATH (in the background; the model
+    # gets frames in memory, so this is only for looking at what the agent saw)
+    SAVE_SCREENSHOTS: bool = True
+    # VLM screenshot payload: "PNG" (lossless) | "JPEG" | "WEBP". Quality is for JPEG/WebP;
+    # JPEG chroma subsampling "4:4:4" keeps thin coloured text crisp, "4:2:0" is smallest
+    VLM_IMAGE_FORMAT: str = "PNG"
+    VLM_IMAGE_QUALITY: int = 85
+    VLM_JPEG_SUBSAMPLING: str = "4:4:4"
     MAX_DIM: int = 640
 
     PREVIEW_PATH_TEMPLATE: str = "./img/click_preview_step_{i}.png"
+    # Click previews are drawn and written on a background thread (at most PREVIEW_QUEUE_SIZE
+    # pending, oldest dropped); PREVIEW_ENABLED=False skips them entirely (headless runs).
+    # With PREVIEW_SHEET_PATH set, an objective's previews (PREVIEW_SHEET_DIM thumbnails) are
+    # also written there at its end: .gif/.webp = animation (PREVIEW_FRAME_MS per frame),
+    # anything else = PNG contact sheet ("" = off)
+    PREVIEW_ENABLED: bool = True
+    PREVIEW_QUEUE_SIZE: int = 8
+    PREVIEW_SHEET_PATH: str = ""
+    PREVIEW_SHEET_DIM: int = 320
+    PREVIEW_SHEET_MAX: int = 64  # newest previews kept for the sheet
+    PREVIEW_FRAME_MS: int = 800
 
     MIN_MARGIN: float = 0.02
     CONFIDENCE_MIN: float = 0.15
@@ -90,16 +130,93 @@ class CFG:
     WAIT_CHANGE_TIMEOUT: float = 3.0
     WAIT_CHANGE_INTERVAL: float = 0.25
     CHANGE_THRESHOLD: float = 0.02
+    # Wait for the screen to settle before each screenshot (instead of WAIT_BEFORE_SCREENSHOT_SEC)
+    WAIT_FOR_STABLE_SCREEN: bool = True
+    WAIT_CHANGE_STABLE_SAMPLES: int = 2
+    CHANGE_SAMPLE_DIM: int = 160
+    CHANGE_PIXEL_DELTA: int = 24
+    # Wait for an action's visible effect (instead of PAUSE_AFTER_CLICK_SEC); skip verify if none
+    CONFIRM_ACTION_CHANGE: bool = True
+    ACTION_CHANGE_TIMEOUT: float = 1.0
+    ACTION_CHANGE_INTERVAL: float = 0.05
+    ACTION_CHANGE_THRESHOLD: float = 0.00002  # ~3 px of a 480x270 thumbnail
+    ACTION_CHANGE_DIM: int = 480
+    SKIP_VERIFY_ON_NO_CHANGE: bool = True
+    # Reuse the verifier's frame as the next executor frame while the screen is unchanged
+    REUSE_FRAMES: bool = True
+    FRAME_REUSE_MAX_AGE: float = 15.0
+    # Ring of recent downscaled screens; each run's frames go to TRAJECTORY_PATH ("" = off)
+    FRAME_RING_BYTES: int = 8 * 2**20
+    FRAME_RING_DIM: int = 320
+    TRAJECTORY_PATH: str = "./img/trajectory.npz"
+    # Re-ask uncertain / small-target clicks on a full-resolution crop (src/grounding.py)
+    ZOOM_GROUNDING: bool = True
+    ZOOM_CONFIDENCE_BELOW: float = 0.7
+    ZOOM_REGION_PX: int = 480
+    ZOOM_SMALL_TARGETS: Tuple[str, ...] = (
+        "icon", "button", "close", "tray", "checkbox", "radio", "tab", "menu", "arrow", "toggle",
+    )
+    ZOOM_SMALL_CONFIDENCE_BELOW: float = 0.9  # small targets zoom only below this confidence
+    # Replay verified clicks by template matching, no executor call (src/element_memory.py)
+    ELEMENT_MEMORY: bool = False
+    ELEMENT_MEMORY_DIR: str = "./element_memory"
+    ELEMENT_MEMORY_MAX: int = 200
+    ELEMENT_PATCH_PX: int = 48
+    ELEMENT_MIN_STD: float = 8.0
+    ELEMENT_MATCH_MIN: float = 0.92
+    ELEMENT_MATCH_MARGIN: float = 0.05
 
     MAX_STEPS: int = 20
     MODEL_RETRY: int = 2
     API_READY_TIMEOUT: int = 120  # seconds
-
-    # Sandbox screen size cache (seconds)
-    SCREEN_CACHE_TTL: float = 0.5
+    # Readiness probes: short per-probe timeout, polling backs off MIN -> API_READY_INTERVAL,
+    # container state checked every API_STATE_INTERVAL seconds (fail fast if it exits)
+    API_PROBE_TIMEOUT: float = 2.0
+    API_READY_MIN_INTERVAL: float = 0.05
+    API_READY_INTERVAL: float = 1.0
+    API_STATE_INTERVAL: float = 2.0
+
+    # Sandbox HTTP transport (keep-alive pool shared by agent + GUI threads)
+    HTTP_TIMEOUT: float = 30.0
+    HTTP_POOL_SIZE: int = 8
+    # Per-command timeout overrides (seconds); others use HTTP_TIMEOUT
+    HTTP_CMD_TIMEOUTS: Tuple[Tuple[str, float], ...] = (
+        ("move_cursor", 5.0),
+        ("drag_to", 5.0),
+        ("mouse_down", 5.0),
+        ("mouse_up", 5.0),
+        ("get_screen_size", 5.0),
+    )
+    # Pipeline Sandbox.batch()/send_many() commands over one connection
+    SANDBOX_PIPELINE: bool = True
+    # Ask computer-server to crop/scale screenshot(region=..., max_dim=...) itself
+    # (auto-detected; client-side fallback when the server ignores it)
+    SCREENSHOT_SERVER_CROP: bool = True
+    # Command transport: "http" (POST /cmd) | "ws" (one persistent WebSocket, HTTP fallback)
+    SANDBOX_TRANSPORT: str = "http"
+    WS_PATH: str = "/ws"
+    WS_HEARTBEAT_INTERVAL: float = 10.0  # ping period (seconds)
+    WS_HEARTBEAT_TIMEOUT: float = 30.0   # reconnect if nothing received for this long
+
+    # Wait out spinners / page loads after an action; still moving after LOADING_TIMEOUT -> verify anyway
+    WAIT_FOR_IDLE: bool = True
+    LOADING_TIMEOUT: float = 8.0
+    LOADING_INTERVAL: float = 0.08
+    LOADING_WINDOW: int = 4
+    LOADING_STD: float = 10.0
+    LOADING_MIN_PIXELS: int = 6
+    # Verifier: a full-resolution close-up of the changed region instead of the whole screen
+    VERIFIER_CROP: bool = False
+    VERIFIER_CROP_CONTEXT: float = 0.5
+    VERIFIER_CROP_MIN_PX: int = 32
+    VERIFIER_CROP_MAX_AREA: float = 0.5
+    VERIFIER_CROP_MAX_CHANGE: float = 0.2
 
     # Anti-loop
     REPEAT_CLICK_DISTANCE_PX: int = 10
+    # Screen-loop hint: the executor saw the same screen SCREEN_LOOP_REPEATS times in one step
+    STOP_ON_SCREEN_LOOP: bool = True
+    SCREEN_LOOP_REPEATS: int = 3
 
     ALLOWED_PRESS_KEYS: Tuple[str, ...] = (
         "enter", "tab", "esc", "backspace", "delete",
@@ -0,0 +1,322 @@
+# docker_api.py — Container lifecycle via the Docker Engine API (unix socket), docker CLI as fallback
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import socket
+import struct
+import subprocess
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+DEFAULT_DOCKER_HOST = "unix:///var/run/docker.sock"
+
+
+class DockerError(RuntimeError):
+    pass
+
+
+@dataclass
+class ContainerInfo:
+    """Everything start() needs from one inspect call."""
+    exists: bool
+    running: bool = False
+    status: str = ""
+    env: Dict[str, str] = field(default_factory=dict)
+    id: str = ""
+    image: str = ""
+    restarting: bool = False
+    exit_code: Optional[int] = None
+
+    @classmethod
+    def from_inspect(cls, data: Dict[str, Any]) -> "ContainerInfo":
+        state = data.get("State") or {}
+        env: Dict[str, str] = {}
+        for item in (data.get("Config") or {}).get("Env") or []:
+            if isinstance(item, str) and "=" in item:
+                k, v = item.split("=", 1)
+                env[k] = v
+        return cls(
+            exists=True,
+            running=bool(state.get("Running")),
+            status=str(state.get("Status", "")),
+            env=env,
+            id=str(data.get("Id", "")),
+            image=str((data.get("Config") or {}).get("Image", "")),
+            restarting=bool(state.get("Restarting")),
+            exit_code=state.get("ExitCode"),
+        )
+
+
+@dataclass
+class ContainerSpec:
+    """What `docker run -d` needs for one sandbox container."""
+    name: str
+    image: str
+    env: Dict[str, str] = field(default_factory=dict)
+    ports: List[Tuple[int, int]] = field(default_factory=list)  # (host_port, container_port)
+    shm_size: str = ""
+
+
+def _parse_size(s: str) -> int:
+    """'512m' -> bytes (docker --shm-size syntax)."""
+    s = str(s).strip().lower()
+    if not s:
+        return 0
+    units = {"b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+    if s[-1] in units:
+        return int(float(s[:-1]) * units[s[-1]])
+    return int(s)
+
+
+def _split_image(ref: str) -> Tuple[str, str]:
+    """'docker.io/trycua/cua-xfce:latest' -> ('docker.io/trycua/cua-xfce', 'latest')."""
+    slash = ref.rfind("/")
+    colon = ref.rfind(":")
+    if colon > slash:
+        return ref[:colon], ref[colon + 1:]
+    return ref, "latest"
+
+
+# ─── Engine API over a unix socket ───────────────────────────────────
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self) -> None:
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(self.timeout)
+        s.connect(self._path)
+        self.sock = s
+
+
+class DockerEngine:
+    """
+    Minimal Docker Engine API client. One keep-alive connection to the daemon
+    socket is reused for every call (re-opened, and the request sent again, only
+    if the daemon had dropped it while idle).
+    """
+
+    name = "api"
+
+    def __init__(self, socket_path: str, timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.timeout = float(timeout)
+        self._conn: Optional[_UnixHTTPConnection] = None
+        self._lock = threading.Lock()
+
+    def _request(self, method: str, path: str, body: Any = None) -> Tuple[int, bytes]:
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        with self._lock:
+            for attempt in (0, 1):
+                if self._conn is None:
+                    self._conn = _UnixHTTPConnection(self.socket_path, self.timeout)
+                reused = self._conn.sock is not None
+                try:
+                    self._conn.request(method, path, body=payload, headers=headers)
+                    resp = self._conn.getresponse()
+                    data = resp.read()
+                    if resp.will_close:
+                        self._conn.close()
+                        self._conn = None
+                    return resp.status, data
+                except (http.client.HTTPException, OSError) as e:
+                    self._conn.close()
+                    self._conn = None
+                    # A kept-alive connection closed by the daemon fails before any
+                    # reply: safe to send again. Anything else (a timeout above all)
+                    # may have created/started/exec'd already, so never repeat it.
+                    stale = isinstance(e, (http.client.RemoteDisconnected, BrokenPipeError))
+                    if attempt or not (reused and stale):
+                        raise
+        raise AssertionError("unreachable")
+
+    def _check(self, status: int, data: bytes, what: str) -> None:
+        if status >= 400:
+            try:
+                msg = json.loads(data or b"{}").get("message", "")
+            except ValueError:
+                msg = data[:200].decode("utf-8", errors="replace")
+            raise DockerError(f"{what} failed ({status}): {msg}")
+
+    def ping(self) -> bool:
+        try:
+            status, _ = self._request("GET", "/_ping")
+            return status == 200
+        except OSError:
+            return False
+
+    def inspect(self, name: str) -> ContainerInfo:
+        status, data = self._request("GET", f"/containers/{quote(name)}/json")
+        if status == 404:
+            return ContainerInfo(exists=False)
+        self._check(status, data, f"inspect {name}")
+        return ContainerInfo.from_inspect(json.loads(data))
+
+    def remove(self, name: str) -> None:
+        status, data = self._request("DELETE", f"/containers/{quote(name)}?force=true")
+        if status != 404:
+            self._check(status, data, f"remove {name}")
+
+    def pull(self, image: str) -> None:
+        repo, tag = _split_image(image)
+        qs = urlencode({"fromImage": repo, "tag": tag})
+        status, data = self._request("POST", f"/images/create?{qs}")
+        self._check(status, data, f"pull {image}")
+
+    def run(self, spec: ContainerSpec) -> str:
+        """create + start (pulling the image first if the daemon does not have it)."""
+        body = {
+            "Image": spec.image,
+            "Env": [f"{k}={v}" for k, v in spec.env.items()],
+            "ExposedPorts": {f"{c}/tcp": {} for _, c in spec.ports},
+            "HostConfig": {
+                "PortBindings": {f"{c}/tcp": [{"HostPort": str(h)}] for h, c in spec.ports},
+            },
+        }
+        if spec.shm_size:
+            body["HostConfig"]["ShmSize"] = _parse_size(spec.shm_size)
+
+        path = f"/containers/create?{urlencode({'name': spec.name})}"
+        status, data = self._request("POST", path, body)
+        if status == 404:
+            print(f"[DOCKER] Pulling image {spec.image} ...")
+            self.pull(spec.image)
+            status, data = self._request("POST", path, body)
+        self._check(status, data, f"create {spec.name}")
+        cid = json.loads(data)["Id"]
+
+        status, data = self._request("POST", f"/containers/{cid}/start")
+        if status != 304:
+            self._check(status, data, f"start {spec.name}")
+        return cid
+
+    def exec(self, name: str, cmd: List[str], user: str = "") -> Tuple[int, str]:
+        """Run cmd inside the container; returns (exit_code, combined output)."""
+        body = {"Cmd": list(cmd), "AttachStdout": True, "AttachStderr": True, "User": user}
+        status, data = self._request("POST", f"/containers/{quote(name)}/exec", body)
+        self._check(status, data, f"exec create in {name}")
+        eid = json.loads(data)["Id"]
+        status, data = self._request("POST", f"/exec/{eid}/start", {"Detach": False, "Tty": False})
+        self._check(status, data, f"exec start in {name}")
+        output = _demux(data)
+        status, info = self._request("GET", f"/exec/{eid}/json")
+        self._check(status, info, f"exec inspect in {name}")
+        code = json.loads(info).get("ExitCode")
+        return (int(code) if code is not None else -1), output
+
+    def commit(self, name: str, image: str) -> str:
+        """Snapshot the container filesystem as `image` (repo:tag); returns the image id."""
+        repo, tag = _split_image(image)
+        qs = urlencode({"container": name, "repo": repo, "tag": tag, "pause": "true"})
+        status, data = self._request("POST", f"/commit?{qs}")
+        self._check(status, data, f"commit {name}")
+        return json.loads(data).get("Id", "")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# ─── docker CLI fallback ─────────────────────────────────────────────
+
+class DockerCLI:
+    """Same interface on top of `docker` subprocesses (no socket access, remote contexts, ...)."""
+
+    name = "cli"
+
+    def ping(self) -> bool:
+        try:
+            return subprocess.run(["docker", "version"], capture_output=True).returncode == 0
+        except FileNotFoundError:
+            return False
+
+    def inspect(self, name: str) -> ContainerInfo:
+        r = subprocess.run(["docker", "inspect", name], capture_output=True, text=True)
+        if r.returncode != 0:
+            return ContainerInfo(exists=False)
+        try:
+            data = json.loads(r.stdout or "[]")
+        except ValueError:
+            return ContainerInfo(exists=False)
+        if not data:
+            return ContainerInfo(exists=False)
+        return ContainerInfo.from_inspect(data[0])
+
+    def remove(self, name: str) -> None:
+        subprocess.run(["docker", "rm", "-f", name], check=False)
+
+    def pull(self, image: str) -> None:
+        subprocess.run(["docker", "pull", image], check=True)
+
+    def run(self, spec: ContainerSpec) -> str:
+        cmd = ["docker", "run", "-d", "--name", spec.name]
+        if spec.shm_size:
+            cmd.append(f"--shm-size={spec.shm_size}")
+        for k, v in spec.env.items():
+            cmd += ["-e", f"{k}={v}"]
+        for h, c in spec.ports:
+            cmd += ["-p", f"{h}:{c}"]
+        cmd.append(spec.image)
+        r = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        return (r.stdout or "").strip()
+
+    def exec(self, name: str, cmd: List[str], user: str = "") -> Tuple[int, str]:
+        args = ["docker", "exec"] + (["-u", user] if user else []) + [name] + list(cmd)
+        r = subprocess.run(args, capture_output=True, text=True)
+        return r.returncode, (r.stdout or "") + (r.stderr or "")
+
+    def commit(self, name: str, image: str) -> str:
+        r = subprocess.run(["docker", "commit", name, image], check=True, capture_output=True, text=True)
+        return (r.stdout or "").strip()
+
+    def close(self) -> None:
+        pass
+
+
+def _demux(raw: bytes) -> str:
+    """Docker multiplexed exec stream (8-byte frame headers) -> combined stdout/stderr text."""
+    out = bytearray()
+    i = 0
+    while i + 8 <= len(raw) and raw[i] in (0, 1, 2) and raw[i + 1:i + 4] == b"\0\0\0":
+        (n,) = struct.unpack(">I", raw[i + 4:i + 8])
+        out += raw[i + 8:i + 8 + n]
+        i += 8 + n
+    if i == 0:
+        out = bytearray(raw)  # TTY / unframed
+    return out.decode("utf-8", errors="replace")
+
+
+def _socket_path(docker_host: str) -> Optional[str]:
+    host = docker_host or os.environ.get("DOCKER_HOST", "") or DEFAULT_DOCKER_HOST
+    if host.startswith("unix://"):
+        return host[len("unix://"):]
+    return None
+
+
+def make_docker_client(cfg):
+    """
+    DOCKER_BACKEND: "auto" (Engine API if the unix socket answers, else CLI) | "api" | "cli".
+    DOCKER_HOST: unix:///path/to/docker.sock (defaults to $DOCKER_HOST, then /var/run/docker.sock).
+    """
+    backend = str(getattr(cfg, "DOCKER_BACKEND", "auto")).lower()
+    if backend == "cli":
+        return DockerCLI()
+
+    path = _socket_path(str(getattr(cfg, "DOCKER_HOST", "") or ""))
+    if path and os.path.exists(path):
+        engine = DockerEngine(path, timeout=float(getattr(cfg, "DOCKER_API_TIMEOUT", 60.0)))
+        if backend == "api" or engine.ping():
+            return engine
+        engine.close()
+    if backend == "api":
+        raise DockerError(f"Docker Engine API socket not available: {path}")
+    return DockerCLI()
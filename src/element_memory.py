@@ -0,0 +1,255 @@
+# element_memory.py — Remembered click targets, found again by template matching instead of a VLM call
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from src.config import cfg
+from src.frame import Frame
+from src.guards import CLICK_ACTIONS, validate_xy
+from src.sandbox import _norm_to_px
+from src.screen_change import _gray
+from src.vision import _write_atomic
+
+
+def match_template(image: np.ndarray, templ: np.ndarray) -> np.ndarray:
+    """
+    Normalized cross-correlation (-1..1) of `templ` at every offset where it fits
+    inside `image` (both 2-D). The correlation is one FFT product; the
+    per-window mean/energy comes from integral images. Flat windows score 0.
+    """
+    H, W = image.shape
+    h, w = templ.shape
+    if h > H or w > W:
+        return np.zeros((0, 0))
+    img = image.astype(np.float64)
+    t = templ.astype(np.float64)
+    t -= t.mean()
+    t_norm = float(np.sqrt((t * t).sum()))
+
+    # circular correlation; offsets up to (H-h, W-w) never wrap
+    corr = np.fft.irfft2(np.fft.rfft2(img) * np.conj(np.fft.rfft2(t, (H, W))), (H, W))[:H - h + 1, :W - w + 1]
+
+    def window_sums(a: np.ndarray) -> np.ndarray:
+        ii = np.pad(a, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+        return ii[h:, w:] - ii[:-h, w:] - ii[h:, :-w] + ii[:-h, :-w]
+
+    s = window_sums(img)
+    var = np.maximum(window_sums(img * img) - s * s / (h * w), 0.0)
+    den = np.sqrt(var) * t_norm
+    out = np.zeros_like(corr)
+    np.divide(corr, den, out=out, where=den > 1e-6)
+    return out
+
+
+@dataclass
+class Recall:
+    """A remembered element found on the current frame."""
+    entry_id: str
+    label: str
+    action: str
+    x: float
+    y: float
+    score: float
+
+    def as_action(self) -> Dict[str, Any]:
+        return {
+            "action": self.action, "x": self.x, "y": self.y,
+            "target": self.label, "confidence": round(self.score, 3),
+            "why_short": "element memory match",
+        }
+
+
+def _key(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+
+def memory_key(objective: str, step_title: str) -> str:
+    """Entries are per objective and step: a "Close the dialog" step of one task is not another's."""
+    return f"{_key(objective)} | {_key(step_title)}"
+
+
+class ElementMemory:
+    """
+    Image patches around clicks that were verified as successful, keyed by the
+    objective and step they completed (memory_key), kept under `path`:
+
+      index.json      [{"id", "key", "label", "action", "frame": [w, h],
+                        "offset": [cx, cy], "hits", "last_used"}, ...]
+      <id>.png        grayscale patch (ELEMENT_PATCH_PX around the click)
+
+    Patches come from the VLM-sized frame and are matched against frames of the
+    same size, so a match costs one FFT over MAX_DIM pixels instead of a model call.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.path = path or getattr(cfg, "ELEMENT_MEMORY_DIR", "./element_memory")
+        self.max_entries = int(max_entries or getattr(cfg, "ELEMENT_MEMORY_MAX", 200))
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = []
+        self._patches: Dict[str, np.ndarray] = {}
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ---------- persistence ----------
+    def _index_path(self) -> str:
+        return os.path.join(self.path, "index.json")
+
+    def _load(self) -> None:
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                self._entries = list(json.load(f).get("entries", []))
+        except FileNotFoundError:
+            self._entries = []
+        except Exception as e:
+            print(f"[MEMORY] unreadable index ({e}), starting empty.")
+            self._entries = []
+
+    def _save(self) -> None:
+        data = json.dumps({"version": 1, "entries": self._entries}, ensure_ascii=False, indent=1)
+        try:
+            _write_atomic(self._index_path(), data.encode("utf-8"))
+        except OSError as e:
+            print(f"[MEMORY] could not write index: {e}")
+
+    def _patch(self, entry_id: str) -> Optional[np.ndarray]:
+        patch = self._patches.get(entry_id)
+        if patch is None:
+            try:
+                with Image.open(os.path.join(self.path, f"{entry_id}.png")) as img:
+                    patch = np.asarray(img.convert("L"))
+            except (FileNotFoundError, OSError):
+                return None
+            self._patches[entry_id] = patch
+        return patch
+
+    # ---------- public ----------
+    def remember(self, frame: Frame, act: Dict[str, Any], key: str) -> Optional[str]:
+        """
+        Store the patch around act's click on `frame` (the frame it was chosen
+        on) under `key`. Low-texture patches are refused: they would match
+        anywhere. Returns the entry id, or None.
+        """
+        action = (act.get("action") or "").upper()
+        if action not in CLICK_ACTIONS:
+            return None
+        gray = frame.derive(("gray",), lambda: _gray(frame.array))
+        h, w = gray.shape
+        half = int(getattr(cfg, "ELEMENT_PATCH_PX", 48)) // 2
+        px, py = _norm_to_px(float(act["x"]), float(act["y"]), w, h)
+        left, top = max(0, px - half), max(0, py - half)
+        patch = gray[top:min(h, py + half), left:min(w, px + half)]
+        if min(patch.shape) < half or float(patch.std()) < float(getattr(cfg, "ELEMENT_MIN_STD", 8.0)):
+            return None
+
+        buf = BytesIO()
+        Image.fromarray(np.ascontiguousarray(patch)).save(buf, format="PNG")
+        with self._lock:
+            k = _key(key)
+            entry_id = uuid.uuid4().hex[:12]
+            try:
+                _write_atomic(os.path.join(self.path, f"{entry_id}.png"), buf.getvalue())
+            except OSError as e:
+                print(f"[MEMORY] could not store patch: {e}")
+                return None
+            # one entry per (step, action): a newer verified click replaces the old one
+            for old in [e for e in self._entries if e["key"] == k and e["action"] == action]:
+                self._drop(old["id"])
+            self._patches[entry_id] = patch.copy()
+            self._entries.append({
+                "id": entry_id, "key": k, "label": str(act.get("target") or ""), "action": action,
+                "frame": [w, h], "offset": [px - left, py - top], "hits": 0, "last_used": time.time(),
+            })
+            while len(self._entries) > self.max_entries:
+                self._drop(min(self._entries, key=lambda e: e["last_used"])["id"])
+            self._save()
+        return entry_id
+
+    def recall(self, frame: Frame, key: str) -> Optional[Recall]:
+        """
+        Find an element remembered for `key` on `frame`: the best NCC peak must
+        reach ELEMENT_MATCH_MIN and beat any other location by ELEMENT_MATCH_MARGIN
+        (a repeated icon is not a confident match).
+        """
+        k = _key(key)
+        with self._lock:
+            candidates = [e for e in self._entries if e["key"] == k]
+        if not candidates:
+            return None
+        gray = frame.derive(("gray",), lambda: _gray(frame.array))
+        h, w = gray.shape
+        min_score = float(getattr(cfg, "ELEMENT_MATCH_MIN", 0.92))
+        margin = float(getattr(cfg, "ELEMENT_MATCH_MARGIN", 0.05))
+
+        best: Optional[Recall] = None
+        for e in candidates:
+            patch = self._patch(e["id"])
+            if patch is None or list(e["frame"]) != [w, h]:
+                continue
+            ncc = match_template(gray, patch)
+            if ncc.size == 0:
+                continue
+            by, bx = np.unravel_index(int(np.argmax(ncc)), ncc.shape)
+            score = float(ncc[by, bx])
+            if score < min_score or (best is not None and score <= best.score):
+                continue
+            ph, pw = patch.shape
+            rest = ncc.copy()
+            rest[max(0, by - ph // 2):by + ph // 2 + 1, max(0, bx - pw // 2):bx + pw // 2 + 1] = -1.0
+            if rest.size and float(rest.max()) > score - margin:
+                continue
+            cx, cy = e["offset"]
+            x = min(1.0, (bx + cx + 0.5) / max(1, w - 1))
+            y = min(1.0, (by + cy + 0.5) / max(1, h - 1))
+            if not validate_xy(x, y)[0]:
+                continue
+            best = Recall(e["id"], e["label"], e["action"], x, y, score)
+
+        if best is not None:
+            with self._lock:
+                for e in self._entries:
+                    if e["id"] == best.entry_id:
+                        e["hits"] = int(e.get("hits", 0)) + 1
+                        e["last_used"] = time.time()
+                self._save()
+        return best
+
+    def forget(self, entry_id: str) -> None:
+        """Drop an entry whose recalled click did not do the job."""
+        with self._lock:
+            self._drop(entry_id)
+            self._save()
+
+    def _drop(self, entry_id: str) -> None:
+        self._entries = [e for e in self._entries if e["id"] != entry_id]
+        self._patches.pop(entry_id, None)
+        try:
+            os.remove(os.path.join(self.path, f"{entry_id}.png"))
+        except OSError:
+            pass
+
+
+_default: Optional[ElementMemory] = None
+_default_lock = threading.Lock()
+
+
+def default_memory() -> Optional[ElementMemory]:
+    """The shared ElementMemory at ELEMENT_MEMORY_DIR, or None with ELEMENT_MEMORY off."""
+    global _default
+    if not getattr(cfg, "ELEMENT_MEMORY", False):
+        return None
+    with _default_lock:
+        if _default is None or _default.path != getattr(cfg, "ELEMENT_MEMORY_DIR", "./element_memory"):
+            _default = ElementMemory()
+        return _default
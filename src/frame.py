@@ -0,0 +1,131 @@
+# frame.py — Screen frames backed by reusable uint8 buffers
+from __future__ import annotations
+
+import sys
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+class FramePool:
+    """
+    Recycles (H, W, 3) uint8 buffers between captures.
+
+    A buffer is handed out again only when nothing else references it: a Frame
+    holds it directly and every NumPy view holds it through `.base`, so the
+    reference count tells when all consumers are done with it. At most
+    `max_buffers` are kept; beyond that (many frames alive at once) a fresh array
+    is allocated and simply garbage-collected later.
+    """
+
+    # references held while we look at a pooled buffer: the list slot, the loop
+    # variable and getrefcount()'s own argument
+    _IDLE_REFS = 3
+
+    def __init__(self, max_buffers: int = 4):
+        self.max_buffers = int(max_buffers)
+        self._buffers: List[np.ndarray] = []
+        self._lock = threading.Lock()
+        self.allocations = 0  # arrays created (reuses do not count)
+
+    def acquire(self, width: int, height: int) -> np.ndarray:
+        shape = (int(height), int(width), 3)
+        with self._lock:
+            for buf in self._buffers:
+                if buf.shape == shape and sys.getrefcount(buf) <= self._IDLE_REFS:
+                    buf.flags.writeable = True
+                    return buf
+            out = np.empty(shape, dtype=np.uint8)
+            self.allocations += 1
+            if len(self._buffers) < self.max_buffers:
+                self._buffers.append(out)
+            else:
+                # after a resolution change: retire an idle buffer of the old size
+                for i in range(len(self._buffers)):
+                    buf = self._buffers[i]
+                    if buf.shape != shape and sys.getrefcount(buf) <= self._IDLE_REFS:
+                        self._buffers[i] = out
+                        break
+            return out
+
+
+class Frame:
+    """
+    One captured screen.
+
+    Keeps whichever representation the capture produced — an RGB uint8 array
+    (VNC framebuffer, pooled) or a decoded PIL image (HTTP PNG) — and derives
+    the other on first use, once, so any number of consumers share it:
+
+      frame.array   (H, W, 3) RGB uint8, read-only; diffing and QImage read it in place
+      frame.image   PIL "RGB" image (PIL stores RGB 4 bytes/pixel, so from an
+                    array this is the one unavoidable copy)
+
+    Anything else computed from the pixels (resized VLM view, encoded payload)
+    can be memoized on the frame with derive().
+    """
+
+    __slots__ = ("_array", "_image", "_derived", "_lock")
+
+    def __init__(self, array: Optional[np.ndarray] = None, image: Optional[Image.Image] = None):
+        if array is None and image is None:
+            raise ValueError("Frame needs an array or an image")
+        if array is not None:
+            if array.dtype != np.uint8 or array.ndim != 3 or array.shape[2] != 3:
+                raise ValueError(f"Frame array must be (H, W, 3) uint8, got {array.shape} {array.dtype}")
+            array.flags.writeable = False
+        if image is not None and image.mode != "RGB":
+            image = image.convert("RGB")
+        self._array = array
+        self._image = image
+        self._derived: Dict[Hashable, Any] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height), like PIL's Image.size."""
+        if self._image is not None:
+            return self._image.size
+        h, w = self._array.shape[:2]
+        return w, h
+
+    @property
+    def array(self) -> np.ndarray:
+        arr = self._array
+        if arr is None:
+            arr = np.asarray(self._image)
+            arr.flags.writeable = False
+            self._array = arr
+        return arr
+
+    @property
+    def image(self) -> Image.Image:
+        img = self._image
+        if img is None:
+            img = Image.fromarray(self._array)
+            self._image = img
+        return img
+
+    def derive(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """fn() computed once per frame and key; concurrent callers wait for the first."""
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = fn()
+            return self._derived[key]
+
+    def derived(self, key: Hashable) -> Any:
+        """What derive(key, ...) computed, or None if nothing was yet."""
+        return self._derived.get(key)
+
+    def crop(self, box: Tuple[int, int, int, int]) -> "Frame":
+        """Region (left, top, right, bottom): a view of the array when there is one."""
+        left, top, right, bottom = box
+        if self._array is not None:
+            return Frame(array=self._array[top:bottom, left:right])
+        return Frame(image=self._image.crop(box))
@@ -0,0 +1,131 @@
+# frame_broker.py — One capture owner per Sandbox, shared by the GUI refresh and the agent loop
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Union
+
+from PIL import Image
+
+from src.frame import Frame
+
+
+@dataclass
+class TimedFrame:
+    frame: Frame
+    ts: float        # wall-clock time the capture STARTED: the content is at least this new
+    seq: int
+
+    @property
+    def image(self) -> Image.Image:
+        return self.frame.image
+
+
+class _Fetch:
+    def __init__(self, started_at: float):
+        self.started_at = started_at
+        self.done = threading.Event()
+        self.frame: Optional[TimedFrame] = None
+        self.error: Optional[BaseException] = None
+
+
+class FrameBroker:
+    """
+    Coalesces screenshot requests for one sandbox.
+
+    Callers say how fresh the frame must be:
+      - get(newer_than=T): content captured at or after T (agent: "after my action")
+      - get(max_age=s):    anything at most s seconds old (GUI refresh)
+
+    A request is served from the latest frame, or by joining an in-flight capture
+    that started late enough, or else by capturing immediately in the caller's
+    thread. A capture that started BEFORE T is never good enough for newer_than=T,
+    so the agent never queues behind an older GUI refresh; the GUI, on the other
+    hand, happily reuses whatever the agent just fetched.
+    """
+
+    def __init__(self, capture_fn: Callable[[], Union[Frame, Image.Image]]):
+        self._capture_fn = capture_fn
+        self._lock = threading.Lock()
+        self._latest: Optional[TimedFrame] = None
+        self._inflight: List[_Fetch] = []
+        self._seq = 0
+        self._subscribers: List[Callable[[TimedFrame], Any]] = []
+        self.captures = 0   # real captures performed
+        self.requests = 0   # get() calls served
+
+    def latest(self) -> Optional[TimedFrame]:
+        return self._latest
+
+    def subscribe(self, fn: Callable[[TimedFrame], Any]) -> Callable[[], None]:
+        """
+        Call fn(frame) for every new frame (from the capturing thread).
+        Returns an unsubscribe function.
+        """
+        with self._lock:
+            self._subscribers.append(fn)
+
+        def _unsubscribe() -> None:
+            with self._lock:
+                if fn in self._subscribers:
+                    self._subscribers.remove(fn)
+
+        return _unsubscribe
+
+    def get(self, newer_than: Optional[float] = None, max_age: Optional[float] = None,
+            timeout: Optional[float] = None) -> TimedFrame:
+        if newer_than is None:
+            newer_than = (time.time() - max_age) if max_age is not None else time.time()
+
+        with self._lock:
+            self.requests += 1
+            latest = self._latest
+            if latest is not None and latest.ts >= newer_than:
+                return latest
+
+            joinable = [f for f in self._inflight if f.started_at >= newer_than]
+            if joinable:
+                fetch = joinable[-1]
+                owner = False
+            else:
+                fetch = _Fetch(time.time())
+                self._inflight.append(fetch)
+                owner = True
+
+        if not owner:
+            if not fetch.done.wait(timeout):
+                raise TimeoutError("Timed out waiting for a shared screen capture")
+            if fetch.error is not None:
+                raise fetch.error
+            return fetch.frame
+
+        try:
+            out = self._capture_fn()
+            if not isinstance(out, Frame):
+                out = Frame(image=out)
+        except BaseException as e:
+            fetch.error = e
+            with self._lock:
+                self._inflight.remove(fetch)
+            fetch.done.set()
+            raise
+
+        with self._lock:
+            self.captures += 1
+            self._seq += 1
+            frame = TimedFrame(frame=out, ts=fetch.started_at, seq=self._seq)
+            fetch.frame = frame
+            self._inflight.remove(fetch)
+            # concurrent captures may finish out of order; keep the newest content
+            if self._latest is None or frame.ts >= self._latest.ts:
+                self._latest = frame
+            subscribers = list(self._subscribers)
+        fetch.done.set()
+
+        for fn in subscribers:
+            try:
+                fn(frame)
+            except Exception as e:
+                print(f"[FRAMES] subscriber error: {e}")
+        return frame
@@ -0,0 +1,141 @@
+# frame_ring.py — Recent screens as small uint8 arrays under a fixed memory budget
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, List, Optional, Union
+
+import numpy as np
+
+from src.config import cfg
+from src.frame import Frame
+from src.screen_change import _box_downscale, _gray, change_fraction
+
+
+@dataclass
+class RingFrame:
+    seq: int
+    ts: float
+    label: str                                    # who pushed it: "executor", "verifier", ...
+    array: np.ndarray = field(repr=False)         # (h, w, 3) RGB or (h, w) gray, read-only
+
+    def thumb(self, max_dim: Optional[int] = None) -> np.ndarray:
+        """Grayscale thumbnail comparable with screen_change.frame_thumb (same box filter)."""
+        max_dim = int(max_dim or getattr(cfg, "CHANGE_SAMPLE_DIM", 160))
+        arr = self.array if self.array.ndim == 3 else self.array[..., None]
+        step = max(1, math.ceil(max(arr.shape[:2]) / max_dim))
+        small = _box_downscale(arr, step)
+        return _gray(small) if small.shape[2] == 3 else small[..., 0]
+
+
+class FrameRing:
+    """
+    The last few screens the agent looked at, oldest dropped first once the
+    arrays together exceed `budget_bytes` (FRAME_RING_BYTES). Frames are box-
+    downscaled to at most `max_dim` (FRAME_RING_DIM) on the way in, so a
+    full-HD capture costs ~150 KB here instead of 6 MB; arrays already that
+    small (thumbnails) are kept as they are.
+
+    Consumers read from here instead of capturing again or reading PNGs back:
+    the screen-loop guard, before/after comparisons and trajectory export (export()).
+    """
+
+    def __init__(self, budget_bytes: Optional[int] = None, max_dim: Optional[int] = None):
+        self.budget_bytes = int(budget_bytes or getattr(cfg, "FRAME_RING_BYTES", 8 * 2**20))
+        self.max_dim = int(max_dim or getattr(cfg, "FRAME_RING_DIM", 320))
+        self._items: Deque[RingFrame] = deque()
+        self._nbytes = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def push(self, frame: Union[Frame, np.ndarray], label: str = "screen", ts: Optional[float] = None) -> RingFrame:
+        arr = frame.array if isinstance(frame, Frame) else np.asarray(frame)
+        step = max(1, math.ceil(max(arr.shape[:2]) / self.max_dim))
+        if step > 1:
+            small = _box_downscale(arr if arr.ndim == 3 else arr[..., None], step)
+            arr = small if arr.ndim == 3 else small[..., 0]
+        else:
+            arr = arr.copy()  # never keep a reference to a pooled capture buffer
+        arr.flags.writeable = False
+        with self._lock:
+            self._seq += 1
+            item = RingFrame(self._seq, time.time() if ts is None else ts, label, arr)
+            self._items.append(item)
+            self._nbytes += arr.nbytes
+            while self._nbytes > self.budget_bytes and len(self._items) > 1:
+                self._nbytes -= self._items.popleft().array.nbytes
+        return item
+
+    def latest(self, label: Optional[str] = None, before: Optional[float] = None) -> Optional[RingFrame]:
+        """Newest frame (with `label`, taken before `before` if given), or None."""
+        with self._lock:
+            for item in reversed(self._items):
+                if (label is None or item.label == label) and (before is None or item.ts < before):
+                    return item
+        return None
+
+    def frames(self, label: Optional[str] = None, since: Optional[float] = None) -> List[RingFrame]:
+        """Oldest first."""
+        with self._lock:
+            return [f for f in self._items
+                    if (label is None or f.label == label) and (since is None or f.ts >= since)]
+
+    def count_similar(self, item: RingFrame, since: Optional[float] = None,
+                      threshold: Optional[float] = None) -> int:
+        """How many earlier frames with item's label (since `since`) show the same screen."""
+        threshold = float(threshold if threshold is not None else getattr(cfg, "CHANGE_THRESHOLD", 0.02))
+        ref = item.thumb()
+        return sum(1 for f in self.frames(item.label, since)
+                   if f.seq < item.seq and change_fraction(ref, f.thumb()) < threshold)
+
+    def export(self, path: str, label: Optional[str] = None, since: Optional[float] = None) -> int:
+        """
+        Write the buffered trajectory (frames taken at or after `since`) to one
+        compressed .npz: arrays frame_<seq> plus a JSON "index" of
+        [{seq, ts, label, shape}]. Returns frames written.
+        """
+        items = self.frames(label, since)
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        index = [{"seq": f.seq, "ts": f.ts, "label": f.label, "shape": list(f.array.shape)} for f in items]
+        np.savez_compressed(path, index=np.array(json.dumps(index)),
+                            **{f"frame_{f.seq}": f.array for f in items})
+        return len(items)
+
+
+def ring_of(sandbox) -> Optional[FrameRing]:
+    """sandbox.ring if it has one (stand-ins and mocks may not)."""
+    ring = getattr(sandbox, "ring", None)
+    return ring if isinstance(ring, FrameRing) else None
+
+
+def export_trajectory(sandbox, path: Optional[str] = None, since: Optional[float] = None) -> int:
+    """
+    Write sandbox.ring to `path` (default TRAJECTORY_PATH); returns frames written
+    (0 if off). `since`: only the frames of the run that started then, not
+    those of earlier objectives still in the ring.
+    """
+    ring = ring_of(sandbox)
+    path = path if path is not None else getattr(cfg, "TRAJECTORY_PATH", "")
+    if ring is None or not path or not ring.frames(since=since):
+        return 0
+    try:
+        n = ring.export(path, since=since)
+    except Exception as e:
+        print(f"[RING] trajectory export failed: {e}")
+        return 0
+    print(f"[RING] Trajectory: {n} frames -> {path}")
+    return n
@@ -0,0 +1,92 @@
+# grounding.py — Coarse-to-fine click grounding: re-ask the VLM on a full-resolution crop
+from __future__ import annotations
+
+import re
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.config import cfg
+from src.frame import Frame
+from src.guards import CLICK_ACTIONS, validate_xy
+from src.sandbox import _norm_to_px
+
+
+def needs_zoom(out: Dict[str, Any]) -> bool:
+    """
+    A click worth a second look: the model was unsure (confidence below
+    ZOOM_CONFIDENCE_BELOW), or its target names something small (a whole
+    ZOOM_SMALL_TARGETS word, "tab" but not "table") and it was not quite sure
+    either (below ZOOM_SMALL_CONFIDENCE_BELOW).
+    """
+    if not getattr(cfg, "ZOOM_GROUNDING", True):
+        return False
+    if (out.get("action") or "").upper() not in CLICK_ACTIONS:
+        return False
+    try:
+        conf = float(out.get("confidence", 0.0))
+    except (TypeError, ValueError):
+        conf = 0.0
+    if conf < float(getattr(cfg, "ZOOM_CONFIDENCE_BELOW", 0.7)):
+        return True
+    if conf >= float(getattr(cfg, "ZOOM_SMALL_CONFIDENCE_BELOW", 0.9)):
+        return False
+    words = set(re.findall(r"[a-z]+", str(out.get("target") or "").lower()))
+    return any(w in words or w + "s" in words for w in getattr(cfg, "ZOOM_SMALL_TARGETS", ()))
+
+
+def zoom_box(x: float, y: float, screen: Tuple[int, int], side: Optional[int] = None) -> Tuple[int, int, int, int]:
+    """
+    (left, top, right, bottom) of a side x side screen-pixel square centred on
+    the normalized point, shifted (not shrunk) to stay on screen.
+    """
+    w, h = screen
+    side = int(side or getattr(cfg, "ZOOM_REGION_PX", 480))
+    cw, ch = min(side, w), min(side, h)
+    px, py = _norm_to_px(x, y, w, h)
+    left = max(0, min(w - cw, px - cw // 2))
+    top = max(0, min(h - ch, py - ch // 2))
+    return left, top, left + cw, top + ch
+
+
+def crop_to_screen(xc: float, yc: float, box: Tuple[int, int, int, int], screen: Tuple[int, int]) -> Tuple[float, float]:
+    """
+    Crop-normalized point -> screen-normalized point, chosen so the sandbox's
+    own _norm_to_px lands on exactly the pixel the crop point maps to.
+    """
+    left, top, right, bottom = box
+    cx, cy = _norm_to_px(xc, yc, right - left, bottom - top)
+    w, h = screen
+    return (min(1.0, (left + cx + 0.5) / max(1, w - 1)),
+            min(1.0, (top + cy + 0.5) / max(1, h - 1)))
+
+
+def refine_click(llm, sandbox, objective: str, out: Dict[str, Any],
+                 ask: Optional[Callable[..., Dict[str, Any]]] = None) -> Tuple[Dict[str, Any], bool]:
+    """
+    Second grounding pass for a click proposed on the downscaled screenshot:
+    grab ZOOM_REGION_PX of full-resolution screen around (x, y), ask the model
+    where the target is on that crop, and map the answer back to screen
+    coordinates. Returns (action, refined); the original action when the model
+    does not find the target or anything fails.
+    """
+    if ask is None:
+        from src.llm_client import ask_zoom_point as ask
+    try:
+        x, y = float(out["x"]), float(out["y"])
+        screen = sandbox.get_screen_size()
+        box = zoom_box(x, y, screen)
+        crop = Frame(image=sandbox.screenshot(region=box, max_dim=cfg.MAX_DIM))
+        fine = ask(llm, objective, str(out.get("target") or ""), crop)
+    except Exception as e:
+        print(f"[ZOOM] refinement failed ({e}), keeping coarse click.")
+        return out, False
+    if not fine.get("found", True):
+        return out, False
+    try:
+        nx, ny = crop_to_screen(float(fine["x"]), float(fine["y"]), box, screen)
+    except (KeyError, TypeError, ValueError):
+        return out, False
+    if not validate_xy(nx, ny)[0]:
+        return out, False
+    refined = dict(out)
+    refined["x"], refined["y"] = nx, ny
+    return refined, True
@@ -78,4 +78,21 @@ def should_stop_on_repeat(history, new_action):
         if same_target or same_xy:
             return True, "Repeat pointer action detected (same target/coords)."
 
-    return False, ""
\ No newline at end of file
+    return False, ""
+
+
+def detect_screen_loop(ring, label: str = "executor", since=None) -> Tuple[bool, str]:
+    """
+    Visual loop check on the frame ring (src/frame_ring.py): the newest `label`
+    screen already appeared SCREEN_LOOP_REPEATS-1 times (since `since`), i.e.
+    the actions in between got the agent nowhere.
+    """
+    if ring is None or not getattr(cfg, "STOP_ON_SCREEN_LOOP", True):
+        return False, ""
+    latest = ring.latest(label)
+    if latest is None:
+        return False, ""
+    seen = ring.count_similar(latest, since=since) + 1
+    if seen >= int(getattr(cfg, "SCREEN_LOOP_REPEATS", 3)):
+        return True, f"The screen looked the same at {seen} attempts; previous actions did not change it."
+    return False, ""
@@ -2,14 +2,15 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Union
 
 from huggingface_hub import hf_hub_download
 from llama_cpp import Llama
 from llama_cpp.llama_chat_format import Qwen3VLChatHandler
 
 from src.config import cfg, JSON_RE
-from src.vision import image_to_data_uri
+from src.frame import Frame
+from src.vision import to_data_uri
 
 
 def load_llm() -> Llama:
@@ -64,11 +65,13 @@ def _parse_json_obj(text: str) -> Dict[str, Any]:
     return json.loads(m.group(0))
 
 
-def ask_next_action(llm: Llama, objective: str, screenshot_path: str, history: List[Dict[str, Any]]) -> Dict[str, Any]:
+def ask_next_action(llm: Llama, objective: str, screenshot: Union[Frame, str],
+                    history: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Returns one action JSON. When done: {"action":"BITTI", ...}
+    screenshot: a Frame from capture_screen (payload encoded once per frame) or an image path.
     """
-    uri = image_to_data_uri(screenshot_path)
+    uri = to_data_uri(screenshot)
 
     system = (
         "You are a reactive GUI agent.\n"
@@ -121,3 +124,44 @@ def ask_next_action(llm: Llama, objective: str, screenshot_path: str, history: L
         stop=["\n\n", "<|im_end|>"],
     )
     return _parse_json_obj(resp["choices"][0]["message"]["content"])
+
+
+def ask_zoom_point(llm: Llama, objective: str, target: str, crop: Union[Frame, str]) -> Dict[str, Any]:
+    """
+    Second grounding pass (src/grounding.py): locate `target` on a full-resolution
+    crop of the screen. Returns {"found": bool, "x", "y"} normalized to the crop.
+    """
+    uri = to_data_uri(crop)
+
+    system = (
+        "You are a precise GUI grounding model.\n"
+        "The image is a ZOOMED-IN crop of the screen around a click target.\n"
+        "Find the exact center of the TARGET element in this crop.\n\n"
+        "Return EXACTLY one JSON object. No extra text.\n"
+        "Schema:\n"
+        '{"found": true, "x": 0.5, "y": 0.5, "confidence": 0.0}\n\n'
+        "Rules:\n"
+        "- x,y are normalized (0..1) to THIS crop, not the full screen.\n"
+        "- If the target is not visible in the crop, set found to false.\n"
+    )
+
+    user = (
+        f"OBJECTIVE: {objective}\n"
+        f"TARGET: {target}\n"
+        "Where is the TARGET in this crop?"
+    )
+
+    resp = llm.create_chat_completion(
+        messages=[
+            {"role": "system", "content": system},
+            {"role": "user", "content": [
+                {"type": "image_url", "image_url": {"url": uri}},
+                {"type": "text", "text": user},
+            ]},
+        ],
+        temperature=0.1,
+        top_p=0.9,
+        max_tokens=80,
+        stop=["\n\n", "<|im_end|>"],
+    )
+    return _parse_json_obj(resp["choices"][0]["message"]["content"])
@@ -0,0 +1,288 @@
+# rfb.py — Minimal RFB (VNC) client that mirrors the remote framebuffer in memory
+from __future__ import annotations
+
+import socket
+import struct
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Client -> server message types
+_SET_PIXEL_FORMAT = 0
+_SET_ENCODINGS = 2
+_FB_UPDATE_REQUEST = 3
+
+# Server -> client message types
+_FB_UPDATE = 0
+_SET_COLOUR_MAP = 1
+_BELL = 2
+_CUT_TEXT = 3
+
+# Encodings
+_ENC_RAW = 0
+_ENC_COPYRECT = 1
+_ENC_DESKTOP_SIZE = -223
+
+# Security types
+_SEC_NONE = 1
+_SEC_VNC_AUTH = 2
+
+# 32 bpp, depth 24, little-endian, true colour, 8 bits per channel at shifts 16/8/0.
+# In memory every pixel is B, G, R, X.
+_PIXEL_FORMAT = struct.pack("!BBBBHHHBBB3x", 32, 24, 0, 1, 255, 255, 255, 16, 8, 0)
+
+
+class RFBError(Exception):
+    pass
+
+
+def _vnc_auth_response(password: str, challenge: bytes) -> bytes:
+    """DES-encrypt the 16-byte challenge with the (bit-reversed) password, per RFC 6143 7.2.2."""
+    try:
+        from Crypto.Cipher import DES  # pycryptodome
+    except ImportError as e:
+        raise RFBError("VNC password auth needs pycryptodome (pip install pycryptodome)") from e
+
+    key = password.encode("latin-1")[:8].ljust(8, b"\0")
+    key = bytes(int(f"{b:08b}"[::-1], 2) for b in key)
+    return DES.new(key, DES.MODE_ECB).encrypt(challenge)
+
+
+class RFBClient:
+    """
+    Keeps one RFB connection open and applies FramebufferUpdate rectangles
+    (Raw, CopyRect, DesktopSize) to an (H, W, 4) uint8 BGRX buffer.
+
+    A reader thread requests incremental updates continuously (at most one per
+    `update_interval` seconds), so `snapshot_rgb()` is just a copy of the buffer.
+    """
+
+    def __init__(self, host: str, port: int, password: str = "", timeout: float = 10.0,
+                 update_interval: float = 0.03):
+        self.host = host
+        self.port = int(port)
+        self.password = password or ""
+        self.timeout = float(timeout)
+        self.update_interval = float(update_interval)
+
+        self.width = 0
+        self.height = 0
+        self.name = ""
+        self._fb: Optional[np.ndarray] = None
+        self._resized = False
+
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+        self._first_frame = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.error: Optional[BaseException] = None
+        self.updated_at: float = 0.0
+        self.update_count: int = 0
+
+    # -----------------------
+    # Socket helpers
+    # -----------------------
+    def _recv_exact(self, n: int) -> bytes:
+        buf = bytearray(n)
+        view = memoryview(buf)
+        got = 0
+        while got < n:
+            k = self._sock.recv_into(view[got:], n - got)
+            if k == 0:
+                raise RFBError("VNC server closed the connection")
+            got += k
+        return bytes(buf)
+
+    def _recv_into(self, target: memoryview) -> None:
+        got = 0
+        n = len(target)
+        while got < n:
+            k = self._sock.recv_into(target[got:], n - got)
+            if k == 0:
+                raise RFBError("VNC server closed the connection")
+            got += k
+
+    def _send(self, data: bytes) -> None:
+        self._sock.sendall(data)
+
+    # -----------------------
+    # Handshake
+    # -----------------------
+    def connect(self) -> None:
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        version = self._recv_exact(12)
+        if not version.startswith(b"RFB "):
+            raise RFBError(f"Not an RFB server: {version!r}")
+        minor = int(version[8:11])
+        minor = 8 if minor >= 8 else (7 if minor == 7 else 3)
+        self._send(f"RFB 003.00{minor}\n".encode("ascii"))
+
+        if minor == 3:
+            (sec,) = struct.unpack("!I", self._recv_exact(4))
+            if sec == 0:
+                raise RFBError(self._read_reason())
+        else:
+            (n,) = struct.unpack("!B", self._recv_exact(1))
+            if n == 0:
+                raise RFBError(self._read_reason())
+            offered = set(self._recv_exact(n))
+            if _SEC_NONE in offered:
+                sec = _SEC_NONE
+            elif _SEC_VNC_AUTH in offered:
+                sec = _SEC_VNC_AUTH
+            else:
+                raise RFBError(f"No supported security type offered: {sorted(offered)}")
+            self._send(struct.pack("!B", sec))
+
+        if sec == _SEC_VNC_AUTH:
+            challenge = self._recv_exact(16)
+            self._send(_vnc_auth_response(self.password, challenge))
+
+        if sec == _SEC_VNC_AUTH or minor == 8:
+            (status,) = struct.unpack("!I", self._recv_exact(4))
+            if status != 0:
+                raise RFBError(self._read_reason() if minor == 8 else "VNC authentication failed")
+
+        self._send(b"\x01")  # ClientInit: shared session (the GUI viewer may be attached too)
+        w, h = struct.unpack("!HH", self._recv_exact(4))
+        self._recv_exact(16)  # server pixel format, replaced below
+        (name_len,) = struct.unpack("!I", self._recv_exact(4))
+        self.name = self._recv_exact(name_len).decode("utf-8", errors="replace")
+        self._resize(w, h)
+        self._resized = False
+
+        self._send(struct.pack("!B3x", _SET_PIXEL_FORMAT) + _PIXEL_FORMAT)
+        encodings = (_ENC_COPYRECT, _ENC_RAW, _ENC_DESKTOP_SIZE)
+        self._send(struct.pack(f"!BxH{len(encodings)}i", _SET_ENCODINGS, len(encodings), *encodings))
+        self._request_update(incremental=False)
+
+        # Reads block until the next update; the timeout only applies to the handshake.
+        self._sock.settimeout(None)
+
+    def _read_reason(self) -> str:
+        (n,) = struct.unpack("!I", self._recv_exact(4))
+        return self._recv_exact(n).decode("utf-8", errors="replace")
+
+    def _resize(self, w: int, h: int) -> None:
+        self._resized = True
+        with self._lock:
+            self.width, self.height = int(w), int(h)
+            self._fb = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+
+    def _request_update(self, incremental: bool) -> None:
+        self._send(struct.pack("!BBHHHH", _FB_UPDATE_REQUEST, 1 if incremental else 0,
+                               0, 0, self.width, self.height))
+
+    # -----------------------
+    # Reader thread
+    # -----------------------
+    def start(self) -> None:
+        if self._sock is None:
+            self.connect()
+        self._thread = threading.Thread(target=self._run, name="rfb-reader", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                (msg_type,) = struct.unpack("!B", self._recv_exact(1))
+                if msg_type == _FB_UPDATE:
+                    t0 = time.monotonic()
+                    self._read_fb_update()
+                    wait = self.update_interval - (time.monotonic() - t0)
+                    if wait > 0:
+                        self._stop.wait(wait)
+                    if not self._stop.is_set():
+                        # after a DesktopSize change the whole new framebuffer is needed
+                        self._request_update(incremental=not self._resized)
+                        self._resized = False
+                elif msg_type == _SET_COLOUR_MAP:
+                    _, count = struct.unpack("!xHH", self._recv_exact(5))
+                    self._recv_exact(6 * count)
+                elif msg_type == _BELL:
+                    pass
+                elif msg_type == _CUT_TEXT:
+                    (n,) = struct.unpack("!3xI", self._recv_exact(7))
+                    self._recv_exact(n)
+                else:
+                    raise RFBError(f"Unknown server message type {msg_type}")
+        except BaseException as e:
+            if not self._stop.is_set():
+                self.error = e
+        finally:
+            self._first_frame.set()  # wake waiters; they check self.error
+
+    def _read_fb_update(self) -> None:
+        (n_rects,) = struct.unpack("!xH", self._recv_exact(3))
+        for _ in range(n_rects):
+            x, y, w, h, enc = struct.unpack("!HHHHi", self._recv_exact(12))
+            if enc == _ENC_RAW:
+                if w and h:
+                    # Decode straight into a scratch array, then blit under the lock.
+                    rect = np.empty((h, w, 4), dtype=np.uint8)
+                    self._recv_into(memoryview(rect).cast("B"))
+                    with self._lock:
+                        self._fb[y:y + h, x:x + w] = rect
+            elif enc == _ENC_COPYRECT:
+                sx, sy = struct.unpack("!HH", self._recv_exact(4))
+                with self._lock:
+                    self._fb[y:y + h, x:x + w] = self._fb[sy:sy + h, sx:sx + w].copy()
+            elif enc == _ENC_DESKTOP_SIZE:
+                self._resize(w, h)
+            else:
+                raise RFBError(f"Unsupported rectangle encoding {enc}")
+        self.updated_at = time.time()
+        self.update_count += 1
+        self._first_frame.set()
+
+    # -----------------------
+    # Public
+    # -----------------------
+    @property
+    def alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and self.error is None
+
+    def snapshot_rgb(self, timeout: float = 10.0,
+                     box: Optional[Tuple[int, int, int, int]] = None,
+                     out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Copy of the current framebuffer as an (H, W, 3) RGB uint8 array.
+        box=(left, top, right, bottom) copies only that region.
+        out: preallocated array to copy into (no allocation); ignored if its
+        shape no longer matches (e.g. the resolution just changed).
+        """
+        if not self._first_frame.wait(timeout):
+            raise TimeoutError("No framebuffer update received from VNC server")
+        if self.error is not None:
+            raise RFBError(f"VNC reader stopped: {self.error}")
+        with self._lock:
+            fb = self._fb
+            if box is not None:
+                left, top, right, bottom = box
+                fb = fb[top:bottom, left:right]
+            rgb = fb[:, :, 2::-1]
+            if out is not None and out.shape == rgb.shape:
+                np.copyto(out, rgb)
+                return out
+            return rgb.copy()
+
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+            self._sock = None
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
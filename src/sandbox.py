@@ -1,59 +1,35 @@
 # sandbox.py
 import base64
+import binascii
+import http.client
 import json
 import os
+import socket
 import subprocess
+import threading
 import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from io import BytesIO
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
 
 import requests
 from PIL import Image
+from requests.adapters import HTTPAdapter
+
+from src.capture import CaptureBackend, HttpCapture, make_capture_backend
+from src.docker_api import ContainerSpec, DockerError, make_docker_client
+from src.frame import Frame
+from src.frame_broker import FrameBroker
+from src.frame_ring import FrameRing
+from src.ws_transport import WebSocketTransport, WebSocketUnsupported
 
 
 def _safe_getattr(obj, key: str, default):
     return getattr(obj, key, default)
 
 
-def _docker_running(name: str) -> bool:
-    r = subprocess.run(
-        ["docker", "inspect", "-f", "{{.State.Running}}", name],
-        capture_output=True,
-        text=True,
-    )
-    return r.returncode == 0 and r.stdout.strip().lower() == "true"
-
-
-def _docker_exists(name: str) -> bool:
-    r = subprocess.run(
-        ["docker", "inspect", name],
-        capture_output=True,
-        text=True,
-    )
-    return r.returncode == 0
-
-
-
-def _docker_env(name: str) -> Dict[str, str]:
-    """Return container env as dict via docker inspect."""
-    r = subprocess.run(
-        ["docker", "inspect", "-f", "{{json .Config.Env}}", name],
-        capture_output=True,
-        text=True,
-    )
-    if r.returncode != 0:
-        return {}
-    try:
-        env_list = json.loads((r.stdout or "").strip() or "[]")
-        out: Dict[str, str] = {}
-        for item in env_list:
-            if isinstance(item, str) and "=" in item:
-                k, v = item.split("=", 1)
-                out[k] = v
-        return out
-    except Exception:
-        return {}
-
 def _parse_sse_or_json(text: str) -> Any:
     """
     The /cmd endpoint sometimes returns JSON, sometimes text/event-stream (SSE).
@@ -94,15 +70,348 @@ def _parse_sse_or_json(text: str) -> Any:
     raise ValueError(f"Could not parse response (first 200 chars): {text[:200]!r}")
 
 
-class Sandbox:
+_IMAGE_KEY = b'"image_data"'
+_STREAM_CHUNK = 256 * 1024
+
+
+def _loads_cmd_payload(buf, start: int = 0, end: Optional[int] = None) -> Any:
     """
-    Minimal "computer-server" REST wrapper for the trycua/cua-xfce container.
-    Host -> container port map:
-      - API (container:8000)  -> host:API_PORT
-      - VNC (container:5901)  -> host:VNC_PORT
-      - noVNC (container:6901)-> host:NOVNC_PORT
+    json.loads for one /cmd JSON object held in buf[start:end] (bytes/bytearray).
+    A base64 "image_data" string is decoded straight from the buffer into
+    res["image_bytes"] instead of going through a multi-MB Python str; the rest
+    of the object is parsed normally. Anything unusual takes the plain path.
+    """
+    end = len(buf) if end is None else end
+    k = buf.find(_IMAGE_KEY, start, end)
+    if k != -1:
+        colon = buf.find(b":", k + len(_IMAGE_KEY), end)
+        q1 = buf.find(b'"', colon + 1, end) if colon != -1 else -1
+        q2 = buf.find(b'"', q1 + 1, end) if q1 != -1 else -1
+        # base64 never needs JSON escapes; a backslash means something else is going on
+        if q2 != -1 and buf.find(b"\\", q1 + 1, q2) == -1:
+            obj = json.loads(bytes(buf[start:q1 + 1]) + bytes(buf[q2:end]))
+            if isinstance(obj, dict) and obj.get("image_data") == "":
+                with memoryview(buf) as mv:
+                    obj["image_bytes"] = binascii.a2b_base64(mv[q1 + 1:q2])
+                del obj["image_data"]
+                return obj
+    return json.loads(bytes(buf[start:end]))
 
-    These access points are documented as "Common Access Points" in the CUA docs.
+
+def _ws_bounds(buf) -> Tuple[int, int]:
+    """(start, end) of buf without leading/trailing whitespace, without copying it."""
+    start, end = 0, len(buf)
+    while start < end and buf[start] in b" \t\r\n":
+        start += 1
+    while end > start and buf[end - 1] in b" \t\r\n":
+        end -= 1
+    return start, end
+
+
+class _CmdStreamParser:
+    """
+    Incremental version of _parse_sse_or_json for a /cmd response body.
+    feed() raw chunks as they arrive, then close() for the result.
+    - JSON body: accumulated once, then parsed with _loads_cmd_payload.
+    - SSE body: complete `data:` lines are parsed and dropped as they arrive,
+      so only the current event is ever buffered; the last event wins.
+    Bodies that are neither go through _parse_sse_or_json for the same errors.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._scan = 0                    # bytes of _buf already searched for a newline
+        self._mode: Optional[str] = None  # "json" | "sse"
+        self._last: Any = None
+        self._other: List[bytes] = []     # non-data SSE lines, only for the fallback path
+
+    def feed(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self._buf += chunk
+        if self._mode is None:
+            start, _ = _ws_bounds(self._buf)
+            if start == len(self._buf):
+                return
+            self._mode = "json" if self._buf[start] == ord("{") else "sse"
+        if self._mode == "sse":
+            self._drain_lines()
+
+    def _drain_lines(self) -> None:
+        pos = 0
+        buf = self._buf
+        nl = buf.find(b"\n", self._scan)
+        while nl != -1:
+            self._handle_line(pos, nl)
+            pos = nl + 1
+            nl = buf.find(b"\n", pos)
+        if pos:
+            del buf[:pos]
+        self._scan = len(buf)
+
+    def _handle_line(self, start: int, end: int) -> None:
+        buf = self._buf
+        while start < end and buf[start] in b" \t":
+            start += 1
+        while end > start and buf[end - 1] in b" \t\r":
+            end -= 1
+        if start == end:
+            return
+        if not buf.startswith(b"data:", start, end):
+            self._other.append(bytes(buf[start:end]))
+            return
+        start += len(b"data:")
+        while start < end and buf[start] in b" \t":
+            start += 1
+        if buf[start:start + 1] == b"{" and buf[end - 1:end] == b"}":
+            try:
+                self._last = _loads_cmd_payload(buf, start, end)
+            except Exception:
+                pass
+        else:
+            self._other.append(bytes(buf[start:end]))
+
+    def close(self) -> Any:
+        if self._mode == "json":
+            start, end = _ws_bounds(self._buf)
+            if self._buf[end - 1:end] == b"}":
+                try:
+                    return _loads_cmd_payload(self._buf, start, end)
+                except ValueError:
+                    pass
+            return _parse_sse_or_json(self._buf.decode("utf-8", errors="replace"))
+
+        if self._buf:
+            self._buf += b"\n"
+            self._drain_lines()
+        if self._last is not None:
+            return self._last
+        text = b"\n".join(self._other).decode("utf-8", errors="replace")
+        return _parse_sse_or_json(text)
+
+
+def _decode_screenshot(res: Any) -> Image.Image:
+    """
+    Decode a /cmd screenshot response: {"success": true, "image_data": "<base64_png>"}
+    (or "image_bytes" when the streaming parser already decoded it).
+    """
+    if not (isinstance(res, dict) and res.get("success") is True
+            and ("image_bytes" in res or "image_data" in res)):
+        raise ValueError(f"Unexpected screenshot content: {str(res)[:200]}")
+
+    raw = res["image_bytes"] if "image_bytes" in res else base64.b64decode(res["image_data"])
+    img = Image.open(BytesIO(raw))
+    # screenshots are normally RGB PNGs already: skip the extra full-frame copy
+    return img if img.mode == "RGB" else img.convert("RGB")
+
+
+def _parse_screen_size(res: Any) -> Tuple[int, int]:
+    """
+    Accepted formats:
+    A) {"success": true, "size": {"width": 1395, "height": 1016}}
+    B) {"success": true, "width": 1395, "height": 1016}
+    """
+    if not (isinstance(res, dict) and res.get("success") is True):
+        raise ValueError(f"Invalid screen size from server: {res}")
+
+    size = res.get("size")
+    if isinstance(size, dict) and "width" in size and "height" in size:
+        return int(size["width"]), int(size["height"])
+
+    if "width" in res and "height" in res:
+        return int(res["width"]), int(res["height"])
+
+    raise ValueError(f"Invalid screen size shape: {res}")
+
+
+def _parse_resolution(value: Any) -> Optional[Tuple[int, int]]:
+    """'1920x1080' -> (1920, 1080); None if it does not look like WxH."""
+    try:
+        w, h = str(value).lower().split("x", 1)
+        w, h = int(w), int(h)
+    except ValueError:
+        return None
+    return (w, h) if w > 0 and h > 0 else None
+
+
+def _clip_box(region: Sequence[int], screen: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    """(left, top, right, bottom) clamped to the screen; ValueError if nothing is left."""
+    w, h = screen
+    left, top, right, bottom = (int(round(v)) for v in region)
+    box = (max(0, left), max(0, top), min(w, right), min(h, bottom))
+    if box[2] <= box[0] or box[3] <= box[1]:
+        raise ValueError(f"Screenshot region {tuple(region)} is outside the {w}x{h} screen")
+    return box
+
+
+def _fit_size(size: Tuple[int, int], max_dim: int) -> Tuple[int, int]:
+    """Size scaled so the longer side is at most max_dim (same rounding as vision.resize_keep_aspect)."""
+    w, h = size
+    if w <= max_dim and h <= max_dim:
+        return w, h
+    if w >= h:
+        return max_dim, max(1, int(h * max_dim / w))
+    return max(1, int(w * max_dim / h)), max_dim
+
+
+def _downscale(img: Image.Image, max_dim: int) -> Image.Image:
+    size = _fit_size(img.size, int(max_dim))
+    if size == img.size:
+        return img
+    # reducing_gap: cheap integer box-reduce first, LANCZOS only for the last step
+    return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def _norm_to_px(x: float, y: float, w: int, h: int) -> Tuple[int, int]:
+    # x/y normalized (0..1). Clamp and map into [0..w-1]/[0..h-1]
+    xn = max(0.0, min(1.0, float(x)))
+    yn = max(0.0, min(1.0, float(y)))
+    px = int(xn * max(0, w - 1))
+    py = int(yn * max(0, h - 1))
+    return px, py
+
+
+class _SharedFile:
+    """
+    Lets several http.client.HTTPResponse objects read one buffered socket file
+    in turn. HTTPResponse closes its file after each body, so close() is a no-op.
+    """
+
+    def __init__(self, fp):
+        self._fp = fp
+
+    def makefile(self, *args, **kwargs):
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._fp, name)
+
+    def close(self) -> None:
+        pass
+
+
+class _PipelineNotSent(OSError):
+    """The pipelined batch failed before any request byte reached the server."""
+
+
+def _pipeline_post(url: str, bodies: Sequence[Dict[str, Any]], timeout: float) -> List[Any]:
+    """
+    HTTP/1.1 pipelining: write every POST on one connection, then read the
+    responses back in order. Returns the parsed responses; a list shorter than
+    `bodies` means the server answered `Connection: close` and did not read the
+    rest. Raises _PipelineNotSent if the connection failed before anything was
+    written; any later error is raised as is (the server may have run the
+    unanswered commands).
+    """
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    try:
+        conn.connect()
+    except OSError as e:
+        raise _PipelineNotSent(str(e)) from e
+    fp = None
+    try:
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        host = f"{parts.hostname}:{parts.port or 80}"
+        out = bytearray()
+        for body in bodies:
+            payload = json.dumps(body).encode("utf-8")
+            out += (
+                f"POST {parts.path or '/'} HTTP/1.1\r\n"
+                f"Host: {host}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                "Connection: keep-alive\r\n\r\n"
+            ).encode("ascii")
+            out += payload
+        conn.sock.sendall(bytes(out))
+
+        fp = conn.sock.makefile("rb")
+        shared = _SharedFile(fp)
+        results: List[Any] = []
+        for _ in bodies:
+            resp = http.client.HTTPResponse(shared)
+            resp.begin()
+            parser = _CmdStreamParser()
+            parser.feed(resp.read())
+            results.append(parser.close())
+            if resp.will_close:
+                break
+        return results
+    finally:
+        if fp is not None:
+            fp.close()
+        conn.close()
+
+
+class _PooledHttp:
+    """
+    Keep-alive HTTP transport shared by every thread that talks to one Sandbox.
+
+    requests.Session is not thread-safe, so each thread gets its own Session,
+    but all of them are mounted on ONE HTTPAdapter. The adapter's urllib3 pool
+    is thread-safe, so the agent worker and GUI threads reuse the same
+    persistent connections instead of opening a TCP connection per command.
+    """
+
+    def __init__(self, pool_size: int = 8):
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, int(pool_size)), max_retries=0)
+        self._local = threading.local()
+
+    def session(self) -> requests.Session:
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = requests.Session()
+            s.mount("http://", self._adapter)
+            s.mount("https://", self._adapter)
+            self._local.session = s
+        return s
+
+    def get(self, url: str, timeout: float) -> requests.Response:
+        return self.session().get(url, timeout=timeout)
+
+    def post(self, url: str, body: Dict[str, Any], timeout: float, stream: bool = False) -> requests.Response:
+        return self.session().post(url, json=body, timeout=timeout, stream=stream)
+
+    def close(self) -> None:
+        self._adapter.close()
+
+
+class CommandBatch:
+    """Input commands queued inside Sandbox.batch(); `results` is filled when the block exits."""
+
+    def __init__(self):
+        self.commands: List[Tuple[str, Dict[str, Any]]] = []
+        self.results: List[Dict[str, Any]] = []
+
+
+# Files captured by a "session" baseline live inside the container.
+_BASELINE_TAR = "/tmp/.cua_baseline.tar"
+_RESTORE_DIR = "/tmp/.cua_restore"
+
+
+@dataclass
+class Baseline:
+    """
+    Desktop state captured by Sandbox.capture_baseline().
+
+    mode="session": PIDs alive at capture + a tarball of `paths` inside the container.
+                    reset() kills every newer process and restores the files.
+    mode="commit":  the container filesystem committed as `image`.
+                    reset() re-creates the container from it (fresh boot, no pull).
+    """
+    mode: str
+    pids: List[int] = field(default_factory=list)
+    paths: Tuple[str, ...] = ()
+    image: str = ""
+    created_at: float = 0.0
+
+
+class ContainerLifecycle:
+    """
+    Container naming, host ports, readiness settings and the docker side of
+    start()/stop(), shared by Sandbox and AsyncSandbox (which only needs this
+    part, not a second HTTP client, capture backend and frame buffers).
     """
 
     def __init__(self, cfg):
@@ -129,57 +438,245 @@ class Sandbox:
         self.vnc_col_depth = int(_safe_getattr(cfg, "VNC_COL_DEPTH", 24))
         self.shm_size = _safe_getattr(cfg, "DOCKER_SHM_SIZE", "512m")
 
-        # screen size cache (avoid spamming /cmd)
-        self._screen_cache: Optional[Tuple[int, int]] = None
-        self._screen_cache_ts: float = 0.0
-        self._screen_cache_ttl: float = float(_safe_getattr(cfg, "SCREEN_CACHE_TTL", 0.5))
-
         self.api_ready_timeout = float(_safe_getattr(cfg, "API_READY_TIMEOUT", 180.0))
+        # readiness polling: backoff from MIN to API_READY_INTERVAL, short per-probe timeouts
         self.api_ready_interval = float(_safe_getattr(cfg, "API_READY_INTERVAL", 1.0))
+        self.api_ready_min_interval = min(
+            float(_safe_getattr(cfg, "API_READY_MIN_INTERVAL", 0.05)), self.api_ready_interval
+        )
+        self.api_probe_timeout = float(_safe_getattr(cfg, "API_PROBE_TIMEOUT", 2.0))
+        self.api_probe_connect_timeout = min(0.5, self.api_probe_timeout)
+        self.api_state_interval = float(_safe_getattr(cfg, "API_STATE_INTERVAL", 2.0))
 
         self.http_timeout = float(_safe_getattr(cfg, "HTTP_TIMEOUT", 30.0))
+        # per-command overrides, e.g. a short timeout for pointer moves
+        self.cmd_timeouts: Dict[str, float] = {
+            str(k): float(v) for k, v in _safe_getattr(cfg, "HTTP_CMD_TIMEOUTS", ())
+        }
 
-    # -----------------------
-    # Lifecycle
-    # -----------------------
-    def start(self) -> None:
-        """
-        - If the container is already running: just wait for API readiness.
-        - If not running: start it with docker run and wait for API readiness.
-        """
-        if _docker_running(self.container_name):
-            env = _docker_env(self.container_name)
+        # created on first use (DOCKER_BACKEND: auto | api | cli)
+        self._docker = None
+        self._watch_container = False  # set once start() owns the container
+
+    @property
+    def docker(self):
+        """Container lifecycle client: Docker Engine API over the unix socket, docker CLI as fallback."""
+        if self._docker is None:
+            self._docker = make_docker_client(self.cfg)
+        return self._docker
+
+    def _container_spec(self) -> ContainerSpec:
+        return ContainerSpec(
+            name=self.container_name,
+            image=self.image,
+            env={
+                "VNC_RESOLUTION": str(self.vnc_resolution),
+                "VNC_COL_DEPTH": str(self.vnc_col_depth),
+            },
+            ports=[
+                (self.host_vnc_port, self.container_vnc_port),
+                (self.host_novnc_port, self.container_novnc_port),
+                (self.host_api_port, self.container_api_port),
+            ],
+            shm_size=self.shm_size,
+        )
+
+    def _ensure_container(self) -> None:
+        """Docker side of start(): make sure the container runs with the wanted VNC env."""
+        # state and env come from the same inspect call
+        info = self.docker.inspect(self.container_name)
+        if info.running:
             want_res = str(self.vnc_resolution)
             want_depth = str(self.vnc_col_depth)
-            if env.get("VNC_RESOLUTION") != want_res or env.get("VNC_COL_DEPTH") != want_depth:
+            if info.env.get("VNC_RESOLUTION") != want_res or info.env.get("VNC_COL_DEPTH") != want_depth:
                 print("[SANDBOX] VNC env changed -> restarting container...")
                 self.stop()
             else:
                 print(f"[SANDBOX] Container already running: {self.container_name}")
-                self._wait_api_ready(timeout=self.api_ready_timeout)
                 return
+        elif info.exists:
+            # Remove stopped container with the same name (port mapping may have changed)
+            self.docker.remove(self.container_name)
 
-        # Remove stopped container with the same name if it exists (port mapping may have changed)
-        if _docker_exists(self.container_name) and not _docker_running(self.container_name):
-            subprocess.run(["docker", "rm", "-f", self.container_name], check=False)
-
-        print("[SANDBOX] Starting container...")
-        cmd = [
-            "docker", "run", "-d",
-            "--name", self.container_name,
-            f"--shm-size={self.shm_size}",
-            "-e", f"VNC_RESOLUTION={self.vnc_resolution}",
-            "-e", f"VNC_COL_DEPTH={self.vnc_col_depth}",
-            "-p", f"{self.host_vnc_port}:{self.container_vnc_port}",
-            "-p", f"{self.host_novnc_port}:{self.container_novnc_port}",
-            "-p", f"{self.host_api_port}:{self.container_api_port}",
-            self.image,
-        ]
-        subprocess.run(cmd, check=True)
-        self._wait_api_ready(timeout=self.api_ready_timeout)
+        print(f"[SANDBOX] Starting container ({self.docker.name})...")
+        self.docker.run(self._container_spec())
 
     def stop(self) -> None:
-        subprocess.run(["docker", "rm", "-f", self.container_name], check=False)
+        self.docker.remove(self.container_name)
+
+    def _check_container_alive(self) -> None:
+        """Raise if the container exited / is crash-looping (only once start() created it)."""
+        if not self._watch_container:
+            return
+        try:
+            info = self.docker.inspect(self.container_name)
+        except Exception:
+            return  # daemon hiccup: keep probing the API
+        if not info.exists:
+            raise RuntimeError(f"Container {self.container_name} disappeared while waiting for the API")
+        if info.restarting or not info.running:
+            raise RuntimeError(
+                f"Container {self.container_name} is {info.status or 'not running'} "
+                f"(exit code {info.exit_code}); see `docker logs {self.container_name}`"
+            )
+
+    def close(self) -> None:
+        if self._docker is not None:
+            self._docker.close()
+
+
+class Sandbox(ContainerLifecycle):
+    """
+    Minimal "computer-server" REST wrapper for the trycua/cua-xfce container.
+    Host -> container port map:
+      - API (container:8000)  -> host:API_PORT
+      - VNC (container:5901)  -> host:VNC_PORT
+      - noVNC (container:6901)-> host:NOVNC_PORT
+
+    These access points are documented as "Common Access Points" in the CUA docs.
+    """
+
+    def __init__(self, cfg):
+        super().__init__(cfg)
+
+        # server-side screenshot crop/scale: None = not probed yet, then True/False
+        self.server_crop: Optional[bool] = None if _safe_getattr(cfg, "SCREENSHOT_SERVER_CROP", True) else False
+
+        # screen geometry: learned from VNC_RESOLUTION, the readiness probe and every
+        # captured frame; only re-queried after invalidate_screen_size()
+        self._screen_cache: Optional[Tuple[int, int]] = None
+
+        self.ready_phases: Dict[str, float] = {}
+
+        self._http = _PooledHttp(int(_safe_getattr(cfg, "HTTP_POOL_SIZE", 8)))
+
+        # SANDBOX_TRANSPORT="ws": /cmd messages over one persistent WebSocket (HTTP if unsupported)
+        self.transport = str(_safe_getattr(cfg, "SANDBOX_TRANSPORT", "http")).lower()
+        self._ws: Optional[WebSocketTransport] = None
+        if self.transport == "ws":
+            self._ws = WebSocketTransport(
+                f"ws://{self.api_host}:{self.host_api_port}{_safe_getattr(cfg, 'WS_PATH', '/ws')}",
+                loads=_loads_cmd_payload,
+                connect_timeout=min(5.0, self.http_timeout),
+                heartbeat_interval=float(_safe_getattr(cfg, "WS_HEARTBEAT_INTERVAL", 10.0)),
+                heartbeat_timeout=float(_safe_getattr(cfg, "WS_HEARTBEAT_TIMEOUT", 30.0)),
+            )
+
+        # HTTP/1.1 pipelining for batched commands; latched off if the server refuses it
+        self.pipeline_enabled = bool(_safe_getattr(cfg, "SANDBOX_PIPELINE", True))
+        self._tls = threading.local()
+
+        # where screenshot() frames come from (CAPTURE_BACKEND: http | vnc)
+        self.capture: CaptureBackend = make_capture_backend(self, cfg)
+        # shared, coalesced access to screenshot() for the GUI and agent threads
+        self.frames = FrameBroker(self.grab_frame)
+        # the last screens the agent looked at, downscaled, under a fixed byte budget
+        self.ring = FrameRing(
+            budget_bytes=int(_safe_getattr(cfg, "FRAME_RING_BYTES", 8 * 2**20)),
+            max_dim=int(_safe_getattr(cfg, "FRAME_RING_DIM", 320)),
+        )
+
+        self.start_timings: Dict[str, float] = {}
+
+    # -----------------------
+    # Lifecycle
+    # -----------------------
+    def start(self) -> None:
+        """
+        - If the container is already running: just wait for API readiness.
+        - If not running: start it with docker run and wait for API readiness.
+        """
+        t0 = time.perf_counter()
+        self._ensure_container()
+        self._watch_container = True
+        # _ensure_container() guarantees the container runs with this VNC_RESOLUTION
+        env_size = _parse_resolution(self.vnc_resolution)
+        if env_size:
+            self._set_screen_size(env_size, "VNC_RESOLUTION")
+        t1 = time.perf_counter()
+        self._wait_api_ready(timeout=self.api_ready_timeout)
+        t2 = time.perf_counter()
+        self.start_timings = {"container": t1 - t0, "api_ready": t2 - t1, "total": t2 - t0}
+        self.start_timings.update({f"api_{k}": v for k, v in self.ready_phases.items()})
+
+    def _exec_sh(self, script: str) -> str:
+        code, out = self.docker.exec(self.container_name, ["sh", "-c", script], user="root")
+        if code != 0:
+            raise DockerError(f"exec in {self.container_name} failed ({code}): {out.strip()[:200]}")
+        return out
+
+    def capture_baseline(self, mode: Optional[str] = None) -> Baseline:
+        """
+        Record the current desktop as the state reset() returns to (RESET_MODE: session | commit).
+        Raises DockerError if the RESET_PATHS archive could not be written.
+        """
+        mode = str(mode or _safe_getattr(self.cfg, "RESET_MODE", "session")).lower()
+        if mode == "commit":
+            image = f"cua-baseline/{self.container_name}:latest"
+            self.docker.commit(self.container_name, image)
+            return Baseline(mode=mode, image=image, created_at=time.time())
+        if mode != "session":
+            raise ValueError(f"Unknown reset mode: {mode}")
+
+        paths = tuple(str(p) for p in _safe_getattr(self.cfg, "RESET_PATHS", ("/home",)))
+        rel = " ".join(p.lstrip("/") for p in paths)
+        script = ""
+        if rel:
+            # written aside and renamed, so a failed capture never replaces a good archive
+            script += (f"tar -cf {_BASELINE_TAR}.part -C / {rel} && mv {_BASELINE_TAR}.part {_BASELINE_TAR} "
+                       f"|| {{ echo 'baseline archive failed'; exit 1; }}; ")
+        script += "ps -eo pid="
+        pids = [int(tok) for tok in self._exec_sh(script).split() if tok.isdigit()]
+        return Baseline(mode=mode, pids=pids, paths=paths, created_at=time.time())
+
+    def reset(self, baseline: Baseline) -> float:
+        """
+        Return the desktop to `baseline` without a cold container start.
+        Returns the seconds it took. In session mode the archive is unpacked
+        into a staging directory first; if that fails nothing is killed or
+        deleted and DockerError is raised.
+        """
+        t0 = time.perf_counter()
+        if baseline.mode == "commit":
+            self.stop()
+            spec = self._container_spec()
+            spec.image = baseline.image
+            self.docker.run(spec)
+            self._wait_api_ready(timeout=self.api_ready_timeout)
+        elif baseline.mode == "session":
+            keep = " ".join(str(p) for p in baseline.pids)
+            script = ""
+            if baseline.paths:
+                script += (f"rm -rf {_RESTORE_DIR} && mkdir -p {_RESTORE_DIR} && "
+                           f"tar -xpf {_BASELINE_TAR} -C {_RESTORE_DIR} "
+                           f"|| {{ echo 'baseline archive unusable, nothing reset'; exit 1; }}; ")
+            script += (
+                f'KEEP=" {keep} "; '
+                'for p in $(ps -eo pid=); do '
+                'case "$KEEP" in *" $p "*) ;; *) [ "$p" = "$$" ] || kill -9 "$p" 2>/dev/null ;; esac; '
+                'done'
+            )
+            if baseline.paths:
+                rel = " ".join(p.lstrip("/") for p in baseline.paths)
+                script += (f'; for t in {rel}; do rm -rf "/$t" && mv "{_RESTORE_DIR}/$t" "/$t" || exit 1; done'
+                           f"; rm -rf {_RESTORE_DIR}")
+            self._exec_sh(script)
+        else:
+            raise ValueError(f"Unknown reset mode: {baseline.mode}")
+
+        # the screen may have changed size with the old session
+        self.invalidate_screen_size()
+        dt = time.perf_counter() - t0
+        print(f"[SANDBOX] Reset ({baseline.mode}) in {dt:.2f}s: {self.container_name}")
+        return dt
+
+    def close(self) -> None:
+        """Release pooled HTTP connections and the capture backend (the container keeps running)."""
+        self.capture.close()
+        self._http.close()
+        if self._ws is not None:
+            self._ws.close()
+        super().close()
 
     def launch_vnc_viewer(self) -> None:
         """
@@ -195,149 +692,389 @@ class Sandbox:
     # -----------------------
     # Readiness
     # -----------------------
+    def _port_open(self, timeout: float) -> bool:
+        try:
+            with socket.create_connection((self.api_host, self.host_api_port), timeout=timeout):
+                return True
+        except OSError:
+            return False
+
     def _wait_api_ready(self, timeout: float) -> None:
         """
         Some image versions have /status, some don't.
         Strategy:
-          1) Try GET /status (if available)
-          2) Otherwise try POST /cmd get_screen_size
+          1) TCP connect to the API port (cheap; no HTTP until something listens)
+          2) GET /status (skipped from then on if it answers 404)
+          3) Otherwise POST /cmd get_screen_size
+        Probes use API_PROBE_TIMEOUT instead of HTTP_TIMEOUT, so a port that accepts
+        but hangs costs one short probe. Polling backs off exponentially from
+        API_READY_MIN_INTERVAL to API_READY_INTERVAL and restarts fast whenever a
+        phase advances. The container state is checked every API_STATE_INTERVAL
+        seconds to fail fast if it exits or restarts.
+        Phase timings (seconds since the wait began) land in self.ready_phases.
         """
         print(f"[SANDBOX] Waiting up to {int(timeout)}s for API to become ready at {self.cmd_url} ...")
         t0 = time.time()
         last_err: Optional[Exception] = None
+        phases: Dict[str, float] = {}
+        self.ready_phases = phases
+        delay = self.api_ready_min_interval
+        next_state_check = t0 + self.api_state_interval  # start() just inspected it
+        has_status = True
+        probes = 0
+
+        def _advance(phase: str) -> None:
+            nonlocal delay
+            if phase not in phases:
+                phases[phase] = time.time() - t0
+                delay = self.api_ready_min_interval
+
+        def _ready(via: str) -> None:
+            _advance("ready")
+            detail = ", ".join(f"{k} {v:.2f}s" for k, v in phases.items())
+            print(f"[SANDBOX] API ready ({via}) after {phases['ready']:.2f}s [{detail}; {probes} probes]")
 
         while time.time() - t0 < timeout:
-            # 1) /status
-            try:
-                r = requests.get(self.status_url, timeout=self.http_timeout)
-                if r.status_code == 200:
-                    # some versions may return empty body; 200 is sufficient
-                    print("[SANDBOX] API ready (/status).")
-                    return
-            except Exception as e:
-                last_err = e
+            if time.time() >= next_state_check:
+                self._check_container_alive()
+                next_state_check = time.time() + self.api_state_interval
 
-            # 2) /cmd get_screen_size
-            try:
-                res = self._post_cmd("get_screen_size", {})
-                if isinstance(res, dict) and res.get("success") is True:
-                    print("[SANDBOX] API ready (/cmd).")
-                    return
-            except Exception as e:
-                last_err = e
+            probes += 1
+            if self._port_open(self.api_probe_connect_timeout):
+                _advance("port_open")
+                probe_timeout = (self.api_probe_connect_timeout, self.api_probe_timeout)
+
+                # 1) /status
+                if has_status:
+                    try:
+                        r = self._http.get(self.status_url, timeout=probe_timeout)
+                        _advance("http")
+                        if r.status_code == 200:
+                            # some versions may return empty body; 200 is sufficient
+                            _ready("/status")
+                            return
+                        if r.status_code == 404:
+                            has_status = False
+                    except Exception as e:
+                        last_err = e
+
+                # 2) /cmd get_screen_size
+                try:
+                    res = self._post_cmd("get_screen_size", {}, timeout=probe_timeout)
+                    _advance("http")
+                    if isinstance(res, dict) and res.get("success") is True:
+                        try:
+                            self._set_screen_size(_parse_screen_size(res), "/cmd")
+                        except ValueError:
+                            pass
+                        _ready("/cmd")
+                        return
+                except Exception as e:
+                    last_err = e
+            else:
+                last_err = ConnectionRefusedError(f"{self.api_host}:{self.host_api_port} not accepting connections")
 
-            time.sleep(self.api_ready_interval)
+            remaining = timeout - (time.time() - t0)
+            time.sleep(max(0.0, min(delay, remaining)))
+            delay = min(delay * 2.0, self.api_ready_interval)
 
         raise TimeoutError(f"Sandbox API did not become ready in time. Last error: {last_err}")
 
     # -----------------------
     # Low-level /cmd
     # -----------------------
-    def _post_cmd(self, command: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    def _cmd_timeout(self, command: str) -> float:
+        return self.cmd_timeouts.get(command, self.http_timeout)
+
+    def _post_cmd(self, command: str, params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        if timeout is None:
+            timeout = self._cmd_timeout(command)
+        if self._ws is not None:
+            # readiness probes pass (connect, read) for requests; one number here
+            ws_timeout = timeout[-1] if isinstance(timeout, tuple) else timeout
+            results = self._ws_send([(command, params or {})], ws_timeout)
+            if results is not None:
+                return results[0]
         body = {"command": command, "params": params or {}}
-        r = requests.post(self.cmd_url, json=body, timeout=self.http_timeout)
-        parsed = _parse_sse_or_json(r.text)
+        # Stream the body: screenshots are several MB of base64 and should not be
+        # copied through str/splitlines before decoding.
+        parser = _CmdStreamParser()
+        with self._http.post(self.cmd_url, body, timeout=timeout, stream=True) as r:
+            for chunk in r.iter_content(chunk_size=_STREAM_CHUNK):
+                parser.feed(chunk)
+        parsed = parser.close()
         if not isinstance(parsed, dict):
             raise ValueError(f"Unexpected parsed type from /cmd: {type(parsed)}")
         return parsed
 
+    def _ws_send(self, commands: Sequence[Tuple[str, Dict[str, Any]]], timeout: float) -> Optional[List[Dict[str, Any]]]:
+        """
+        Commands over the WebSocket transport, all in flight at once.
+        None if the server has no WebSocket endpoint (HTTP is used from then on).
+        """
+        try:
+            results = self._ws.request_many(commands, timeout)
+        except WebSocketUnsupported as e:
+            print(f"[SANDBOX] {e} -> using HTTP /cmd.")
+            self._ws.close()
+            self._ws = None
+            return None
+        for r in results:
+            if not isinstance(r, dict):
+                raise ValueError(f"Unexpected parsed type from /cmd: {type(r)}")
+        return results
+
+    # -----------------------
+    # Batching
+    # -----------------------
+    def send_many(self, commands: Sequence[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Send several /cmd commands in order and return their results.
+        With more than one command they are pipelined over a single connection;
+        if the server closes it after some answers (no pipelining support), the
+        unanswered ones are sent sequentially and pipelining is disabled. A
+        batch that breaks once written raises instead: resending could run a
+        click or typed text twice.
+        """
+        commands = [(str(c), dict(p or {})) for c, p in commands]
+        if self._ws is not None and len(commands) > 1:
+            results = self._ws_send(commands, max(self._cmd_timeout(c) for c, _ in commands))
+            if results is not None:
+                return results
+        if len(commands) <= 1 or not self.pipeline_enabled:
+            return [self._post_cmd(c, p) for c, p in commands]
+
+        bodies = [{"command": c, "params": p} for c, p in commands]
+        timeout = max(self._cmd_timeout(c) for c, _ in commands)
+        try:
+            results = _pipeline_post(self.cmd_url, bodies, timeout)
+        except _PipelineNotSent:
+            results = []  # nothing reached the server: safe to send one by one
+
+        for r in results:
+            if not isinstance(r, dict):
+                raise ValueError(f"Unexpected parsed type from /cmd: {type(r)}")
+
+        if len(results) < len(commands):
+            print("[SANDBOX] Server did not answer pipelined batch -> falling back to sequential /cmd.")
+            self.pipeline_enabled = False
+            for c, p in commands[len(results):]:
+                results.append(self._post_cmd(c, p))
+        return results
+
+    @contextmanager
+    def batch(self) -> Iterator[CommandBatch]:
+        """
+        Queue input commands issued by this thread and ship them together on exit:
+
+            with sandbox.batch() as b:
+                sandbox.mouse_move_norm(x, y)
+                sandbox.mouse_down(1)
+            b.results  # one result dict per command
+
+        Queries (screenshot, get_screen_size) are never queued. Nested blocks
+        join the outer batch. Nothing is sent if the block raises.
+        """
+        outer = getattr(self._tls, "batch", None)
+        if outer is not None:
+            yield outer
+            return
+
+        b = CommandBatch()
+        self._tls.batch = b
+        try:
+            yield b
+        finally:
+            self._tls.batch = None
+        b.results = self.send_many(b.commands)
+
+    def _send_input(self, command: str, params: Dict[str, Any]) -> None:
+        b = getattr(self._tls, "batch", None)
+        if b is not None:
+            b.commands.append((command, params))
+        else:
+            self._post_cmd(command, params)
+
     # -----------------------
     # Public actions
     # -----------------------
-    def screenshot(self) -> Image.Image:
+    def screenshot(self, region: Optional[Tuple[int, int, int, int]] = None,
+                   max_dim: Optional[int] = None) -> Image.Image:
+        """
+        Current screen from the configured capture backend. A failing non-HTTP
+        backend (e.g. VNC not reachable yet) falls back to /cmd screenshot.
+
+        region=(left, top, right, bottom) in screen pixels returns only that crop;
+        max_dim scales the result (keeping aspect) so neither side exceeds it.
+        Over HTTP the server is asked to crop/scale first (so less is encoded and
+        moved); if it ignores the request the client does it instead.
+        """
+        if region is None and max_dim is None:
+            return self.grab_frame().image
+
+        box = None
+        if region is not None:
+            box = _clip_box(region, self.get_screen_size())
+        if isinstance(self.capture, HttpCapture) and self.server_crop is not False:
+            img, done = self._screenshot_http_partial(box, max_dim)
+            if done:
+                return img
+            # the server sent the full frame: finish it here
+            if box is not None:
+                img = img.crop(box)
+        elif box is not None:
+            img = self._grab_region(box)
+        else:
+            img = self.grab_frame().image
+        return _downscale(img, max_dim) if max_dim else img
+
+    def grab_frame(self) -> Frame:
+        """
+        Full screen as a Frame (src/frame.py). With VNC capture this is a copy into
+        a recycled buffer and no PIL image is built unless someone asks for one.
+        """
+        if isinstance(self.capture, HttpCapture):
+            frame = Frame(image=self._screenshot_http())
+        else:
+            try:
+                frame = self.capture.grab_frame()
+            except Exception as e:
+                print(f"[SANDBOX] {self.capture.name} capture failed ({e}) -> HTTP screenshot.")
+                frame = Frame(image=self._screenshot_http())
+        # every frame doubles as a geometry probe (catches resolution changes for free)
+        self._set_screen_size(frame.size, "frame")
+        return frame
+
+    def _grab_region(self, box: Tuple[int, int, int, int]) -> Image.Image:
+        try:
+            return self.capture.grab_region(box)
+        except Exception as e:
+            print(f"[SANDBOX] {self.capture.name} capture failed ({e}) -> HTTP screenshot.")
+            return self._screenshot_http().crop(box)
+
+    def _screenshot_http_partial(self, box: Optional[Tuple[int, int, int, int]],
+                                 max_dim: Optional[int]) -> Tuple[Image.Image, bool]:
+        """
+        /cmd screenshot with {"region": {x, y, width, height}, "max_dim": n}.
+        Returns (image, True) if the server cropped/scaled, or (full frame, False)
+        if it ignored or rejected the parameters; the answer is remembered in
+        self.server_crop.
+        """
+        params: Dict[str, Any] = {}
+        if box is not None:
+            params["region"] = {"x": box[0], "y": box[1], "width": box[2] - box[0], "height": box[3] - box[1]}
+        if max_dim:
+            params["max_dim"] = int(max_dim)
+        try:
+            img = _decode_screenshot(self._post_cmd("screenshot", params))
+        except (ValueError, OSError) as e:
+            # older servers answer {"success": false, "error": "... unexpected keyword argument 'region'"}
+            print(f"[SANDBOX] Screenshot with region/max_dim failed ({str(e)[:120]}) "
+                  "-> cropping/scaling client-side.")
+            self.server_crop = False
+            img = self._screenshot_http()
+            self._set_screen_size(img.size, "frame")
+            return img, False
+
+        base = (box[2] - box[0], box[3] - box[1]) if box is not None else (self._screen_cache or img.size)
+        want = _fit_size(base, max_dim) if max_dim else base
+        if abs(img.size[0] - want[0]) <= 1 and abs(img.size[1] - want[1]) <= 1:
+            if self.server_crop is None:
+                print("[SANDBOX] Server supports screenshot region/max_dim.")
+                self.server_crop = True
+            return img, True
+
+        if self.server_crop is None:
+            print("[SANDBOX] Server ignores screenshot region/max_dim -> cropping/scaling client-side.")
+        self.server_crop = False
+        self._set_screen_size(img.size, "frame")
+        return img, False
+
+    def _screenshot_http(self) -> Image.Image:
         """
         Expected format: {"success": true, "image_data": "<base64_png>"}
         """
         res = self._post_cmd("screenshot", {})
-        if not (isinstance(res, dict) and res.get("success") is True and "image_data" in res):
-            raise ValueError(f"Unexpected screenshot content: {res}")
-
-        raw = base64.b64decode(res["image_data"])
-        img = Image.open(BytesIO(raw)).convert("RGB")
-        return img
+        return _decode_screenshot(res)
 
     def get_screen_size(self) -> Tuple[int, int]:
         """
         Accepted formats:
         A) {"success": true, "size": {"width": 1395, "height": 1016}}
         B) {"success": true, "width": 1395, "height": 1016}
+
+        Only hits /cmd when nothing has told us the geometry yet (or after
+        invalidate_screen_size()); pointer commands normally cost no extra round trip.
         """
-        now = time.time()
-        if self._screen_cache and (now - self._screen_cache_ts) < self._screen_cache_ttl:
-            return self._screen_cache
+        cached = self._screen_cache
+        if cached is not None:
+            return cached
 
         res = self._post_cmd("get_screen_size", {})
-        if not (isinstance(res, dict) and res.get("success") is True):
-            raise ValueError(f"Invalid screen size from server: {res}")
-
-        size = res.get("size")
-        if isinstance(size, dict) and "width" in size and "height" in size:
-            w, h = int(size["width"]), int(size["height"])
-            self._screen_cache = (w, h)
-            self._screen_cache_ts = now
-            return w, h
+        w, h = _parse_screen_size(res)
+        self._set_screen_size((w, h), "/cmd")
+        return w, h
 
-        if "width" in res and "height" in res:
-            w, h = int(res["width"]), int(res["height"])
-            self._screen_cache = (w, h)
-            self._screen_cache_ts = now
-            return w, h
+    def _set_screen_size(self, size: Tuple[int, int], source: str) -> None:
+        size = (int(size[0]), int(size[1]))
+        old = self._screen_cache
+        if old != size:
+            if old is not None:
+                print(f"[SANDBOX] Screen geometry changed {old[0]}x{old[1]} -> {size[0]}x{size[1]} ({source})")
+            self._screen_cache = size
 
-        raise ValueError(f"Invalid screen size shape: {res}")
+    def invalidate_screen_size(self) -> None:
+        """Forget the cached geometry (e.g. after xrandr); the next pointer command re-queries it."""
+        self._screen_cache = None
 
     def _norm_to_px(self, x: float, y: float) -> Tuple[int, int]:
         w, h = self.get_screen_size()
-        # x/y normalized (0..1). Clamp and map into [0..w-1]/[0..h-1]
-        xn = max(0.0, min(1.0, float(x)))
-        yn = max(0.0, min(1.0, float(y)))
-        px = int(xn * max(0, w - 1))
-        py = int(yn * max(0, h - 1))
-        return px, py
+        return _norm_to_px(x, y, w, h)
 
     def left_click_norm(self, x: float, y: float) -> None:
         px, py = self._norm_to_px(x, y)
-        self._post_cmd("left_click", {"x": px, "y": py})
+        self._send_input("left_click", {"x": px, "y": py})
 
     def right_click_norm(self, x: float, y: float) -> None:
         px, py = self._norm_to_px(x, y)
-        self._post_cmd("right_click", {"x": px, "y": py})
+        self._send_input("right_click", {"x": px, "y": py})
 
     def double_click_norm(self, x: float, y: float) -> None:
         px, py = self._norm_to_px(x, y)
-        self._post_cmd("double_click", {"x": px, "y": py})
+        self._send_input("double_click", {"x": px, "y": py})
 
     def type_text(self, text: str) -> None:
-        self._post_cmd("type_text", {"text": str(text)})
+        self._send_input("type_text", {"text": str(text)})
 
     def press_key(self, key: str) -> None:
-        self._post_cmd("press_key", {"key": str(key)})
+        self._send_input("press_key", {"key": str(key)})
 
     def hotkey(self, keys) -> None:
-        self._post_cmd("hotkey", {"keys": list(keys)})
+        self._send_input("hotkey", {"keys": list(keys)})
 
     def scroll(self, amount: int) -> None:
-        self._post_cmd("scroll", {"amount": int(amount)})
+        self._send_input("scroll", {"amount": int(amount)})
 
     # --- Manual control helpers (GUI) ---
     def mouse_move_norm(self, x: float, y: float) -> None:
         px, py = self._norm_to_px(x, y)
-        self._post_cmd("move_cursor", {"x": px, "y": py})
+        self._send_input("move_cursor", {"x": px, "y": py})
 
     def mouse_down(self, button: int = 1) -> None:
-        self._post_cmd("mouse_down", {"button": int(button)})
+        self._send_input("mouse_down", {"button": int(button)})
 
     def mouse_up(self, button: int = 1) -> None:
-        self._post_cmd("mouse_up", {"button": int(button)})
+        self._send_input("mouse_up", {"button": int(button)})
 
     def drag_to_norm(self, x: float, y: float, button: int = 1) -> None:
         px, py = self._norm_to_px(x, y)
-        self._post_cmd("drag_to", {"x": px, "y": py, "button": int(button)})
+        self._send_input("drag_to", {"x": px, "y": py, "button": int(button)})
 
     def key_down(self, key: str) -> None:
-        self._post_cmd("key_down", {"key": str(key)})
+        self._send_input("key_down", {"key": str(key)})
 
     def key_up(self, key: str) -> None:
-        self._post_cmd("key_up", {"key": str(key)})
+        self._send_input("key_up", {"key": str(key)})
 
     def wait(self, seconds: float) -> None:
         time.sleep(float(seconds))
@@ -0,0 +1,214 @@
+# sandbox_pool.py — Warm pool of pre-started, API-ready sandbox containers
+from __future__ import annotations
+
+import copy
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from src.sandbox import Baseline, Sandbox, _safe_getattr
+
+
+class SandboxPool:
+    """
+    Keeps `size` containers started and API-ready in the background so an
+    objective can begin on an already-booted desktop.
+
+    Every slot i gets its own container name and host ports:
+        SANDBOX_NAME = f"{POOL_NAME_PREFIX}_{i}"
+        API_PORT, VNC_PORT, NOVNC_PORT = POOL_PORT_BASE + 3*i + (0, 1, 2)
+    A replacement container reuses its slot's name and ports.
+
+    Usage:
+        pool = SandboxPool(cfg).start()
+        with pool.lease() as sandbox:
+            run_agent(sandbox, ...)
+        pool.close()
+
+    On release the sandbox is replaced by a fresh container in the background
+    (POOL_RECYCLE="replace"), restored to the baseline captured right after it
+    booted ("reset", see Sandbox.reset), or put straight back ("reuse").
+    """
+
+    def __init__(
+        self,
+        cfg,
+        size: Optional[int] = None,
+        sandbox_factory: Callable[[Any], Sandbox] = Sandbox,
+    ):
+        self.cfg = cfg
+        self.size = int(size if size is not None else _safe_getattr(cfg, "POOL_SIZE", 2))
+        self.name_prefix = str(_safe_getattr(cfg, "POOL_NAME_PREFIX", "cua_pool"))
+        self.port_base = int(_safe_getattr(cfg, "POOL_PORT_BASE", 20000))
+        self.recycle = str(_safe_getattr(cfg, "POOL_RECYCLE", "replace")).lower()
+        self.retry_delay = float(_safe_getattr(cfg, "POOL_RETRY_DELAY", 5.0))
+        self._factory = sandbox_factory
+
+        self._ready: "queue.Queue[Sandbox]" = queue.Queue()
+        self._slot_of: Dict[int, int] = {}     # id(sandbox) -> slot
+        self._baselines: Dict[int, Baseline] = {}
+        self._leased: Dict[int, Sandbox] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        # time-to-first-action: seconds each acquire() waited for a ready sandbox
+        self.acquire_waits: List[float] = []
+
+    def slot_cfg(self, slot: int):
+        """Copy of cfg with this slot's container name and host ports."""
+        c = copy.copy(self.cfg)
+        base = self.port_base + 3 * slot
+        c.SANDBOX_NAME = f"{self.name_prefix}_{slot}"
+        c.API_PORT = base
+        c.VNC_PORT = base + 1
+        c.NOVNC_PORT = base + 2
+        return c
+
+    # -----------------------
+    # Lifecycle
+    # -----------------------
+    def start(self) -> "SandboxPool":
+        """Begin warming all slots in background threads (returns immediately)."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(1, self.size),
+                                                thread_name_prefix="sandbox-pool")
+            for slot in range(self.size):
+                self._executor.submit(self._warm, slot)
+        return self
+
+    def _warm(self, slot: int) -> None:
+        while not self._closed:
+            sb = self._factory(self.slot_cfg(slot))
+            try:
+                t0 = time.time()
+                sb.start()
+                baseline = sb.capture_baseline() if self.recycle == "reset" else None
+                print(f"[POOL] Slot {slot} ready in {time.time() - t0:.1f}s: {sb.container_name}")
+            except Exception as e:
+                print(f"[POOL] Slot {slot} failed to start: {e}")
+                self._discard(sb)
+                time.sleep(self.retry_delay)
+                continue
+
+            with self._lock:
+                if not self._closed:
+                    self._slot_of[id(sb)] = slot
+                    if baseline is not None:
+                        self._baselines[id(sb)] = baseline
+                    self._ready.put(sb)
+                    return
+            self._discard(sb)
+            return
+
+    def _discard(self, sb: Sandbox) -> None:
+        try:
+            sb.stop()
+        except Exception as e:
+            print(f"[POOL] stop failed for {sb.container_name}: {e}")
+        sb.close()
+
+    def _forget(self, sb: Sandbox) -> None:
+        with self._lock:
+            self._slot_of.pop(id(sb), None)
+            self._baselines.pop(id(sb), None)
+
+    def _replace(self, sb: Sandbox, slot: int) -> None:
+        self._forget(sb)
+        self._discard(sb)
+        self._warm(slot)
+
+    def _reset(self, sb: Sandbox, slot: int, baseline: Baseline) -> None:
+        try:
+            sb.reset(baseline)
+        except Exception as e:
+            print(f"[POOL] Reset failed for {sb.container_name}, replacing: {e}")
+            self._replace(sb, slot)
+            return
+        self._ready.put(sb)
+
+    # -----------------------
+    # Hand-out
+    # -----------------------
+    def acquire(self, timeout: Optional[float] = None) -> Sandbox:
+        """Next API-ready sandbox; blocks only if every slot is leased or still booting."""
+        if self._executor is None:
+            self.start()
+        t0 = time.time()
+        try:
+            sb = self._ready.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No pooled sandbox became ready within {timeout}s") from None
+        waited = time.time() - t0
+        with self._lock:
+            self._leased[id(sb)] = sb
+            self.acquire_waits.append(waited)
+        return sb
+
+    def release(self, sb: Sandbox, recycle: Optional[str] = None) -> None:
+        """
+        Return a leased sandbox.
+          recycle="replace": remove it and boot a fresh container in its slot (background)
+          recycle="reset":   restore its baseline desktop (background), then hand it out again
+          recycle="reuse":   hand it out again as-is
+        """
+        policy = (recycle or self.recycle).lower()
+        with self._lock:
+            self._leased.pop(id(sb), None)
+            slot = self._slot_of.get(id(sb))
+            baseline = self._baselines.get(id(sb))
+            closed = self._closed
+        if slot is None:
+            raise ValueError("Sandbox does not belong to this pool")
+        if closed:
+            self._discard(sb)
+            return
+
+        if policy == "reuse":
+            self._ready.put(sb)
+        elif policy == "reset" and baseline is not None:
+            self._executor.submit(self._reset, sb, slot, baseline)
+        elif policy in ("replace", "reset"):
+            self._executor.submit(self._replace, sb, slot)
+        else:
+            raise ValueError(f"Unknown recycle policy: {policy}")
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None, recycle: Optional[str] = None) -> Iterator[Sandbox]:
+        sb = self.acquire(timeout=timeout)
+        try:
+            yield sb
+        finally:
+            self.release(sb, recycle=recycle)
+
+    def ready_count(self) -> int:
+        return self._ready.qsize()
+
+    def close(self, stop_containers: bool = True) -> None:
+        """Stop background warming and (by default) remove every pooled container."""
+        with self._lock:
+            self._closed = True
+            leased = list(self._leased.values())
+            self._leased.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        idle: List[Sandbox] = []
+        while True:
+            try:
+                idle.append(self._ready.get_nowait())
+            except queue.Empty:
+                break
+        for sb in idle + leased:
+            if stop_containers:
+                self._discard(sb)
+            else:
+                sb.close()
+
+    def __enter__(self) -> "SandboxPool":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,340 @@
+# screen_change.py — Cheap change detection on small grayscale frames (settle / change waits)
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass, field
+from collections import deque
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.capture import HttpCapture
+from src.config import cfg
+from src.frame import Frame
+
+
+def _gray(rgb: np.ndarray) -> np.ndarray:
+    """(H, W, 3) uint8 -> (H, W) uint8 luma (integer BT.601 weights)."""
+    a = rgb.astype(np.uint16)
+    return ((a[..., 0] * 77 + a[..., 1] * 150 + a[..., 2] * 29) >> 8).astype(np.uint8)
+
+
+def _box_downscale(arr: np.ndarray, step: int) -> np.ndarray:
+    """Average step x step blocks by summing strided slices (no full-size temporaries)."""
+    if step == 1:
+        return arr
+    h, w = arr.shape[0] // step * step, arr.shape[1] // step * step
+    acc = np.zeros((h // step, w // step, arr.shape[2]), dtype=np.uint32)
+    for dy in range(step):
+        for dx in range(step):
+            acc += arr[dy:h:step, dx:w:step]
+    return (acc // (step * step)).astype(np.uint8)
+
+
+def frame_thumb(frame: Frame, max_dim: Optional[int] = None) -> np.ndarray:
+    """
+    Grayscale thumbnail (longest side ~max_dim) of a frame, memoized on it.
+    A box filter over frame.array, so a thin text stroke still shifts a
+    thumbnail pixel (plain subsampling can step right over a typed character).
+    """
+    max_dim = int(max_dim or getattr(cfg, "CHANGE_SAMPLE_DIM", 160))
+
+    def _thumb() -> np.ndarray:
+        arr = frame.array
+        step = max(1, math.ceil(max(arr.shape[:2]) / max_dim))
+        return _gray(_box_downscale(arr, step))
+    return frame.derive(("thumb", max_dim), _thumb)
+
+
+def cheap_sampling(sandbox) -> bool:
+    """False when every sample is a full screenshot over HTTP (PNG encode, transfer, decode)."""
+    return not isinstance(getattr(sandbox, "capture", None), HttpCapture)
+
+
+def grab_thumb(sandbox, max_dim: Optional[int] = None, newer_than: Optional[float] = None) -> np.ndarray:
+    """
+    A grayscale thumbnail of the screen captured after `newer_than` (default: now).
+    Goes through the sandbox's FrameBroker, so a frame the GUI or an earlier
+    caller took since then is reused, and a capture_screen(newer_than=...) right
+    after gets this very frame instead of taking another. Sandboxes without a
+    broker are asked for a max_dim-scaled screenshot.
+    """
+    max_dim = int(max_dim or getattr(cfg, "CHANGE_SAMPLE_DIM", 160))
+    frames = getattr(sandbox, "frames", None)
+    if frames is not None:
+        newer_than = time.time() if newer_than is None else newer_than
+        return frame_thumb(frames.get(newer_than=newer_than).frame, max_dim)
+    return np.asarray(sandbox.screenshot(max_dim=max_dim).convert("L"))
+
+
+def change_fraction(a: np.ndarray, b: np.ndarray, pixel_delta: Optional[int] = None) -> float:
+    """
+    Fraction of pixels whose gray level moved by more than pixel_delta
+    (CHANGE_PIXEL_DELTA); small deltas are scaling/compression noise. A size
+    change (resolution switch) counts as a full change.
+    """
+    if a.shape != b.shape:
+        return 1.0
+    delta = int(pixel_delta if pixel_delta is not None else getattr(cfg, "CHANGE_PIXEL_DELTA", 24))
+    diff = np.abs(a.astype(np.int16) - b.astype(np.int16))
+    return float(np.count_nonzero(diff > delta)) / float(diff.size or 1)
+
+
+def changed_box(
+    a: np.ndarray, b: np.ndarray, pixel_delta: Optional[int] = None,
+) -> Optional[Tuple[Tuple[int, int, int, int], float]]:
+    """
+    ((left, top, right, bottom), fraction) of the pixels that moved by more than
+    pixel_delta between two same-size thumbnails; None if none did (or sizes differ).
+    """
+    if a.shape != b.shape:
+        return None
+    delta = int(pixel_delta if pixel_delta is not None else getattr(cfg, "CHANGE_PIXEL_DELTA", 24))
+    mask = np.abs(a.astype(np.int16) - b.astype(np.int16)) > delta
+    if not mask.any():
+        return None
+    ys = np.flatnonzero(mask.any(axis=1))
+    xs = np.flatnonzero(mask.any(axis=0))
+    box = (int(xs[0]), int(ys[0]), int(xs[-1]) + 1, int(ys[-1]) + 1)
+    return box, float(np.count_nonzero(mask)) / float(mask.size)
+
+
+def wait_for_screen_stable(
+    sandbox,
+    timeout: Optional[float] = None,
+    interval: Optional[float] = None,
+    threshold: Optional[float] = None,
+    stable_samples: Optional[int] = None,
+) -> float:
+    """
+    Block until the screen stops changing: `stable_samples` consecutive
+    thumbnail diffs below `threshold` (fraction of changed pixels), sampled every
+    `interval` seconds, for at most `timeout` seconds. Defaults come from
+    WAIT_CHANGE_TIMEOUT / WAIT_CHANGE_INTERVAL / CHANGE_THRESHOLD /
+    WAIT_CHANGE_STABLE_SAMPLES. Every diff is between two fresh samples.
+
+    Samples go through the FrameBroker (grab_thumb): a capture_screen with
+    newer_than set to when the wait began gets the last sample, no extra capture.
+
+    With WAIT_FOR_STABLE_SCREEN off, or if sampling fails, this is the old fixed
+    sleep of WAIT_BEFORE_SCREENSHOT_SEC (followed by one sample, so the same
+    capture_screen still sees the screen as of after the sleep). Returns the
+    seconds spent waiting.
+    """
+    t0 = time.time()
+    fixed = float(getattr(cfg, "WAIT_BEFORE_SCREENSHOT_SEC", 0.0))
+    if not getattr(cfg, "WAIT_FOR_STABLE_SCREEN", True):
+        time.sleep(fixed)
+        _sample_after_sleep(sandbox)
+        return time.time() - t0
+
+    timeout = float(timeout if timeout is not None else getattr(cfg, "WAIT_CHANGE_TIMEOUT", 3.0))
+    interval = float(interval if interval is not None else getattr(cfg, "WAIT_CHANGE_INTERVAL", 0.25))
+    threshold = float(threshold if threshold is not None else getattr(cfg, "CHANGE_THRESHOLD", 0.02))
+    need = max(1, int(stable_samples or getattr(cfg, "WAIT_CHANGE_STABLE_SAMPLES", 2)))
+    deadline = t0 + timeout
+
+    try:
+        prev = grab_thumb(sandbox)
+        calm = 0
+        while calm < need and time.time() < deadline:
+            time.sleep(max(0.0, min(interval, deadline - time.time())))
+            cur = grab_thumb(sandbox)
+            calm = calm + 1 if change_fraction(prev, cur) < threshold else 0
+            prev = cur
+        if calm >= need:
+            return time.time() - t0
+        print(f"[SETTLE] screen still changing after {timeout:.1f}s, continuing.")
+    except Exception as e:
+        print(f"[SETTLE] change sampling failed ({e}) -> fixed {fixed:.1f}s wait.")
+        time.sleep(max(0.0, fixed - (time.time() - t0)))
+    return time.time() - t0
+
+
+def _sample_after_sleep(sandbox) -> None:
+    frames = getattr(sandbox, "frames", None)
+    if frames is not None:
+        try:
+            frames.get(newer_than=time.time())
+        except Exception:
+            pass  # the capture that follows will try again
+
+
+def wait_for_change(
+    sandbox,
+    before: np.ndarray,
+    timeout: float,
+    interval: float,
+    threshold: float,
+    max_dim: Optional[int] = None,
+) -> Tuple[bool, float]:
+    """
+    Poll thumbnails (same max_dim as `before`) until one differs from `before`
+    by at least `threshold`, or `timeout` passes. Returns (changed, fraction).
+    """
+    deadline = time.time() + timeout
+    frac = 0.0
+    while True:
+        frac = change_fraction(before, grab_thumb(sandbox, max_dim))
+        if frac >= threshold:
+            return True, frac
+        left = deadline - time.time()
+        if left <= 0:
+            return False, frac
+        time.sleep(min(interval, left))
+
+
+# ─── Loading / spinner detection ─────────────────────────────────────
+
+def busy_region(
+    thumbs: Sequence[np.ndarray], std: Optional[float] = None, min_pixels: Optional[int] = None,
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Bounding box of the pixels whose gray level varies over `thumbs` (same-size
+    thumbnails, oldest first) with a temporal std above LOADING_STD, if at
+    least LOADING_MIN_PIXELS do; None when the screen is idle. A spinner or
+    progress bar is small, so it passes the settle threshold, but its pixels
+    keep moving sample after sample. A blinking caret is too thin to count
+    after the box filter.
+    """
+    std = float(std if std is not None else getattr(cfg, "LOADING_STD", 10.0))
+    min_pixels = int(min_pixels if min_pixels is not None else getattr(cfg, "LOADING_MIN_PIXELS", 6))
+    mask = np.stack(thumbs).astype(np.float32).std(axis=0) > std
+    if np.count_nonzero(mask) < min_pixels:
+        return None
+    ys = np.flatnonzero(mask.any(axis=1))
+    xs = np.flatnonzero(mask.any(axis=0))
+    return int(xs[0]), int(ys[0]), int(xs[-1]) + 1, int(ys[-1]) + 1
+
+
+@dataclass
+class IdleWait:
+    idle: bool                  # False: still busy when the wait gave up
+    was_busy: bool              # a busy region was seen at some point
+    waited: float               # seconds spent
+    region: Optional[Tuple[int, int, int, int]] = None  # last busy box (thumbnail pixels)
+    size: Optional[Tuple[int, int]] = None              # (width, height) of those thumbnails
+
+    @property
+    def calls_saved(self) -> int:
+        """
+        VLM calls this wait avoided: waiting a load out saves the verifier call
+        that would have said LOADING plus the executor retry after it. Giving up
+        saves nothing (the verifier is asked anyway).
+        """
+        return 2 if self.was_busy and self.idle else 0
+
+    def busy_box(self) -> Optional[Tuple[float, float, float, float]]:
+        """The busy region as fractions of the screen (left, top, right, bottom), if any."""
+        if self.region is None or not self.size:
+            return None
+        w, h = self.size
+        left, top, right, bottom = self.region
+        return left / w, top / h, right / w, bottom / h
+
+
+def wait_until_idle(
+    sandbox,
+    timeout: Optional[float] = None,
+    interval: Optional[float] = None,
+    window: Optional[int] = None,
+) -> IdleWait:
+    """
+    The wait after an action: sample thumbnails every `interval` s and keep the
+    last `window` (LOADING_WINDOW); return once a full window shows no busy
+    region (busy_region), or after `timeout` (LOADING_TIMEOUT) with idle=False
+    and the region still moving (a video or animated banner can keep it busy
+    for good, so callers verify anyway, pointing the model at it).
+    A quiet window is also a settled screen, so this replaces wait_for_screen_stable
+    there, and its last sample (FrameBroker) is what the next capture_screen gets.
+
+    The default interval is LOADING_INTERVAL with raw-pixel capture (cheap_sampling)
+    and at least WAIT_CHANGE_INTERVAL when every sample is a full HTTP screenshot.
+    With WAIT_FOR_IDLE=False this is wait_for_screen_stable; a sampling error counts as idle.
+    """
+    t0 = time.time()
+    if not getattr(cfg, "WAIT_FOR_IDLE", True):
+        wait_for_screen_stable(sandbox)
+        return IdleWait(True, False, time.time() - t0)
+    timeout = float(timeout if timeout is not None else getattr(cfg, "LOADING_TIMEOUT", 8.0))
+    if interval is None:
+        interval = float(getattr(cfg, "LOADING_INTERVAL", 0.08))
+        if not cheap_sampling(sandbox):
+            interval = max(interval, float(getattr(cfg, "WAIT_CHANGE_INTERVAL", 0.25)))
+    interval = float(interval)
+    window = max(2, int(window or getattr(cfg, "LOADING_WINDOW", 4)))
+    deadline = t0 + timeout
+
+    samples: deque = deque(maxlen=window)
+    was_busy, region = False, None
+    try:
+        while True:
+            cur = grab_thumb(sandbox)
+            if samples and samples[-1].shape != cur.shape:
+                samples.clear()  # resolution changed: start over
+            samples.append(cur)
+            if len(samples) == window:
+                region = busy_region(samples)
+                if region is None:
+                    return IdleWait(True, was_busy, time.time() - t0)
+                was_busy = True
+            left = deadline - time.time()
+            if left <= 0:
+                return IdleWait(False, was_busy, time.time() - t0, region, (cur.shape[1], cur.shape[0]))
+            time.sleep(min(interval, left))
+    except Exception as e:
+        print(f"[LOADING] idle sampling failed ({e}), continuing.")
+        return IdleWait(True, was_busy, time.time() - t0)
+
+
+# ─── Frame reuse ─────────────────────────────────────────────────────
+
+@dataclass
+class StampedFrame:
+    """A captured (VLM-sized) frame, when it was taken, and a thumbnail of the screen then."""
+    frame: Frame
+    ts: float
+    thumb: np.ndarray = field(repr=False)
+
+
+def _reuse_dim() -> int:
+    return int(getattr(cfg, "ACTION_CHANGE_DIM", 480))
+
+
+def stamp_frame(sandbox, frame: Frame, ts: Optional[float] = None,
+                thumb: Optional[np.ndarray] = None, newer_than: Optional[float] = None) -> Optional[StampedFrame]:
+    """
+    Remember `frame` so a later step can use it instead of capturing again.
+    `thumb` (ACTION_CHANGE_DIM, e.g. ActionResult.before) saves a grab when the
+    caller already has one; `newer_than` lets the grab reuse the capture `frame`
+    came from. None when REUSE_FRAMES is off or sampling fails.
+    """
+    if not getattr(cfg, "REUSE_FRAMES", True):
+        return None
+    try:
+        if thumb is None:
+            thumb = grab_thumb(sandbox, _reuse_dim(), newer_than)
+    except Exception:
+        return None
+    return StampedFrame(frame, time.time() if ts is None else ts, thumb)
+
+
+def reuse_frame(sandbox, stamped: Optional[StampedFrame], max_age: Optional[float] = None) -> Optional[Frame]:
+    """
+    stamped.frame if it is at most `max_age` (FRAME_REUSE_MAX_AGE) seconds old
+    and one thumbnail shows the screen has not moved since (ACTION_CHANGE_THRESHOLD);
+    otherwise None and the caller settles and captures as usual.
+    """
+    if stamped is None:
+        return None
+    max_age = float(max_age if max_age is not None else getattr(cfg, "FRAME_REUSE_MAX_AGE", 15.0))
+    if time.time() - stamped.ts > max_age:
+        return None
+    try:
+        frac = change_fraction(stamped.thumb, grab_thumb(sandbox, _reuse_dim()))
+    except Exception:
+        return None
+    if frac >= float(getattr(cfg, "ACTION_CHANGE_THRESHOLD", 0.00002)):
+        return None
+    return stamped.frame
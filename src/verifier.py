@@ -3,13 +3,14 @@ from __future__ import annotations
 
 import json
 from dataclasses import dataclass, field, asdict
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from llama_cpp import Llama
 
-from src.config import JSON_RE
+from src.config import JSON_RE, cfg
 from src.planner import PlanStep
-from src.vision import image_to_data_uri
+from src.frame import Frame
+from src.vision import change_focus, to_data_uri
 
 
 # ─── Failure types ───────────────────────────────────────────────────
@@ -104,25 +105,66 @@ def _build_verifier_prompt(step: PlanStep) -> str:
 
 # ─── Verify Step Function ────────────────────────────────────────────
 
-def verify_step(llm: Llama, step: PlanStep, screenshot_path: str) -> VerifierResult:
+_FOCUS_NOTE = (
+    "\n\nThe image is a full-resolution close-up of the screen region that changed "
+    "after the action (with some surrounding context), not the whole screen."
+)
+
+_MAX_REPLY_TOKENS = 300
+
+
+def image_budget(text: str) -> int:
+    """Context tokens left for the one image: N_CTX minus the reply and the text (~3 chars/token)."""
+    return int(getattr(cfg, "N_CTX", 2048)) - _MAX_REPLY_TOKENS - len(text) // 3 - 16
+
+
+def _busy_note(busy: Tuple[float, float, float, float]) -> str:
+    left, top, right, bottom = (round(v, 2) for v in busy)
+    return (
+        f"\n\nNOTE: the screen area from ({left}, {top}) to ({right}, {bottom}) (fractions of the "
+        "screen) kept changing (video, animation or progress). Judge the step by the rest of the "
+        "screen; report LOADING only if the step clearly still depends on it finishing."
+    )
+
+
+def verify_step(llm: Llama, step: PlanStep, screenshot: Union[Frame, str],
+                before: Optional[Frame] = None, source: Optional[Frame] = None,
+                busy: Optional[Tuple[float, float, float, float]] = None) -> VerifierResult:
     """
     Use the existing Qwen3-VL vision model to verify whether a plan step
-    has been completed based on the current screenshot.
+    has been completed based on the current screenshot (a Frame, or an image path).
+    With `before` (the pre-action frame) and `source` (the full-resolution frame
+    `screenshot` was scaled from, vision.source_frame) the model gets a close-up
+    of what changed instead (vision.change_focus), when the change is compact.
+    Either way it is one image, sized to fit N_CTX. `busy`: a screen region
+    (fractions) that never stopped changing (IdleWait.busy_box), named in the prompt.
     """
-    uri = image_to_data_uri(screenshot_path)
     user_prompt = _build_verifier_prompt(step)
+    if busy is not None:
+        user_prompt += _busy_note(busy)
+    focus = None
+    if isinstance(screenshot, Frame) and isinstance(before, Frame):
+        budget = image_budget(VERIFIER_SYSTEM_PROMPT + user_prompt + _FOCUS_NOTE)
+        focus = change_focus(before, screenshot, source, budget)
+    if focus is not None:
+        content = [
+            {"type": "image_url", "image_url": {"url": to_data_uri(focus)}},
+            {"type": "text", "text": user_prompt + _FOCUS_NOTE},
+        ]
+    else:
+        content = [
+            {"type": "image_url", "image_url": {"url": to_data_uri(screenshot)}},
+            {"type": "text", "text": user_prompt},
+        ]
 
     resp = llm.create_chat_completion(
         messages=[
             {"role": "system", "content": VERIFIER_SYSTEM_PROMPT},
-            {"role": "user", "content": [
-                {"type": "image_url", "image_url": {"url": uri}},
-                {"type": "text", "text": user_prompt},
-            ]},
+            {"role": "user", "content": content},
         ],
         temperature=0.1,
         top_p=0.9,
-        max_tokens=300,
+        max_tokens=_MAX_REPLY_TOKENS,
         stop=["\n\n", "<|im_end|>"],
     )
 
@@ -130,6 +172,18 @@ def verify_step(llm: Llama, step: PlanStep, screenshot_path: str) -> VerifierRes
     return _parse_verifier_output(raw_text, step.id)
 
 
+def no_effect_result(step_id: str) -> VerifierResult:
+    """Verdict for an action that changed nothing on screen (decided without a VLM call)."""
+    return VerifierResult(
+        step_id=step_id,
+        done=False,
+        evidence=["screen did not change after the action"],
+        failure_type="NOT_FOUND",
+        suggested_fix="the last action had no visible effect; target a different element or use another action",
+        confidence=0.8,
+    )
+
+
 def _parse_verifier_output(raw_text: str, fallback_step_id: str) -> VerifierResult:
     """Parse verifier JSON from raw LLM output."""
     m = JSON_RE.search(raw_text.strip())
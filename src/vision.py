@@ -2,12 +2,21 @@
 from __future__ import annotations
 
 import base64
+import math
 import os
-from typing import TYPE_CHECKING
+import queue
+import threading
+import time
+from collections import deque
+from io import BytesIO
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Tuple, Union
 
 from PIL import Image, ImageDraw
 
 from src.config import IMAGE_MIME, cfg
+from src.frame import Frame
+from src.frame_broker import FrameBroker
+from src.frame_ring import ring_of
 
 if TYPE_CHECKING:
     from src.sandbox import Sandbox
@@ -21,6 +30,62 @@ def image_to_data_uri(path: str) -> str:
     return f"data:{mime};base64,{b64}"
 
 
+# PIL format name -> MIME type for VLM payloads
+_VLM_FORMATS = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+def encode_frame(frame: Frame, fmt: str = "PNG", quality: int = 85, subsampling: str = "4:4:4") -> bytes:
+    """
+    Encoded bytes of a frame, once per frame and setting. quality applies to
+    JPEG/WebP, subsampling (chroma: "4:4:4" | "4:2:2" | "4:2:0") to JPEG only.
+    """
+    fmt = fmt.upper().replace("JPG", "JPEG")
+    if fmt not in _VLM_FORMATS:
+        raise ValueError(f"Unsupported VLM image format '{fmt}' (use PNG, JPEG or WEBP)")
+    if fmt == "PNG":
+        key = ("enc", fmt)
+    elif fmt == "JPEG":
+        key = ("enc", fmt, int(quality), subsampling)
+    else:
+        key = ("enc", fmt, int(quality))
+
+    def _encode() -> bytes:
+        buf = BytesIO()
+        if fmt == "JPEG":
+            frame.image.save(buf, format="JPEG", quality=int(quality), subsampling=subsampling)
+        elif fmt == "WEBP":
+            frame.image.save(buf, format="WEBP", quality=int(quality))
+        else:
+            frame.image.save(buf, format="PNG")
+        return buf.getvalue()
+    return frame.derive(key, _encode)
+
+
+def encode_png(frame: Frame) -> bytes:
+    """PNG bytes of a frame, encoded once per frame (shared with the disk copy when the VLM gets PNG)."""
+    return encode_frame(frame, "PNG")
+
+
+def frame_to_data_uri(frame: Frame, fmt: Optional[str] = None, quality: Optional[int] = None,
+                      subsampling: Optional[str] = None) -> str:
+    """VLM payload; format/quality/subsampling default to VLM_IMAGE_FORMAT / _QUALITY / VLM_JPEG_SUBSAMPLING."""
+    fmt = (fmt or getattr(cfg, "VLM_IMAGE_FORMAT", "PNG")).upper().replace("JPG", "JPEG")
+    quality = int(quality if quality is not None else getattr(cfg, "VLM_IMAGE_QUALITY", 85))
+    subsampling = subsampling or getattr(cfg, "VLM_JPEG_SUBSAMPLING", "4:4:4")
+    data = encode_frame(frame, fmt, quality, subsampling)
+    return frame.derive(("data_uri", fmt, quality, subsampling), lambda: (
+        f"data:{_VLM_FORMATS[fmt]};base64," + base64.b64encode(data).decode("ascii")))
+
+
+def to_data_uri(screenshot: Union[Frame, Image.Image, str]) -> str:
+    """VLM image payload from a Frame (memoized), a PIL image, or a file path."""
+    if isinstance(screenshot, Frame):
+        return frame_to_data_uri(screenshot)
+    if isinstance(screenshot, Image.Image):
+        return frame_to_data_uri(Frame(image=screenshot))
+    return image_to_data_uri(screenshot)
+
+
 def resize_keep_aspect(img: Image.Image, max_dim: int) -> Image.Image:
     w, h = img.size
     if w <= max_dim and h <= max_dim:
@@ -33,25 +98,330 @@ def resize_keep_aspect(img: Image.Image, max_dim: int) -> Image.Image:
         new_w = int(w * max_dim / h)
     return img.resize((new_w, new_h), Image.Resampling.LANCZOS)
 
-def capture_screen(sandbox, save_path: str) -> Image.Image:
-    """Capture screenshot for LLM: resized to MAX_DIM and saved to disk."""
-    img = sandbox.screenshot().convert("RGB")
-    img = resize_keep_aspect(img, cfg.MAX_DIM)
-    img.save(save_path)
-    return img
+def _grab(sandbox, newer_than: Optional[float] = None, max_age: Optional[float] = None) -> Frame:
+    """Go through the sandbox's FrameBroker when it has one, so concurrent callers share captures."""
+    frames = getattr(sandbox, "frames", None)
+    if isinstance(frames, FrameBroker):
+        return frames.get(newer_than=newer_than, max_age=max_age).frame
+    return Frame(image=sandbox.screenshot())
+
+
+def vlm_frame(frame: Frame, max_dim: Optional[int] = None) -> Frame:
+    """The frame as the VLM sees it (longest side <= MAX_DIM), computed once per frame."""
+    max_dim = int(max_dim or cfg.MAX_DIM)
+    return frame.derive(("vlm", max_dim), lambda: Frame(image=resize_keep_aspect(frame.image, max_dim)))
+
+
+def source_frame(sandbox, shot: Frame) -> Optional[Frame]:
+    """
+    The full-resolution frame `shot` (a capture_screen result) was scaled from:
+    the FrameBroker's latest frame, if it is still that one. Never captures.
+    """
+    frames = getattr(sandbox, "frames", None)
+    latest = frames.latest() if isinstance(frames, FrameBroker) else None
+    if latest is not None and latest.frame.derived(("vlm", int(cfg.MAX_DIM))) is shot:
+        return latest.frame
+    return None
+
+
+# Qwen3-VL: 16 px patches merged 2x2, so one image token per 32x32 pixels
+_PX_PER_IMAGE_TOKEN = 32
+
+
+def image_tokens(size: Tuple[int, int]) -> int:
+    """Context tokens an image of `size` costs; small images are upscaled to IMAGE_MIN_TOKENS."""
+    w, h = size
+    patches = math.ceil(w / _PX_PER_IMAGE_TOKEN) * math.ceil(h / _PX_PER_IMAGE_TOKEN)
+    return max(int(getattr(cfg, "IMAGE_MIN_TOKENS", 0) or 0), patches)
+
+
+def change_focus(before: Frame, after: Frame, source: Optional[Frame],
+                 max_tokens: int) -> Optional[Frame]:
+    """
+    A close-up for the verifier: the region of `after` that differs from
+    `before`, grown by VERIFIER_CROP_CONTEXT of its size (at least
+    VERIFIER_CROP_MIN_PX) for context, cut from `source` (the full-resolution
+    frame `after` was scaled from) and scaled down only as far as needed to
+    cost at most `max_tokens` (image_tokens).
+    None means "send the full frame": VERIFIER_CROP off, no source, nothing
+    changed, the change is large or spread out (crop above
+    VERIFIER_CROP_MAX_AREA of the screen, or more than VERIFIER_CROP_MAX_CHANGE
+    of the pixels moved), or even a minimum-size image exceeds `max_tokens`.
+    """
+    from src.screen_change import changed_box, frame_thumb
+
+    if not getattr(cfg, "VERIFIER_CROP", False) or source is None or before.size != after.size:
+        return None
+    if image_tokens((1, 1)) > max_tokens:
+        return None
+    ta = frame_thumb(after)
+    found = changed_box(frame_thumb(before), ta)
+    if found is None:
+        return None
+    (left, top, right, bottom), frac = found
+    if frac > float(getattr(cfg, "VERIFIER_CROP_MAX_CHANGE", 0.2)):
+        return None
+
+    w, h = after.size
+    sx, sy = w / ta.shape[1], h / ta.shape[0]
+    left, right = left * sx, right * sx
+    top, bottom = top * sy, bottom * sy
+    pad = max(float(getattr(cfg, "VERIFIER_CROP_MIN_PX", 32)),
+              float(getattr(cfg, "VERIFIER_CROP_CONTEXT", 0.5)) * max(right - left, bottom - top))
+    box = (max(0, int(left - pad)), max(0, int(top - pad)),
+           min(w, int(right + pad + 0.5)), min(h, int(bottom + pad + 0.5)))
+    if (box[2] - box[0]) * (box[3] - box[1]) > float(getattr(cfg, "VERIFIER_CROP_MAX_AREA", 0.5)) * w * h:
+        return None
+
+    sw, sh = source.size
+    fx, fy = sw / w, sh / h
+    crop = source.crop((int(box[0] * fx), int(box[1] * fy),
+                        min(sw, int(box[2] * fx + 0.5)), min(sh, int(box[3] * fy + 0.5))))
+    cw, ch = crop.size
+    while image_tokens((cw, ch)) > max_tokens:
+        cw, ch = max(1, int(cw * 0.9)), max(1, int(ch * 0.9))
+    if (cw, ch) != crop.size:
+        crop = Frame(image=crop.image.resize((cw, ch), Image.Resampling.LANCZOS))
+    return crop
+
+
+def capture_screen(sandbox, save_path: Optional[str] = None, label: str = "screen",
+                   newer_than: Optional[float] = None) -> Frame:
+    """
+    Capture screenshot for LLM: a Frame resized to MAX_DIM, passed to
+    ask_next_action / verify_step in memory. save_path (if SAVE_SCREENSHOTS)
+    gets a copy written in the background, for debugging only. A downscaled
+    copy goes into sandbox.ring under `label` (src/frame_ring.py).
+    `newer_than`: accept a frame captured after that time (the last sample of
+    a settle/idle wait that began then) instead of capturing again.
+    """
+    # Must show the screen as of now (after the last action), never an older frame.
+    newer_than = time.time() if newer_than is None else newer_than
+    shot = vlm_frame(_grab(sandbox, newer_than=newer_than))
+    ring = ring_of(sandbox)
+    if ring is not None:
+        ring.push(shot, label)
+    if save_path and getattr(cfg, "SAVE_SCREENSHOTS", True):
+        save_frame_async(shot, save_path)
+    return shot
+
+
+def capture_frame(sandbox, max_age: Optional[float] = None) -> Frame:
+    """For the GUI: the shared Frame itself, so it can be handed to Qt without a PIL round trip."""
+    if max_age is None:
+        return _grab(sandbox, newer_than=time.time())
+    return _grab(sandbox, max_age=max_age)
+
 
+def capture_screen_raw(sandbox, max_age: Optional[float] = None) -> Image.Image:
+    """For the GUI: return raw image without touching resolution (max_age: accept a recent shared frame)."""
+    return capture_frame(sandbox, max_age=max_age).image
 
-def capture_screen_raw(sandbox) -> Image.Image:
-    """For the GUI: return raw image without touching resolution."""
-    return sandbox.screenshot().convert("RGB")
 
+# ─── Background screenshot persistence ───────────────────────────────
 
-def draw_preview(img: Image.Image, x: float, y: float, out_path: str, r: int = 10) -> None:
-    cp = img.copy().convert("RGB")
+class _ScreenshotWriter:
+    """
+    Writes frames to disk off the agent's thread. Only the newest pending frame
+    per path is kept (an older one still queued is simply replaced), and files
+    are written to a temp name then renamed, so a reader never sees a torn PNG
+    even when several agents share one path.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, Frame] = {}
+        self._cv = threading.Condition()
+        self._busy = False
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, frame: Frame, path: str) -> None:
+        with self._cv:
+            self._pending[path] = frame
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="screenshot-writer")
+                self._thread.start()
+            self._cv.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything submitted so far is on disk."""
+        with self._cv:
+            return self._cv.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                self._cv.wait_for(lambda: self._pending)
+                path, frame = self._pending.popitem()
+                self._busy = True
+            try:
+                _write_atomic(path, encode_png(frame))
+            except Exception as e:
+                print(f"[VISION] could not save {path}: {e}")
+            finally:
+                with self._cv:
+                    self._busy = False
+                    self._cv.notify_all()
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+_writer = _ScreenshotWriter()
+
+
+def save_frame_async(frame: Frame, path: str) -> None:
+    _writer.submit(frame, path)
+
+
+def flush_saved_frames(timeout: Optional[float] = None) -> bool:
+    return _writer.flush(timeout)
+
+
+# ─── Click previews ──────────────────────────────────────────────────
+
+def _render_preview(img: Union[Frame, Image.Image], x: float, y: float, r: int = 10) -> Image.Image:
+    if isinstance(img, Frame):
+        img = img.image
+    cp = img.copy() if img.mode == "RGB" else img.convert("RGB")
     w, h = cp.size
     px = int(max(0.0, min(1.0, x)) * max(0, w - 1))
     py = int(max(0.0, min(1.0, y)) * max(0, h - 1))
     d = ImageDraw.Draw(cp)
     d.ellipse((px - r, py - r, px + r, py + r), fill="red", outline="white", width=2)
-    cp.save(out_path)
-    print(f"[PREVIEW] {out_path} (x={x:.4f}, y={y:.4f})")
+    return cp
+
+
+class _PreviewWriter:
+    """
+    Draws click previews and writes them as PNGs on a background thread. The
+    queue holds at most PREVIEW_QUEUE_SIZE jobs; when it is full the oldest
+    pending preview is dropped, so submit() never waits on the encoder. With
+    PREVIEW_SHEET_PATH set, a small copy of every preview is also kept for
+    export_previews() at the end of the objective (the newest PREVIEW_SHEET_MAX,
+    so an entry point that never exports cannot grow it without bound).
+    """
+
+    def __init__(self):
+        self._q: Optional[queue.Queue] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._sheet: Deque[Tuple[str, Image.Image]] = deque()
+        self.dropped = 0
+
+    def submit(self, img: Union[Frame, Image.Image], x: float, y: float, path: str, r: int, keep: bool) -> None:
+        with self._lock:
+            if self._q is None:
+                self._q = queue.Queue(maxsize=max(1, int(getattr(cfg, "PREVIEW_QUEUE_SIZE", 8))))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="preview-writer")
+                self._thread.start()
+            while True:
+                try:
+                    self._q.put_nowait((img, x, y, path, r, keep))
+                    return
+                except queue.Full:
+                    try:
+                        self._q.get_nowait()
+                        self._q.task_done()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued preview is on disk."""
+        q = self._q
+        if q is None:
+            return True
+        with q.all_tasks_done:
+            return q.all_tasks_done.wait_for(lambda: not q.unfinished_tasks, timeout)
+
+    def take_sheet(self) -> List[Tuple[str, Image.Image]]:
+        with self._lock:
+            sheet, self._sheet = list(self._sheet), deque()
+        return sheet
+
+    def _run(self) -> None:
+        q = self._q
+        while True:
+            img, x, y, path, r, keep = q.get()
+            try:
+                cp = _render_preview(img, x, y, r)
+                _write_atomic(path, encode_png(Frame(image=cp)))
+                print(f"[PREVIEW] {path} (x={x:.4f}, y={y:.4f})")
+                if keep:
+                    dim = int(getattr(cfg, "PREVIEW_SHEET_DIM", 320))
+                    cp.thumbnail((dim, dim), Image.BILINEAR)
+                    with self._lock:
+                        self._sheet.append((os.path.basename(path), cp))
+                        while len(self._sheet) > max(1, int(getattr(cfg, "PREVIEW_SHEET_MAX", 64))):
+                            self._sheet.popleft()
+            except Exception as e:
+                print(f"[PREVIEW] could not save {path}: {e}")
+            finally:
+                q.task_done()
+
+
+_previews = _PreviewWriter()
+
+
+def draw_preview(img: Union[Frame, Image.Image], x: float, y: float, out_path: str, r: int = 10) -> None:
+    """
+    Queue a preview of a click at (x, y) on img for out_path. Drawing and PNG
+    encoding happen on the preview thread; frames are immutable, so img is not
+    copied here. A no-op with PREVIEW_ENABLED off (headless runs).
+    """
+    if not getattr(cfg, "PREVIEW_ENABLED", True):
+        return
+    _previews.submit(img, x, y, out_path, r, keep=bool(getattr(cfg, "PREVIEW_SHEET_PATH", "")))
+
+
+def flush_previews(timeout: Optional[float] = None) -> bool:
+    return _previews.flush(timeout)
+
+
+def export_previews(path: Optional[str] = None) -> int:
+    """
+    Write the objective's click previews to one file (default PREVIEW_SHEET_PATH):
+    an animated image for .gif/.webp, otherwise a contact sheet (grid, oldest
+    first). Clears the collected previews; returns how many were written (0 if off).
+    """
+    path = path if path is not None else getattr(cfg, "PREVIEW_SHEET_PATH", "")
+    flush_previews(timeout=10.0)
+    sheet = _previews.take_sheet()
+    if not path or not sheet:
+        return 0
+    thumbs = [im for _, im in sheet]
+    buf = BytesIO()
+    try:
+        ext = os.path.splitext(path)[1].lower()
+        if ext in (".gif", ".webp"):
+            w = max(im.width for im in thumbs)
+            h = max(im.height for im in thumbs)
+            frames = [im if im.size == (w, h) else im.resize((w, h)) for im in thumbs]
+            frames[0].save(buf, format=ext[1:].upper(), save_all=True, append_images=frames[1:],
+                           duration=int(getattr(cfg, "PREVIEW_FRAME_MS", 800)), loop=0)
+        else:
+            cols = math.ceil(math.sqrt(len(thumbs)))
+            rows = math.ceil(len(thumbs) / cols)
+            cw = max(im.width for im in thumbs)
+            ch = max(im.height for im in thumbs) + 14
+            grid = Image.new("RGB", (cols * cw, rows * ch), "black")
+            d = ImageDraw.Draw(grid)
+            for i, (name, im) in enumerate(sheet):
+                left, top = (i % cols) * cw, (i // cols) * ch
+                grid.paste(im, (left, top))
+                d.text((left + 2, top + im.height + 1), name, fill="white")
+            grid.save(buf, format="PNG")
+        _write_atomic(path, buf.getvalue())
+    except Exception as e:
+        print(f"[PREVIEW] export failed: {e}")
+        return 0
+    print(f"[PREVIEW] {len(thumbs)} click previews -> {path}")
+    return len(thumbs)
@@ -0,0 +1,357 @@
+# ws_transport.py — Minimal WebSocket (RFC 6455) command channel for computer-server
+from __future__ import annotations
+
+import base64
+import hashlib
+import itertools
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+_WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+_OP_CONT = 0x0
+_OP_TEXT = 0x1
+_OP_BINARY = 0x2
+_OP_CLOSE = 0x8
+_OP_PING = 0x9
+_OP_PONG = 0xA
+
+
+class WebSocketError(ConnectionError):
+    pass
+
+
+class WebSocketUnsupported(WebSocketError):
+    """The server answered the upgrade request with something other than 101."""
+
+
+def _mask(payload: bytes, key: bytes) -> bytes:
+    """XOR payload with the 4-byte masking key (one big-int op instead of a byte loop)."""
+    n = len(payload)
+    if not n:
+        return b""
+    k = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(k, "big")).to_bytes(n, "big")
+
+
+def _encode_frame(opcode: int, payload: bytes, mask: bool = True) -> bytes:
+    """One FIN frame. Clients must mask (RFC 6455 5.3); servers must not."""
+    n = len(payload)
+    head = bytearray([0x80 | opcode])
+    mbit = 0x80 if mask else 0
+    if n < 126:
+        head.append(mbit | n)
+    elif n < 1 << 16:
+        head.append(mbit | 126)
+        head += struct.pack("!H", n)
+    else:
+        head.append(mbit | 127)
+        head += struct.pack("!Q", n)
+    if mask:
+        key = os.urandom(4)
+        return bytes(head) + key + _mask(payload, key)
+    return bytes(head) + payload
+
+
+class _FrameReader:
+    """Reads frames from a socket (plus bytes already buffered after the handshake)."""
+
+    def __init__(self, sock: socket.socket, leftover: bytes = b""):
+        self._sock = sock
+        self._buf = bytearray(leftover)
+
+    def _read(self, n: int) -> bytes:
+        while len(self._buf) < n:
+            chunk = self._sock.recv(max(65536, n - len(self._buf)))
+            if not chunk:
+                raise WebSocketError("connection closed")
+            self._buf += chunk
+        out = bytes(self._buf[:n])
+        del self._buf[:n]
+        return out
+
+    def read_frame(self) -> Tuple[bool, int, bytes]:
+        b0, b1 = self._read(2)
+        n = b1 & 0x7F
+        if n == 126:
+            (n,) = struct.unpack("!H", self._read(2))
+        elif n == 127:
+            (n,) = struct.unpack("!Q", self._read(8))
+        key = self._read(4) if b1 & 0x80 else None
+        payload = self._read(n)
+        if key is not None:
+            payload = _mask(payload, key)
+        return bool(b0 & 0x80), b0 & 0x0F, payload
+
+
+def _handshake(host: str, port: int, path: str, timeout: float) -> Tuple[socket.socket, bytes]:
+    sock = socket.create_connection((host, port), timeout=timeout)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    key = base64.b64encode(os.urandom(16))
+    sock.sendall(
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: {host}:{port}\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key.decode()}\r\n"
+        "Sec-WebSocket-Version: 13\r\n\r\n".encode()
+    )
+    buf = b""
+    while b"\r\n\r\n" not in buf:
+        chunk = sock.recv(4096)
+        if not chunk:
+            sock.close()
+            raise WebSocketError("connection closed during handshake")
+        buf += chunk
+        if len(buf) > 65536:
+            sock.close()
+            raise WebSocketError("oversized handshake response")
+    head, leftover = buf.split(b"\r\n\r\n", 1)
+    lines = head.decode("latin-1").split("\r\n")
+    if " 101 " not in lines[0] + " ":
+        sock.close()
+        raise WebSocketUnsupported(f"WebSocket upgrade refused: {lines[0]}")
+    headers = {k.strip().lower(): v.strip() for k, _, v in (ln.partition(":") for ln in lines[1:])}
+    want = base64.b64encode(hashlib.sha1(key + _WS_GUID).digest()).decode()
+    if headers.get("sec-websocket-accept") != want:
+        sock.close()
+        raise WebSocketError("bad Sec-WebSocket-Accept")
+    sock.settimeout(None)
+    return sock, leftover
+
+
+class _Pending:
+    __slots__ = ("done", "result", "error", "sock")
+
+    def __init__(self, sock: Optional[socket.socket] = None):
+        self.done = threading.Event()
+        self.sock = sock
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class WebSocketTransport:
+    """
+    One long-lived WebSocket to computer-server carrying /cmd-style messages:
+
+        -> {"id": 7, "command": "left_click", "params": {...}}
+        <- {"id": 7, "success": true, ...}
+
+    Replies are matched by "id", so many requests can be in flight at once and
+    may complete out of order. A server that does not echo ids is assumed to
+    answer in order (replies then go to the oldest outstanding request).
+
+    A heartbeat thread pings every `heartbeat_interval` seconds and drops the
+    connection when nothing was received for `heartbeat_timeout`; the next
+    request reconnects. Requests in flight on a dropped connection fail with
+    WebSocketError (they are not replayed: input commands are not idempotent).
+    """
+
+    def __init__(
+        self,
+        url: str,
+        loads: Callable[[bytes], Any] = json.loads,
+        connect_timeout: float = 5.0,
+        heartbeat_interval: float = 10.0,
+        heartbeat_timeout: float = 30.0,
+    ):
+        u = urlsplit(url)
+        self.host = u.hostname or "127.0.0.1"
+        self.port = u.port or 80
+        self.path = u.path or "/"
+        self._loads = loads
+        self.connect_timeout = float(connect_timeout)
+        self.heartbeat_interval = float(heartbeat_interval)
+        self.heartbeat_timeout = float(heartbeat_timeout)
+
+        self._sock: Optional[socket.socket] = None
+        self._conn_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._pending: "OrderedDict[int, _Pending]" = OrderedDict()
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._last_rx = 0.0
+        self._closed = False
+        self._echoes_ids = False  # set once a reply carries the request id back
+        self._heartbeat: Optional[threading.Thread] = None
+
+        self.connects = 0  # successful (re)connections
+
+    # -----------------------
+    # Connection management
+    # -----------------------
+    @property
+    def connected(self) -> bool:
+        return self._sock is not None
+
+    def _ensure_connected(self) -> socket.socket:
+        with self._conn_lock:
+            if self._closed:
+                raise WebSocketError("transport closed")
+            if self._sock is not None:
+                return self._sock
+            sock, leftover = _handshake(self.host, self.port, self.path, self.connect_timeout)
+            self._sock = sock
+            self._last_rx = time.time()
+            self.connects += 1
+            threading.Thread(target=self._reader, args=(sock, leftover), daemon=True,
+                             name="ws-reader").start()
+            if self._heartbeat is None and self.heartbeat_interval > 0:
+                self._heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True,
+                                                   name="ws-heartbeat")
+                self._heartbeat.start()
+            return sock
+
+    def _drop(self, sock: socket.socket, reason: str) -> None:
+        """Close `sock` (if still current) and fail everything in flight on it."""
+        with self._conn_lock:
+            current = self._sock is sock
+            if current:
+                self._sock = None
+        try:
+            sock.shutdown(socket.SHUT_RDWR)  # wakes the reader blocked in recv()
+        except OSError:
+            pass
+        try:
+            sock.close()
+        except OSError:
+            pass
+        if not current:
+            return  # an older connection: its requests were already failed
+        with self._pending_lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for p in pending:
+            p.error = WebSocketError(reason)
+            p.done.set()
+
+    def _send_frame(self, sock: socket.socket, opcode: int, payload: bytes) -> None:
+        frame = _encode_frame(opcode, payload)
+        with self._send_lock:
+            sock.sendall(frame)
+
+    def _reader(self, sock: socket.socket, leftover: bytes) -> None:
+        frames = _FrameReader(sock, leftover)
+        parts: List[bytes] = []
+        try:
+            while True:
+                fin, op, payload = frames.read_frame()
+                self._last_rx = time.time()
+                if op == _OP_PING:
+                    self._send_frame(sock, _OP_PONG, payload)
+                    continue
+                if op == _OP_PONG:
+                    continue
+                if op == _OP_CLOSE:
+                    try:
+                        self._send_frame(sock, _OP_CLOSE, payload[:2])
+                    except OSError:
+                        pass
+                    raise WebSocketError("closed by server")
+                if op in (_OP_TEXT, _OP_BINARY, _OP_CONT):
+                    parts.append(payload)
+                    if fin:
+                        msg = parts[0] if len(parts) == 1 else b"".join(parts)
+                        parts = []
+                        self._dispatch(sock, msg)
+        except (OSError, WebSocketError) as e:
+            self._drop(sock, f"WebSocket connection lost: {e}")
+
+    def _dispatch(self, sock: socket.socket, msg: bytes) -> None:
+        try:
+            res = self._loads(msg)
+        except ValueError as e:
+            res, err = None, e
+        else:
+            err = None
+        rid = res.pop("id", None) if isinstance(res, dict) else None
+        if rid is not None:
+            self._echoes_ids = True
+        with self._pending_lock:
+            if rid is not None and rid in self._pending:
+                p = self._pending.pop(rid)
+            else:
+                # id-less server: FIFO among the requests sent on this connection
+                rid = next((k for k, q in self._pending.items() if q.sock is sock), None)
+                if rid is None:
+                    return  # late reply to a request that already timed out
+                p = self._pending.pop(rid)
+        p.result, p.error = res, err
+        p.done.set()
+
+    def _heartbeat_loop(self) -> None:
+        while not self._closed:
+            time.sleep(self.heartbeat_interval)
+            sock = self._sock
+            if sock is None:
+                continue
+            if time.time() - self._last_rx > self.heartbeat_timeout:
+                print("[WS] Heartbeat timeout -> reconnecting on next request.")
+                self._drop(sock, "WebSocket heartbeat timeout")
+                continue
+            try:
+                self._send_frame(sock, _OP_PING, b"hb")
+            except OSError as e:
+                self._drop(sock, f"WebSocket ping failed: {e}")
+
+    # -----------------------
+    # Requests
+    # -----------------------
+    def _submit(self, command: str, params: Dict[str, Any]) -> _Pending:
+        for attempt in (0, 1):
+            sock = self._ensure_connected()
+            rid = next(self._ids)
+            p = _Pending(sock)
+            with self._pending_lock:
+                self._pending[rid] = p
+            body = json.dumps({"id": rid, "command": command, "params": params or {}}).encode("utf-8")
+            try:
+                self._send_frame(sock, _OP_TEXT, body)
+                return p
+            except OSError as e:
+                # nothing reached the server: safe to reconnect and send again once
+                with self._pending_lock:
+                    self._pending.pop(rid, None)
+                self._drop(sock, f"WebSocket send failed: {e}")
+                if attempt:
+                    raise WebSocketError(f"WebSocket send failed: {e}") from e
+        raise AssertionError("unreachable")
+
+    def _wait(self, p: _Pending, timeout: float) -> Any:
+        if not p.done.wait(timeout):
+            with self._pending_lock:
+                for rid, q in list(self._pending.items()):
+                    if q is p:
+                        del self._pending[rid]
+            if not self._echoes_ids and p.sock is not None:
+                # replies are matched FIFO: the late one would go to the next request
+                self._drop(p.sock, "WebSocket reply timed out")
+            raise TimeoutError(f"No WebSocket reply within {timeout}s")
+        if p.error is not None:
+            raise p.error
+        return p.result
+
+    def request(self, command: str, params: Dict[str, Any], timeout: float) -> Any:
+        return self._wait(self._submit(command, params), timeout)
+
+    def request_many(self, commands: Sequence[Tuple[str, Dict[str, Any]]], timeout: float) -> List[Any]:
+        """Send every command before waiting for any reply; results in command order."""
+        pending = [self._submit(c, p) for c, p in commands]
+        return [self._wait(p, timeout) for p in pending]
+
+    def close(self) -> None:
+        self._closed = True
+        sock = self._sock
+        if sock is not None:
+            try:
+                self._send_frame(sock, _OP_CLOSE, struct.pack("!H", 1000))
+            except OSError:
+                pass
+            self._drop(sock, "transport closed")
@@ -0,0 +1,482 @@
+# tests/standin_server.py — Local stand-in for the computer-server REST API
+"""
+Tiny threaded HTTP/1.1 server that speaks the subset of the trycua
+computer-server protocol used by src.sandbox.Sandbox:
+
+  GET  /status -> 200
+  POST /cmd    -> {"success": true, ...} (JSON, or SSE when sse=True)
+  GET  /ws     -> WebSocket carrying the same commands ({"id": n, ...} echoed)
+
+plus StandinDockerEngine, a unix-socket stand-in for the Docker Engine API
+subset used by src.docker_api.DockerEngine.
+
+Used by the unit tests and by the scripts under benchmarks/.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+import shutil
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from src.ws_transport import _OP_CLOSE, _OP_PING, _OP_PONG, _OP_TEXT, _WS_GUID, _FrameReader, _encode_frame
+
+
+def _png_b64(img) -> str:
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+class StandinServer:
+    """
+    Fake computer-server bound to 127.0.0.1 on a free port.
+
+    - screen_size: reported by get_screen_size and used for screenshots
+    - sse: answer /cmd as text/event-stream instead of plain JSON
+    - latency: artificial per-request delay (seconds)
+    - keep_alive: False answers every request with `Connection: close`
+    - status_endpoint: False answers GET /status with 404 (older images)
+    - port: fixed port to bind (0 = any free port)
+    - server_crop: honour screenshot {"region", "max_dim"} params (crop/scale server-side);
+      "reject" answers them with success:false like servers that predate them
+    - websocket: serve /ws; ws_echo_ids=False answers without ids (in order),
+      ws_answer_pings=False ignores pings (heartbeat tests)
+
+    Every request is recorded in `self.calls` as (command, params).
+    """
+
+    def __init__(
+        self,
+        screen_size: Tuple[int, int] = (1280, 720),
+        sse: bool = False,
+        latency: float = 0.0,
+        keep_alive: bool = True,
+        status_endpoint: bool = True,
+        port: int = 0,
+        websocket: bool = True,
+        ws_echo_ids: bool = True,
+        ws_answer_pings: bool = True,
+        server_crop: Any = False,
+    ):
+        self.screen_size = screen_size
+        self.server_crop = server_crop
+        self.screen_image = None  # PIL image served by screenshot; default: solid colour
+        self.status_endpoint = status_endpoint
+        self.websocket = websocket
+        self.ws_echo_ids = ws_echo_ids
+        self.ws_answer_pings = ws_answer_pings
+        self.ws_connections = 0
+        self.ws_pings = 0
+        self._ws_socks: List[Any] = []
+        self.sse = sse
+        self.latency = latency
+        self.keep_alive = keep_alive
+        self.calls: List[Tuple[str, Dict[str, Any]]] = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._png: Optional[str] = None
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    def set_screen(self, img) -> None:
+        """Serve `img` (PIL) from now on; the reported screen size follows it."""
+        self.screen_image = img.convert("RGB")
+        self.screen_size = img.size
+        self._png = None
+
+    def _screen(self):
+        if self.screen_image is None or self.screen_image.size != tuple(self.screen_size):
+            from PIL import Image
+
+            self.screen_image = Image.new("RGB", self.screen_size, (40, 90, 160))
+        return self.screen_image
+
+    def screenshot_b64(self) -> str:
+        if self._png is None:
+            self._png = _png_b64(self._screen())
+        return self._png
+
+    def handle_cmd(self, command: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if command == "screenshot":
+            if self.server_crop == "reject" and (params.get("region") or params.get("max_dim")):
+                bad = "region" if params.get("region") else "max_dim"
+                return {"success": False,
+                        "error": f"screenshot() got an unexpected keyword argument '{bad}'"}
+            if self.server_crop is True and (params.get("region") or params.get("max_dim")):
+                img = self._screen()
+                r = params.get("region")
+                if r:
+                    img = img.crop((r["x"], r["y"], r["x"] + r["width"], r["y"] + r["height"]))
+                if params.get("max_dim"):
+                    img = img.copy()
+                    img.thumbnail((params["max_dim"], params["max_dim"]))
+                return {"success": True, "image_data": _png_b64(img)}
+            return {"success": True, "image_data": self.screenshot_b64()}
+        if command == "get_screen_size":
+            w, h = self.screen_size
+            return {"success": True, "size": {"width": w, "height": h}}
+        return {"success": True}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # like uvicorn; keep-alive would stall on delayed ACKs
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, ctype: str = "application/json") -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                if not server.keep_alive:
+                    self.send_header("Connection", "close")
+                    self.close_connection = True
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _websocket(self):
+                key = self.headers.get("Sec-WebSocket-Key", "").encode()
+                self.send_response(101)
+                self.send_header("Upgrade", "websocket")
+                self.send_header("Connection", "Upgrade")
+                self.send_header("Sec-WebSocket-Accept",
+                                 base64.b64encode(hashlib.sha1(key + _WS_GUID).digest()).decode())
+                self.end_headers()
+                self.wfile.flush()
+                self.close_connection = True
+
+                sock = self.connection
+                write_lock = threading.Lock()
+                with server._lock:
+                    server.ws_connections += 1
+                    server._ws_socks.append(sock)
+
+                def send(op, payload):
+                    with write_lock:
+                        sock.sendall(_encode_frame(op, payload, mask=False))
+
+                def answer(req):
+                    if server.latency:
+                        threading.Event().wait(server.latency)
+                    command = str(req.get("command", ""))
+                    params = req.get("params") or {}
+                    with server._lock:
+                        server.calls.append((command, params))
+                    res = server.handle_cmd(command, params)
+                    if server.ws_echo_ids and "id" in req:
+                        res = {"id": req["id"], **res}
+                    try:
+                        send(_OP_TEXT, json.dumps(res).encode())
+                    except OSError:
+                        pass
+
+                frames = _FrameReader(SimpleNamespace(recv=self.rfile.read1))
+                try:
+                    while True:
+                        _, op, payload = frames.read_frame()
+                        if op == _OP_PING:
+                            with server._lock:
+                                server.ws_pings += 1
+                            if server.ws_answer_pings:
+                                send(_OP_PONG, payload)
+                        elif op == _OP_CLOSE:
+                            send(_OP_CLOSE, payload[:2])
+                            break
+                        elif op == _OP_TEXT:
+                            threading.Thread(target=answer, args=(json.loads(payload),), daemon=True).start()
+                except (ConnectionError, OSError, ValueError):
+                    pass
+                finally:
+                    with server._lock:
+                        if sock in server._ws_socks:
+                            server._ws_socks.remove(sock)
+
+            def do_GET(self):
+                if (self.path == "/ws" and server.websocket
+                        and self.headers.get("Upgrade", "").lower() == "websocket"):
+                    self._websocket()
+                elif self.path == "/status" and server.status_endpoint:
+                    self._send(200, b'{"status":"ok"}')
+                else:
+                    self._send(404, b"{}")
+
+            def do_POST(self):
+                n = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(n) if n else b"{}"
+                if server.latency:
+                    threading.Event().wait(server.latency)
+                if self.path != "/cmd":
+                    self._send(404, b"{}")
+                    return
+                req = json.loads(raw or b"{}")
+                command = str(req.get("command", ""))
+                params = req.get("params") or {}
+                with server._lock:
+                    server.calls.append((command, params))
+                res = server.handle_cmd(command, params)
+                payload = json.dumps(res)
+                if server.sse:
+                    self._send(200, f"data: {payload}\n\n".encode(), "text/event-stream")
+                else:
+                    self._send(200, payload.encode())
+
+        return Handler
+
+    def drop_websockets(self) -> None:
+        """Abruptly close every open WebSocket (simulates a server restart / network blip)."""
+        with self._lock:
+            socks = list(self._ws_socks)
+        for s in socks:
+            try:
+                s.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def cfg(self, **overrides) -> SimpleNamespace:
+        """A cfg object pointing a Sandbox at this server."""
+        ns = SimpleNamespace(
+            API_HOST="127.0.0.1",
+            API_PORT=self.port,
+            HTTP_TIMEOUT=5.0,
+            API_READY_TIMEOUT=5.0,
+            API_READY_INTERVAL=0.05,
+        )
+        for k, v in overrides.items():
+            setattr(ns, k, v)
+        return ns
+
+    def start(self) -> "StandinServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "StandinServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class StandinDockerEngine:
+    """
+    Fake Docker daemon on a unix socket in a temp dir.
+
+    Supports /_ping, container inspect/create/start/delete, exec, commit and
+    image pull. Exec commands are answered by `exec_handler(name, cmd)`, which
+    returns (exit_code, output); commit adds the image to `images`.
+    `create_latency` / `start_latency` simulate how long the daemon takes, so
+    cold (create + start) and warm (inspect only) Sandbox.start() differ.
+    `images` lists what is "pulled"; creating anything else answers 404.
+
+    Every request is recorded in `self.requests` as (method, path);
+    drop_connections() closes the kept-alive ones like an idle daemon would.
+    """
+
+    def __init__(self, create_latency: float = 0.0, start_latency: float = 0.0,
+                 images: Optional[List[str]] = None, exec_handler=None):
+        self.exec_handler = exec_handler or (lambda name, cmd: (0, ""))
+        self._execs: Dict[str, Dict[str, Any]] = {}
+        self.create_latency = create_latency
+        self.start_latency = start_latency
+        self.images = list(images) if images is not None else ["trycua/cua-xfce:latest"]
+        self.containers: Dict[str, Dict[str, Any]] = {}
+        self.requests: List[Tuple[str, str]] = []
+        self.connections = 0
+        self._socks: List[Any] = []
+        self._lock = threading.Lock()
+        self._dir = tempfile.mkdtemp(prefix="standin-docker-")
+        self.socket_path = os.path.join(self._dir, "docker.sock")
+        self._server = _UnixHTTPServer(self.socket_path, self._make_handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def docker_host(self) -> str:
+        return f"unix://{self.socket_path}"
+
+    def add_container(self, name: str, env: Dict[str, str], running: bool = True,
+                      image: str = "trycua/cua-xfce:latest") -> None:
+        self.containers[name] = {
+            "Id": uuid.uuid4().hex,
+            "Name": "/" + name,
+            "State": {"Running": running, "Status": "running" if running else "exited"},
+            "Config": {"Image": image, "Env": [f"{k}={v}" for k, v in env.items()]},
+        }
+
+    def _find(self, ref: str) -> Optional[Dict[str, Any]]:
+        if ref in self.containers:
+            return self.containers[ref]
+        for c in self.containers.values():
+            if c["Id"] == ref:
+                return c
+        return None
+
+    def handle(self, method: str, path: str, body: Any) -> Tuple[int, Any]:
+        url = urlsplit(path)
+        parts = [unquote(p) for p in url.path.strip("/").split("/")]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if method == "GET" and parts == ["_ping"]:
+            return 200, "OK"
+        if method == "POST" and parts == ["images", "create"]:
+            self.images.append(f"{query.get('fromImage')}:{query.get('tag', 'latest')}")
+            return 200, {"status": "Downloaded newer image"}
+        if method == "POST" and parts == ["commit"]:
+            if self._find(query.get("container", "")) is None:
+                return 404, {"message": "No such container"}
+            self.images.append(f"{query.get('repo')}:{query.get('tag', 'latest')}")
+            return 201, {"Id": "sha256:" + uuid.uuid4().hex}
+        if parts[:1] == ["exec"] and len(parts) == 3:
+            ex = self._execs.get(parts[1])
+            if ex is None:
+                return 404, {"message": "No such exec instance"}
+            if method == "POST" and parts[2] == "start":
+                code, out = self.exec_handler(ex["container"], ex["cmd"])
+                ex["ExitCode"] = code
+                data = out.encode()
+                return 200, struct.pack(">BxxxI", 1, len(data)) + data
+            if method == "GET" and parts[2] == "json":
+                return 200, {"ExitCode": ex.get("ExitCode"), "Running": False}
+        if parts[:1] != ["containers"]:
+            return 404, {"message": "page not found"}
+
+        if method == "POST" and parts == ["containers", "create"]:
+            name = query.get("name", "")
+            if name in self.containers:
+                return 409, {"message": f"Conflict. The container name \"/{name}\" is already in use"}
+            if body.get("Image") not in self.images:
+                return 404, {"message": f"No such image: {body.get('Image')}"}
+            threading.Event().wait(self.create_latency)
+            env = dict(e.split("=", 1) for e in body.get("Env") or [])
+            self.add_container(name, env, running=False, image=body["Image"])
+            self.containers[name]["HostConfig"] = body.get("HostConfig") or {}
+            return 201, {"Id": self.containers[name]["Id"], "Warnings": []}
+
+        c = self._find(parts[1]) if len(parts) > 1 else None
+        if c is None:
+            return 404, {"message": f"No such container: {parts[1] if len(parts) > 1 else ''}"}
+        if method == "GET" and parts[2:] == ["json"]:
+            return 200, c
+        if method == "POST" and parts[2:] == ["start"]:
+            if c["State"]["Running"]:
+                return 304, None
+            threading.Event().wait(self.start_latency)
+            c["State"] = {"Running": True, "Status": "running"}
+            return 204, None
+        if method == "POST" and parts[2:] == ["exec"]:
+            if not c["State"]["Running"]:
+                return 409, {"message": "container is not running"}
+            eid = uuid.uuid4().hex
+            self._execs[eid] = {"container": c["Name"][1:], "cmd": body.get("Cmd") or []}
+            return 201, {"Id": eid}
+        if method == "DELETE" and len(parts) == 2:
+            del self.containers[c["Name"][1:]]
+            return 204, None
+        return 404, {"message": "page not found"}
+
+    def _make_handler(self):
+        engine = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with engine._lock:
+                    engine.connections += 1
+                    engine._socks.append(self.connection)
+
+            def log_message(self, *args):
+                pass
+
+            def _dispatch(self, method: str) -> None:
+                n = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(n) if n else b""
+                with engine._lock:
+                    engine.requests.append((method, self.path))
+                status, res = engine.handle(method, self.path, json.loads(raw) if raw else {})
+                if isinstance(res, bytes):
+                    # raw exec stream: like dockerd, no length, connection closes after it
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/vnd.docker.raw-stream")
+                    self.send_header("Connection", "close")
+                    self.end_headers()
+                    self.wfile.write(res)
+                    self.close_connection = True
+                    return
+                body = b"" if res is None else (res.encode() if isinstance(res, str) else json.dumps(res).encode())
+                self.send_response(status)
+                if body:
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_DELETE(self):
+                self._dispatch("DELETE")
+
+        return Handler
+
+    def drop_connections(self) -> None:
+        with self._lock:
+            socks, self._socks = self._socks, []
+        for s in socks:
+            try:
+                s.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def start(self) -> "StandinDockerEngine":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def __enter__(self) -> "StandinDockerEngine":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
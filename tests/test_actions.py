@@ -0,0 +1,136 @@
+# tests/test_actions.py — execute_action change confirmation against the stand-in server
+import threading
+import time
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image, ImageDraw
+
+from src.actions import ActionResult, execute_action, had_no_effect
+from src.config import cfg
+from src.sandbox import Sandbox
+from tests.standin_server import StandinServer
+
+
+class ReactiveServer(StandinServer):
+    """
+    A white 1280x720 desktop. Input commands repaint part of it after `delay`
+    seconds: a glyph-sized 8x14 mark for type_text, a 200x100 box otherwise.
+    react=False: nothing ever changes.
+    """
+
+    def __init__(self, delay=0.05, react=True, **kw):
+        super().__init__(screen_size=(1280, 720), server_crop=True, **kw)
+        self.delay, self.react, self.marks = delay, react, 0
+        self.set_screen(Image.new("RGB", (1280, 720), "white"))
+
+    def _paint(self, small):
+        img = self._screen().copy()
+        x = 100 + 20 * self.marks
+        self.marks += 1
+        box = (x, 300, x + 8, 314) if small else (x, 300, x + 200, 400)
+        ImageDraw.Draw(img).rectangle(box, fill=(20, 20, 20))
+        self.set_screen(img)
+
+    def handle_cmd(self, command, params):
+        if self.react and command in ("left_click", "type_text", "press_key"):
+            small = command == "type_text"
+            t = threading.Timer(self.delay, self._paint, args=(small,))
+            t.daemon = True
+            t.start()
+        return super().handle_cmd(command, params)
+
+
+@pytest.fixture
+def quick(monkeypatch):
+    monkeypatch.setattr(cfg, "CONFIRM_ACTION_CHANGE", True)
+    monkeypatch.setattr(cfg, "ACTION_CHANGE_TIMEOUT", 0.3)
+    monkeypatch.setattr(cfg, "ACTION_CHANGE_INTERVAL", 0.02)
+    monkeypatch.setattr(cfg, "PAUSE_AFTER_CLICK_SEC", 0.25)
+
+
+# ─── Change confirmation ─────────────────────────────────────────────
+
+class TestChangeConfirmation:
+    def test_click_returns_on_change(self, quick):
+        with ReactiveServer(delay=0.05) as srv:
+            sb = Sandbox(srv.cfg())
+            res = execute_action(sb, {"action": "CLICK", "x": 0.5, "y": 0.5})
+            assert res.changed is True and res.change > 0
+            assert res.waited < 0.25
+            assert not had_no_effect(sb, res)
+            sb.close()
+
+    def test_single_typed_character_counts(self, quick):
+        with ReactiveServer(delay=0.02) as srv:
+            sb = Sandbox(srv.cfg())
+            assert execute_action(sb, {"action": "TYPE", "text": "a"}).changed is True
+            sb.close()
+
+    def test_no_effect_flagged(self, quick):
+        with ReactiveServer(react=False) as srv:
+            sb = Sandbox(srv.cfg())
+            res = execute_action(sb, {"action": "PRESS", "key": "enter"})
+            assert res.changed is False
+            assert 0.3 <= res.waited < 0.6
+            assert had_no_effect(sb, res)
+            sb.close()
+
+    def test_late_effect_is_not_flagged(self, quick):
+        with ReactiveServer(delay=0.5) as srv:
+            sb = Sandbox(srv.cfg())
+            res = execute_action(sb, {"action": "CLICK", "x": 0.2, "y": 0.2})
+            assert res.changed is False
+            time.sleep(0.4)  # the loops' settle wait
+            assert not had_no_effect(sb, res)
+            sb.close()
+
+    def test_skip_can_be_disabled(self, quick, monkeypatch):
+        monkeypatch.setattr(cfg, "SKIP_VERIFY_ON_NO_CHANGE", False)
+        with ReactiveServer(react=False) as srv:
+            sb = Sandbox(srv.cfg())
+            res = execute_action(sb, {"action": "PRESS", "key": "a"})
+            assert res.changed is False and not had_no_effect(sb, res)
+            sb.close()
+
+
+# ─── Fixed pause / non-visual actions ────────────────────────────────
+
+class TestWithoutConfirmation:
+    def test_confirm_off_is_fixed_pause(self, quick):
+        with ReactiveServer(react=False) as srv:
+            sb = Sandbox(srv.cfg())
+            t0 = time.time()
+            res = execute_action(sb, {"action": "CLICK", "x": 0.5, "y": 0.5}, confirm=False)
+            assert res.changed is None and time.time() - t0 >= 0.25
+            assert not any(c == "screenshot" for c, _ in srv.calls)
+            assert not had_no_effect(sb, res)
+            sb.close()
+
+    def test_non_visual_actions(self):
+        with StandinServer() as srv:
+            sb = Sandbox(srv.cfg())
+            for act in ({"action": "NOOP"}, {"action": "MOVE", "x": 0.1, "y": 0.1}, {"action": "BITTI"}):
+                res = execute_action(sb, act)
+                assert isinstance(res, ActionResult) and res.changed is None
+            with pytest.raises(ValueError):
+                execute_action(sb, {"action": "FLY"})
+            sb.close()
+
+    def test_sampling_failure_falls_back_to_pause(self, quick):
+        class Broken:
+            def __init__(self):
+                self.clicks = 0
+
+            def left_click_norm(self, x, y):
+                self.clicks += 1
+
+            def screenshot(self, **kw):
+                raise ConnectionError("down")
+
+        sb = Broken()
+        res = execute_action(sb, {"action": "CLICK", "x": 0.5, "y": 0.5})
+        assert sb.clicks == 1 and res.changed is None
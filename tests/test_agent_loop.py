@@ -1,13 +1,23 @@
 # tests/test_agent_loop.py — Unit tests for orchestrator step logic (fully mocked)
 import json
+import threading
+import time
 import pytest
 import sys
 import os
 from unittest.mock import MagicMock, patch, PropertyMock
 
+import numpy as np
+
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
+from src.config import cfg
+from src.frame import Frame
+from src.frame_broker import FrameBroker
+from src.frame_ring import FrameRing
 from src.planner import Plan, PlanStep, Planner
+from src.sandbox import _norm_to_px
+from src.screen_change import IdleWait
 from src.verifier import VerifierResult
 from src.agent_loop import _build_executor_objective, _check_global_stop, _execute_plan
 
@@ -117,6 +127,14 @@ class TestCheckGlobalStop:
 # ─── Test _execute_plan step advancement ─────────────────────────────
 
 class TestExecutePlan:
+    @pytest.fixture(autouse=True)
+    def no_waits(self):
+        """Settling, idle waits and zoom are collaborators too: patched like the rest."""
+        with patch("src.agent_loop.wait_for_screen_stable", return_value=0.0), \
+                patch("src.agent_loop.wait_until_idle", return_value=IdleWait(True, False, 0.0)), \
+                patch("src.agent_loop.refine_click", side_effect=lambda llm, sb, obj, out: (out, False)):
+            yield
+
     @patch("src.agent_loop.cfg")
     @patch("src.agent_loop.verify_step")
     @patch("src.agent_loop.execute_action")
@@ -278,3 +296,243 @@ class TestExecutePlan:
         )
 
         assert result["status"] == "COMPLETED"
+
+    @patch("src.agent_loop.cfg")
+    @patch("src.agent_loop.refine_click")
+    @patch("src.agent_loop.execute_action")
+    @patch("src.agent_loop.capture_screen")
+    @patch("src.agent_loop.draw_preview")
+    @patch("src.agent_loop.ask_next_action")
+    @patch("src.agent_loop.should_stop_on_repeat", return_value=(True, "same click"))
+    @patch("src.agent_loop.validate_xy", return_value=(True, ""))
+    def test_repeat_guard_runs_before_zoom(
+        self, mock_validate, mock_repeat, mock_ask, mock_preview,
+        mock_capture, mock_exec, mock_refine, mock_cfg
+    ):
+        """A click the repeat guard blocks never costs a zoom call."""
+        mock_cfg.MAX_STEPS = 50
+        mock_cfg.SCREENSHOT_PATH = "/tmp/x.png"
+        mock_cfg.MODEL_RETRY = 1
+        mock_cfg.PREVIEW_PATH_TEMPLATE = "/tmp/p_{i}.png"
+
+        mock_capture.return_value = MagicMock()
+        mock_ask.return_value = {"action": "CLICK", "x": 0.5, "y": 0.5, "target": "tray icon", "confidence": 0.2}
+
+        with patch("src.agent_loop.needs_zoom", return_value=True):
+            result = _execute_plan(
+                sandbox=MagicMock(),
+                llm=MagicMock(),
+                plan=_make_plan(num_steps=1, max_attempts=2),
+                objective="test",
+                global_step_count=0,
+                log_fn=lambda msg: None,
+            )
+
+        assert result["status"] == "NEEDS_REPLAN"
+        assert mock_repeat.called
+        mock_refine.assert_not_called()
+        mock_exec.assert_not_called()
+
+
+# ─── _execute_plan against a fake desktop ────────────────────────────
+# Only the model calls are faked; settling, idle waits, change detection,
+# frame reuse, zoom and element memory run for real on an in-memory screen.
+
+BUTTON = (300, 160, 340, 200)    # a textured 40x40 button on a 640x360 screen
+DIALOG = (200, 100, 440, 260)
+
+
+class FakeDesktop:
+    """
+    Raw-pixel sandbox stand-in: clicking BUTTON opens DIALOG (after `loading` s
+    of spinner). With `banner`, a corner region changes on every capture, forever.
+    """
+
+    capture = None
+
+    def __init__(self, button=BUTTON, loading=0.0, banner=False):
+        self.button, self.loading, self.banner = button, loading, banner
+        self.shown = 0
+        self.arr = np.full((360, 640, 3), 40, np.uint8)
+        l, t, r, b = button
+        self.arr[t:b, l:r] = (30, 120, 220)
+        self.arr[t + 18:t + 22, l + 6:r - 6] = 255
+        self.arr[t + 6:b - 6, l + 18:l + 22] = 255
+        self.frames = FrameBroker(self._capture)
+        self.ring = FrameRing()
+        self.clicks = []
+        self.spinner = None
+
+    def _capture(self):
+        arr = self.arr.copy()
+        if self.banner:
+            self.shown += 1
+            arr[300:340, 20:100] = (self.shown * 67) % 256
+        return Frame(array=arr)
+
+    def get_screen_size(self):
+        return 640, 360
+
+    def screenshot(self, region=None, max_dim=None):
+        img = self.frames.get(newer_than=time.time()).frame.image
+        return img.crop(region) if region else img
+
+    def left_click_norm(self, x, y):
+        px, py = _norm_to_px(x, y, 640, 360)
+        self.clicks.append((px, py))
+        l, t, r, b = self.button
+        if l <= px < r and t <= py < b:
+            if self.loading:
+                self.spinner = threading.Thread(target=self._spin, daemon=True)
+                self.spinner.start()
+            else:
+                self._open_dialog()
+
+    def _spin(self):
+        t0, i = time.time(), 0
+        while time.time() - t0 < self.loading:
+            arr = self.arr.copy()
+            arr[20:44, 600:624] = 0
+            q = i % 4
+            arr[20 + (q // 2) * 12:32 + (q // 2) * 12, 600 + (q % 2) * 12:612 + (q % 2) * 12] = 255
+            self.arr = arr
+            i += 1
+            time.sleep(0.03)
+        self._open_dialog()
+
+    def _open_dialog(self):
+        arr = self.arr.copy()
+        arr[20:44, 600:624] = 40
+        l, t, r, b = DIALOG
+        arr[t:b, l:r] = 240
+        self.arr = arr
+
+
+def dialog_visible(frame):
+    l, t, r, b = DIALOG
+    return bool((frame.array[t + 5:t + 10, l + 5:l + 10] == 240).all())
+
+
+def fake_verifier(calls, busy_seen=None):
+    def verify(llm, step, after, before=None, source=None, busy=None):
+        calls.append(after)
+        if busy_seen is not None:
+            busy_seen.append(busy)
+        done = dialog_visible(after)
+        return VerifierResult(step_id=step.id, done=done, evidence=["dialog" if done else "no dialog"],
+                              failure_type="NONE" if done else "NOT_FOUND", confidence=0.9)
+    return verify
+
+
+def click(px, py, **kw):
+    return {"action": "CLICK", "x": px / 639, "y": py / 359, "target": "Save button", "confidence": 0.95, **kw}
+
+
+@pytest.fixture
+def fast(monkeypatch, tmp_path):
+    for key, value in {
+        "WAIT_CHANGE_INTERVAL": 0.02, "LOADING_INTERVAL": 0.02, "ACTION_CHANGE_TIMEOUT": 0.2,
+        "ACTION_CHANGE_INTERVAL": 0.02, "SAVE_SCREENSHOTS": False, "MODEL_RETRY": 1,
+        "PREVIEW_PATH_TEMPLATE": str(tmp_path / "p_{i}.png"), "ELEMENT_MEMORY_DIR": str(tmp_path / "mem"),
+    }.items():
+        monkeypatch.setattr(cfg, key, value)
+
+
+def _run(sandbox, plan=None):
+    return _execute_plan(
+        sandbox=sandbox,
+        llm=MagicMock(),
+        plan=plan or _make_plan(num_steps=1, max_attempts=2),
+        objective="Save the file",
+        global_step_count=0,
+        log_fn=lambda msg: None,
+    )
+
+
+@pytest.mark.usefixtures("fast")
+class TestExecutePlanOnFakeDesktop:
+    def test_click_that_opens_a_dialog_is_verified(self):
+        desk, seen = FakeDesktop(), []
+        with patch("src.agent_loop.ask_next_action", return_value=click(320, 180)), \
+                patch("src.agent_loop.verify_step", side_effect=fake_verifier(seen)):
+            result = _run(desk)
+        assert result["status"] == "COMPLETED"
+        assert len(seen) == 1 and dialog_visible(seen[0])
+        assert [f.label for f in desk.ring.frames()] == ["executor", "verifier"]
+
+    def test_click_without_effect_skips_verifier_and_reuses_frame(self):
+        desk, seen = FakeDesktop(), []
+        misses = [click(100, 300), click(500, 300, target="Save icon")]
+        with patch("src.agent_loop.ask_next_action", side_effect=misses) as ask, \
+                patch("src.agent_loop.verify_step", side_effect=fake_verifier(seen)):
+            result = _run(desk)
+        assert result["status"] == "NEEDS_REPLAN"
+        assert "no visible effect" in result["failure_info"]
+        assert seen == []  # decided locally, no verifier call
+        first, second = (c.args[2] for c in ask.call_args_list)
+        assert second is first  # the unchanged screen was not captured again
+
+    def test_repeated_no_effect_clicks_trip_the_screen_loop_guard(self):
+        desk, seen = FakeDesktop(), []
+        misses = [click(100, 300), click(500, 300, target="Save icon"), click(60, 60, target="File menu")]
+        with patch("src.agent_loop.ask_next_action", side_effect=misses) as ask, \
+                patch("src.agent_loop.verify_step", side_effect=fake_verifier(seen)):
+            result = _run(desk, _make_plan(num_steps=1, max_attempts=3))
+        assert result["status"] == "NEEDS_REPLAN"
+        # captured once, reused twice: every attempt still counts as one on this screen
+        assert [f.label for f in desk.ring.frames()] == ["executor"] * 3
+        objectives = [c.args[1] for c in ask.call_args_list]
+        assert "did not change it" not in objectives[1]
+        assert "did not change it" in objectives[2]
+
+    def test_spinner_is_waited_out_before_verifying(self):
+        desk, seen = FakeDesktop(loading=0.4), []
+        with patch("src.agent_loop.ask_next_action", return_value=click(320, 180)), \
+                patch("src.agent_loop.verify_step", side_effect=fake_verifier(seen)):
+            result = _run(desk)
+        assert result["status"] == "COMPLETED"
+        assert len(seen) == 1 and dialog_visible(seen[0])
+        assert result["vlm_calls_saved"] == 2
+
+    def test_screen_that_never_stops_moving_is_still_verified(self, monkeypatch):
+        monkeypatch.setattr(cfg, "LOADING_TIMEOUT", 0.3)
+        desk, seen, busy = FakeDesktop(banner=True), [], []
+        with patch("src.agent_loop.ask_next_action", return_value=click(320, 180)), \
+                patch("src.agent_loop.verify_step", side_effect=fake_verifier(seen, busy)):
+            result = _run(desk)
+        assert result["status"] == "COMPLETED"
+        assert len(seen) == 1 and dialog_visible(seen[0])
+        l, t, r, b = busy[0]  # the banner at x 20..100, y 300..340 is named to the verifier
+        assert l <= 60 / 640 < r and t <= 320 / 360 < b
+        assert result["vlm_calls_saved"] == 0
+
+    def test_uncertain_click_is_zoomed_onto_the_button(self):
+        desk, seen = FakeDesktop(), []
+
+        def find_button(llm, objective, target, crop):
+            ys, xs = np.nonzero(crop.array[..., 2] == 220)
+            h, w = crop.array.shape[:2]
+            return {"found": True, "x": xs.mean() / (w - 1), "y": ys.mean() / (h - 1)}
+
+        with patch("src.agent_loop.ask_next_action", return_value=click(290, 150, confidence=0.3)), \
+                patch("src.llm_client.ask_zoom_point", side_effect=find_button) as zoom, \
+                patch("src.agent_loop.verify_step", side_effect=fake_verifier(seen)):
+            result = _run(desk)
+        assert result["status"] == "COMPLETED"
+        assert zoom.call_count == 1 and len(desk.clicks) == 1
+        l, t, r, b = BUTTON
+        assert l <= desk.clicks[0][0] < r and t <= desk.clicks[0][1] < b
+
+    def test_element_memory_replays_a_verified_click(self, monkeypatch):
+        monkeypatch.setattr(cfg, "ELEMENT_MEMORY", True)
+        seen = []
+        with patch("src.agent_loop.ask_next_action", return_value=click(320, 180)), \
+                patch("src.agent_loop.verify_step", side_effect=fake_verifier(seen)):
+            assert _run(FakeDesktop())["status"] == "COMPLETED"
+
+        moved = FakeDesktop(button=(500, 60, 540, 100))
+        with patch("src.agent_loop.ask_next_action") as ask, \
+                patch("src.agent_loop.verify_step", side_effect=fake_verifier(seen)):
+            assert _run(moved)["status"] == "COMPLETED"
+        ask.assert_not_called()
+        assert 500 <= moved.clicks[0][0] < 540 and 60 <= moved.clicks[0][1] < 100
@@ -0,0 +1,64 @@
+# tests/test_async_sandbox.py — Unit tests for AsyncSandbox (local stand-in servers)
+import asyncio
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.async_sandbox import AsyncSandbox
+from tests.standin_server import StandinServer
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+class TestAsyncSandbox:
+    def test_json_commands(self):
+        with StandinServer(screen_size=(200, 100)) as srv:
+            async def go():
+                async with AsyncSandbox(srv.cfg()) as sb:
+                    await sb._wait_api_ready(timeout=5)
+                    await sb.left_click_norm(1.0, 0.5)
+                    img = await sb.screenshot()
+                    return img.size
+
+            assert _run(go()) == (200, 100)
+            clicks = [p for c, p in srv.calls if c == "left_click"]
+            assert clicks == [{"x": 199, "y": 49}]
+
+    def test_no_sync_client_inside(self):
+        with StandinServer() as srv:
+            sb = AsyncSandbox(srv.cfg(SANDBOX_TRANSPORT="ws", CAPTURE_BACKEND="vnc"))
+            # lifecycle and names only: no second HTTP pool, WS transport, capture backend or frame ring
+            assert not any(hasattr(sb._lifecycle, a) for a in ("_http", "_ws", "capture", "frames", "ring"))
+            assert sb.cmd_url == f"http://127.0.0.1:{srv.port}/cmd"
+            _run(sb.close())
+
+    def test_sse_responses(self):
+        with StandinServer(screen_size=(64, 48), sse=True) as srv:
+            async def go():
+                async with AsyncSandbox(srv.cfg()) as sb:
+                    return await sb.get_screen_size()
+
+            assert _run(go()) == (64, 48)
+
+    def test_many_sandboxes_one_loop(self):
+        servers = [StandinServer(latency=0.2).start() for _ in range(12)]
+        try:
+            async def go():
+                sbs = [AsyncSandbox(s.cfg()) for s in servers]
+                loop = asyncio.get_running_loop()
+                t0 = loop.time()
+                await asyncio.gather(*(sb.press_key("enter") for sb in sbs))
+                elapsed = loop.time() - t0
+                for sb in sbs:
+                    await sb.close()
+                return elapsed
+
+            # 12 x 0.2 s sequentially would be 2.4 s; concurrently ~0.2 s
+            assert _run(go()) < 1.2
+            assert all(len(s.calls) == 1 for s in servers)
+        finally:
+            for s in servers:
+                s.stop()
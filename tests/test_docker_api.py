@@ -0,0 +1,317 @@
+# tests/test_docker_api.py — Docker Engine API lifecycle against a stand-in unix-socket daemon
+import pytest
+import sys
+import os
+import subprocess
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.docker_api import (
+    ContainerInfo,
+    ContainerSpec,
+    DockerCLI,
+    DockerEngine,
+    DockerError,
+    _parse_size,
+    _split_image,
+    make_docker_client,
+)
+from src.sandbox import Baseline, Sandbox
+from tests.standin_server import StandinDockerEngine, StandinServer
+
+
+@pytest.fixture
+def engine():
+    with StandinDockerEngine() as srv:
+        yield srv
+
+
+# ─── Helpers ─────────────────────────────────────────────────────────
+
+class TestHelpers:
+    def test_parse_size(self):
+        assert _parse_size("512m") == 512 * 1024 ** 2
+        assert _parse_size("1g") == 1024 ** 3
+        assert _parse_size("4096") == 4096
+        assert _parse_size("") == 0
+
+    def test_split_image(self):
+        assert _split_image("trycua/cua-xfce:latest") == ("trycua/cua-xfce", "latest")
+        assert _split_image("trycua/cua-xfce") == ("trycua/cua-xfce", "latest")
+        assert _split_image("localhost:5000/img:v2") == ("localhost:5000/img", "v2")
+        assert _split_image("localhost:5000/img") == ("localhost:5000/img", "latest")
+
+    def test_container_info_from_inspect(self):
+        info = ContainerInfo.from_inspect({
+            "Id": "abc",
+            "State": {"Running": True, "Status": "running"},
+            "Config": {"Image": "img", "Env": ["A=1", "B=x=y", "junk"]},
+        })
+        assert info.exists and info.running
+        assert info.env == {"A": "1", "B": "x=y"}
+
+
+# ─── Engine client ───────────────────────────────────────────────────
+
+class TestDockerEngine:
+    def test_inspect_missing(self, engine):
+        client = DockerEngine(engine.socket_path)
+        assert client.inspect("nope").exists is False
+        client.close()
+
+    def test_run_inspect_remove_on_one_connection(self, engine):
+        client = DockerEngine(engine.socket_path)
+        spec = ContainerSpec(
+            name="sb1", image="trycua/cua-xfce:latest",
+            env={"VNC_RESOLUTION": "800x600"}, ports=[(15901, 5901)], shm_size="512m",
+        )
+        client.run(spec)
+        info = client.inspect("sb1")
+        assert info.running
+        assert info.env["VNC_RESOLUTION"] == "800x600"
+        host_cfg = engine.containers["sb1"]["HostConfig"]
+        assert host_cfg["PortBindings"]["5901/tcp"] == [{"HostPort": "15901"}]
+        assert host_cfg["ShmSize"] == 512 * 1024 ** 2
+
+        client.remove("sb1")
+        client.remove("sb1")  # already gone: no error
+        assert "sb1" not in engine.containers
+        assert engine.connections == 1
+        client.close()
+
+    def test_pulls_missing_image(self):
+        with StandinDockerEngine(images=[]) as srv:
+            client = DockerEngine(srv.socket_path)
+            client.run(ContainerSpec(name="sb", image="trycua/cua-xfce:v1"))
+            assert ("POST", "/images/create?fromImage=trycua%2Fcua-xfce&tag=v1") in srv.requests
+            assert srv.containers["sb"]["State"]["Running"]
+            client.close()
+
+    def test_errors_raise(self, engine):
+        client = DockerEngine(engine.socket_path)
+        client.run(ContainerSpec(name="dup", image="trycua/cua-xfce:latest"))
+        with pytest.raises(DockerError):
+            client.run(ContainerSpec(name="dup", image="trycua/cua-xfce:latest"))
+        client.close()
+
+    def test_reconnects_after_daemon_drops_connection(self, engine):
+        client = DockerEngine(engine.socket_path)
+        client.inspect("x")
+        engine.drop_connections()
+        assert client.inspect("x").exists is False
+        assert engine.connections == 2
+        client.close()
+
+    def test_timeout_is_not_retried(self):
+        with StandinDockerEngine(create_latency=0.5) as srv:
+            client = DockerEngine(srv.socket_path, timeout=0.2)
+            client.inspect("x")  # the create below goes out on a kept-alive connection
+            with pytest.raises(OSError):
+                client.run(ContainerSpec(name="slow", image="trycua/cua-xfce:latest"))
+            time.sleep(0.5)
+            assert [r for r in srv.requests if r[1].startswith("/containers/create")] == \
+                [("POST", "/containers/create?name=slow")]
+            assert "slow" in srv.containers  # the daemon did act on it
+            client.close()
+
+
+# ─── Backend selection ───────────────────────────────────────────────
+
+class TestMakeDockerClient:
+    def test_auto_uses_socket(self, engine):
+        client = make_docker_client(type("C", (), {"DOCKER_HOST": engine.docker_host})())
+        assert isinstance(client, DockerEngine)
+        client.close()
+
+    def test_auto_falls_back_to_cli(self, tmp_path):
+        cfg = type("C", (), {"DOCKER_HOST": f"unix://{tmp_path}/missing.sock"})()
+        assert isinstance(make_docker_client(cfg), DockerCLI)
+
+    def test_forced_backends(self, tmp_path):
+        assert isinstance(make_docker_client(type("C", (), {"DOCKER_BACKEND": "cli"})()), DockerCLI)
+        cfg = type("C", (), {"DOCKER_BACKEND": "api", "DOCKER_HOST": f"unix://{tmp_path}/missing.sock"})()
+        with pytest.raises(DockerError):
+            make_docker_client(cfg)
+
+
+# ─── Sandbox.start() cold vs warm ────────────────────────────────────
+
+class TestSandboxLifecycle:
+    def test_cold_then_warm_start(self):
+        with StandinDockerEngine(create_latency=0.05, start_latency=0.15) as docker, \
+                StandinServer(screen_size=(64, 64)) as api:
+            cfg = api.cfg(DOCKER_HOST=docker.docker_host, SANDBOX_NAME="sb_cold",
+                          VNC_RESOLUTION="640x480", VNC_COL_DEPTH=24)
+
+            sb = Sandbox(cfg)
+            sb.start()
+            cold = sb.start_timings
+            assert [m for m, _ in docker.requests] == ["GET", "GET", "POST", "POST"]  # ping, inspect, create, start
+            assert docker.containers["sb_cold"]["State"]["Running"]
+
+            n = len(docker.requests)
+            sb.start()
+            warm = sb.start_timings
+            assert docker.requests[n:] == [("GET", "/containers/sb_cold/json")]  # one inspect: state + env
+            assert warm["container"] < cold["container"]
+            assert cold["container"] >= 0.2
+            assert docker.connections == 1
+            sb.close()
+
+    def test_env_change_recreates(self):
+        with StandinDockerEngine() as docker, StandinServer() as api:
+            docker.add_container("sb_env", {"VNC_RESOLUTION": "1024x768", "VNC_COL_DEPTH": "24"})
+            old_id = docker.containers["sb_env"]["Id"]
+            sb = Sandbox(api.cfg(DOCKER_HOST=docker.docker_host, SANDBOX_NAME="sb_env",
+                                 VNC_RESOLUTION="640x480", VNC_COL_DEPTH=24))
+            sb.start()
+            c = docker.containers["sb_env"]
+            assert c["Id"] != old_id
+            assert "VNC_RESOLUTION=640x480" in c["Config"]["Env"]
+            sb.close()
+
+    def test_stopped_container_removed_then_run(self):
+        with StandinDockerEngine() as docker, StandinServer() as api:
+            docker.add_container("sb_dead", {}, running=False)
+            sb = Sandbox(api.cfg(DOCKER_HOST=docker.docker_host, SANDBOX_NAME="sb_dead"))
+            sb.start()
+            assert ("DELETE", "/containers/sb_dead?force=true") in docker.requests
+            assert docker.containers["sb_dead"]["State"]["Running"]
+            sb.stop()
+            assert "sb_dead" not in docker.containers
+            sb.close()
+
+
+# ─── exec / commit / reset(baseline) ─────────────────────────────────
+
+class FakeProcesses:
+    """exec_handler for StandinDockerEngine that fakes `ps` output and records scripts."""
+
+    def __init__(self, pids):
+        self.pids = list(pids)
+        self.scripts = []
+
+    def __call__(self, name, cmd):
+        script = cmd[-1]
+        self.scripts.append(script)
+        if "ps -eo pid=" in script and "KEEP=" not in script:
+            return 0, "".join(f"{p:>7}\n" for p in self.pids)
+        return 0, ""
+
+
+class ShellProcesses:
+    """
+    exec_handler that runs each script in a real `sh`, with tar / ps / rm / mv /
+    mkdir / kill replaced by functions that only log, so nothing is touched.
+    tar fails when `tar_fails` is set.
+    """
+
+    def __init__(self, tar_fails=False):
+        self.tar_fails = tar_fails
+        self.log = []
+
+    def __call__(self, name, cmd):
+        fake = (
+            'tar() { echo "tar $*"; return %d; }; ps() { printf "1\\n"; }; '
+            'rm() { echo "rm $*"; }; mv() { echo "mv $*"; }; mkdir() { :; }; kill() { :; }; '
+        ) % (2 if self.tar_fails else 0)
+        p = subprocess.run(["sh", "-c", fake + cmd[-1]], capture_output=True, text=True)
+        self.log.extend(p.stdout.splitlines())
+        return p.returncode, p.stdout + p.stderr
+
+
+class TestExecAndReset:
+    def test_exec_and_commit(self):
+        procs = FakeProcesses([1, 2])
+        with StandinDockerEngine(exec_handler=procs) as srv:
+            srv.add_container("sb", {})
+            client = DockerEngine(srv.socket_path)
+            code, out = client.exec("sb", ["sh", "-c", "ps -eo pid="])
+            assert code == 0 and out.split() == ["1", "2"]
+            client.commit("sb", "cua-baseline/sb:latest")
+            assert "cua-baseline/sb:latest" in srv.images
+            # exec stream closes the connection; the next call reconnects transparently
+            assert client.inspect("sb").running
+            client.close()
+
+    def test_session_reset(self):
+        procs = FakeProcesses([1, 40, 41])
+        with StandinDockerEngine(exec_handler=procs) as docker, StandinServer() as api:
+            sb = Sandbox(api.cfg(DOCKER_HOST=docker.docker_host, SANDBOX_NAME="sb_reset",
+                                 RESET_PATHS=("/home", "/root")))
+            sb.start()
+            base = sb.capture_baseline()
+            assert base.mode == "session" and base.pids == [1, 40, 41]
+            assert "tar -cf /tmp/.cua_baseline.tar.part -C / home root" in procs.scripts[0]
+
+            sb._screen_cache = (1, 1)
+            sb.reset(base)
+            script = procs.scripts[-1]
+            assert 'KEEP=" 1 40 41 "' in script
+            # unpacked aside before anything is killed or deleted
+            assert script.index("tar -xpf /tmp/.cua_baseline.tar -C /tmp/.cua_restore") < script.index("KEEP=")
+            assert script.index("KEEP=") < script.index('rm -rf "/$t"')
+            assert sb._screen_cache is None
+            sb.close()
+
+    def test_session_reset_swaps_in_staged_copy(self):
+        procs = ShellProcesses()
+        with StandinDockerEngine(exec_handler=procs) as docker:
+            docker.add_container("sb_sh", {})
+            sb = Sandbox(SimpleNamespace(DOCKER_HOST=docker.docker_host, SANDBOX_NAME="sb_sh",
+                                         RESET_PATHS=("/home", "/root")))
+            base = sb.capture_baseline()
+            assert procs.log[-2:] == ["mv /tmp/.cua_baseline.tar.part /tmp/.cua_baseline.tar", "1"]
+            procs.log.clear()
+            sb.reset(base)
+            assert procs.log[-5:] == ["rm -rf /home", "mv /tmp/.cua_restore/home /home",
+                                      "rm -rf /root", "mv /tmp/.cua_restore/root /root",
+                                      "rm -rf /tmp/.cua_restore"]
+            sb.close()
+
+    def test_failed_capture_raises(self):
+        procs = ShellProcesses(tar_fails=True)
+        with StandinDockerEngine(exec_handler=procs) as docker:
+            docker.add_container("sb_tar", {})
+            sb = Sandbox(SimpleNamespace(DOCKER_HOST=docker.docker_host, SANDBOX_NAME="sb_tar"))
+            with pytest.raises(DockerError, match="baseline archive failed"):
+                sb.capture_baseline()
+            assert not any(line.startswith("mv ") for line in procs.log)  # old archive kept
+            sb.close()
+
+    def test_unusable_archive_deletes_nothing(self):
+        procs = ShellProcesses(tar_fails=True)
+        with StandinDockerEngine(exec_handler=procs) as docker:
+            docker.add_container("sb_bad_tar", {})
+            sb = Sandbox(SimpleNamespace(DOCKER_HOST=docker.docker_host, SANDBOX_NAME="sb_bad_tar"))
+            base = Baseline(mode="session", pids=[1], paths=("/home",), created_at=0.0)
+            with pytest.raises(DockerError, match="nothing reset"):
+                sb.reset(base)
+            assert "rm -rf /home" not in procs.log
+            assert not any(line.startswith("mv ") for line in procs.log)
+            sb.close()
+
+    def test_commit_reset_recreates_from_image(self):
+        with StandinDockerEngine() as docker, StandinServer() as api:
+            sb = Sandbox(api.cfg(DOCKER_HOST=docker.docker_host, SANDBOX_NAME="sb_commit"))
+            sb.start()
+            old_id = docker.containers["sb_commit"]["Id"]
+            base = sb.capture_baseline(mode="commit")
+            sb.reset(base)
+            c = docker.containers["sb_commit"]
+            assert c["Id"] != old_id
+            assert c["Config"]["Image"] == base.image
+            assert c["State"]["Running"]
+            sb.close()
+
+    def test_failed_exec_raises(self):
+        with StandinDockerEngine(exec_handler=lambda n, c: (1, "boom")) as docker:
+            docker.add_container("sb_bad", {})
+            sb = Sandbox(SimpleNamespace(DOCKER_HOST=docker.docker_host, SANDBOX_NAME="sb_bad"))
+            with pytest.raises(DockerError):
+                sb.capture_baseline()
+            with pytest.raises(ValueError):
+                sb.capture_baseline(mode="snapshot")
+            sb.close()
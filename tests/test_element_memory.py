@@ -0,0 +1,110 @@
+# tests/test_element_memory.py — NCC template matching and the on-disk element memory
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image, ImageDraw
+
+from src.config import cfg
+from src.element_memory import ElementMemory, default_memory, match_template, memory_key
+from src.frame import Frame
+from src.sandbox import _norm_to_px
+
+
+def desktop(icons=((500, 330),), size=(640, 360)):
+    """A gradient desktop with 20x20 'browser icons' on toolbar tiles, centred at the given pixels."""
+    w, h = size
+    img = Image.linear_gradient("L").resize((w, h)).convert("RGB")
+    d = ImageDraw.Draw(img)
+    for cx, cy in icons:
+        d.rectangle((cx - 30, cy - 30, cx + 30, cy + 30), fill=(60, 60, 70))
+        d.ellipse((cx - 10, cy - 10, cx + 10, cy + 10), fill=(230, 120, 20), outline=(20, 20, 90))
+        d.line((cx - 6, cy, cx + 6, cy), fill=(255, 255, 255), width=2)
+    return Frame(image=img)
+
+
+def click_at(frame, cx, cy, target="Firefox icon"):
+    w, h = frame.size
+    return {"action": "CLICK", "x": cx / (w - 1), "y": cy / (h - 1), "target": target}
+
+
+# ─── match_template ──────────────────────────────────────────────────
+
+class TestMatchTemplate:
+    def test_finds_exact_offset(self):
+        img = np.random.default_rng(0).integers(0, 255, (120, 200)).astype(np.uint8)
+        ncc = match_template(img, img[40:64, 90:120])
+        assert ncc.shape == (97, 171)
+        assert np.unravel_index(np.argmax(ncc), ncc.shape) == (40, 90)
+        assert ncc[40, 90] == pytest.approx(1.0, abs=1e-6)
+
+    def test_brightness_invariant_and_flat_is_zero(self):
+        img = np.random.default_rng(1).integers(0, 200, (60, 60)).astype(np.uint8)
+        assert match_template(img, img[10:20, 10:20] + 40)[10, 10] == pytest.approx(1.0, abs=1e-6)
+        flat = np.full((60, 60), 7, dtype=np.uint8)
+        assert not match_template(flat, img[:10, :10]).any()
+        assert match_template(img[:5, :5], img).size == 0
+
+
+# ─── ElementMemory ───────────────────────────────────────────────────
+
+class TestElementMemory:
+    def test_recalls_moved_element_and_persists(self, tmp_path):
+        mem = ElementMemory(str(tmp_path))
+        first = desktop([(500, 330)])
+        assert mem.remember(first, click_at(first, 500, 330), "Open  Firefox") is not None
+        assert (tmp_path / "index.json").exists()
+
+        moved = desktop([(120, 200)])
+        hit = ElementMemory(str(tmp_path)).recall(moved, "open firefox")  # fresh load from disk
+        assert hit is not None and hit.score > 0.95
+        assert hit.as_action()["action"] == "CLICK" and hit.label == "Firefox icon"
+        px, py = _norm_to_px(hit.x, hit.y, 640, 360)
+        assert abs(px - 120) <= 1 and abs(py - 200) <= 1
+
+    def test_no_match_when_absent_ambiguous_or_resized(self, tmp_path):
+        mem = ElementMemory(str(tmp_path))
+        f = desktop([(500, 330)])
+        mem.remember(f, click_at(f, 500, 330), "open firefox")
+        assert mem.recall(desktop([]), "open firefox") is None
+        assert mem.recall(desktop([(100, 100), (400, 200)]), "open firefox") is None  # two identical icons
+        assert mem.recall(desktop([(500, 330)], size=(800, 450)), "open firefox") is None
+        assert mem.recall(f, "another step") is None
+
+    def test_refuses_flat_patches_and_non_clicks(self, tmp_path):
+        mem = ElementMemory(str(tmp_path))
+        blank = Frame(image=Image.new("RGB", (640, 360), "white"))
+        assert mem.remember(blank, click_at(blank, 300, 200), "s") is None
+        f = desktop()
+        assert mem.remember(f, {"action": "TYPE", "text": "hi"}, "s") is None
+        assert len(mem) == 0
+
+    def test_forget_replace_and_evict(self, tmp_path):
+        mem = ElementMemory(str(tmp_path), max_entries=2)
+        f = desktop([(500, 330)])
+        a = mem.remember(f, click_at(f, 500, 330), "s1")
+        b = mem.remember(f, click_at(f, 500, 330), "s1")  # newer verified click replaces a
+        assert len(mem) == 1 and not (tmp_path / f"{a}.png").exists()
+        mem.remember(f, click_at(f, 500, 330), "s2")
+        mem.remember(f, click_at(f, 500, 330), "s3")
+        assert len(mem) == 2 and not (tmp_path / f"{b}.png").exists()  # least recently used went
+        hit = mem.recall(f, "s3")
+        mem.forget(hit.entry_id)
+        assert mem.recall(f, "s3") is None and len(ElementMemory(str(tmp_path))) == 1
+
+    def test_keys_are_scoped_by_objective(self, tmp_path):
+        mem = ElementMemory(str(tmp_path))
+        f = desktop([(500, 330)])
+        mem.remember(f, click_at(f, 500, 330), memory_key("Open YouTube in Firefox", "Open the browser"))
+        assert mem.recall(f, memory_key("open youtube in  firefox", "Open the browser")) is not None
+        assert mem.recall(f, memory_key("Edit a spreadsheet", "Open the browser")) is None
+
+    def test_off_by_default(self, tmp_path, monkeypatch):
+        assert default_memory() is None
+        monkeypatch.setattr(cfg, "ELEMENT_MEMORY", True)
+        monkeypatch.setattr(cfg, "ELEMENT_MEMORY_DIR", str(tmp_path))
+        assert default_memory().path == str(tmp_path)
@@ -0,0 +1,116 @@
+# tests/test_frame.py — Frame views and FramePool buffer reuse
+import numpy as np
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image
+
+from src.frame import Frame, FramePool
+from src.frame_broker import FrameBroker
+from src.vision import capture_screen_raw
+from src.sandbox import Sandbox
+from tests.standin_server import StandinServer
+
+
+def _gradient(w=16, h=10):
+    arr = np.zeros((h, w, 3), dtype=np.uint8)
+    arr[..., 0] = np.arange(w)[None, :] * 10
+    arr[..., 1] = np.arange(h)[:, None] * 20
+    arr[..., 2] = 7
+    return arr
+
+
+# ─── Frame ───────────────────────────────────────────────────────────
+
+class TestFrame:
+    def test_array_frame_is_a_view(self):
+        arr = _gradient()
+        f = Frame(array=arr)
+        assert f.array is arr
+        assert f.size == (16, 10)
+        assert not arr.flags.writeable
+        with pytest.raises(ValueError):
+            f.array[0, 0, 0] = 1
+
+    def test_image_derived_once(self):
+        f = Frame(array=_gradient())
+        img = f.image
+        assert img.mode == "RGB" and img.size == (16, 10)
+        assert img.getpixel((3, 2)) == (30, 40, 7)
+        assert f.image is img
+
+    def test_image_frame_array_derived_once(self):
+        img = Image.fromarray(_gradient())
+        f = Frame(image=img)
+        assert f.image is img  # already RGB: no conversion copy
+        assert np.array_equal(f.array, _gradient())
+        assert f.array is f.array
+
+    def test_non_rgb_image_converted(self):
+        f = Frame(image=Image.new("RGBA", (4, 3), (1, 2, 3, 255)))
+        assert f.image.mode == "RGB" and f.array.shape == (3, 4, 3)
+
+    def test_crop_shares_memory(self):
+        arr = _gradient()
+        part = Frame(array=arr).crop((2, 1, 6, 5))
+        assert part.size == (4, 4)
+        assert np.shares_memory(part.array, arr)
+        assert np.array_equal(part.array, arr[1:5, 2:6])
+
+    def test_rejects_bad_arrays(self):
+        with pytest.raises(ValueError):
+            Frame()
+        with pytest.raises(ValueError):
+            Frame(array=np.zeros((4, 4), dtype=np.uint8))
+        with pytest.raises(ValueError):
+            Frame(array=np.zeros((4, 4, 3), dtype=np.float32))
+
+
+# ─── FramePool ───────────────────────────────────────────────────────
+
+class TestFramePool:
+    def test_buffer_reused_after_release(self):
+        pool = FramePool()
+        f = Frame(array=pool.acquire(16, 10))
+        first = id(f.array)  # an id, not a reference: holding the array would keep it busy
+        del f
+        buf = pool.acquire(16, 10)
+        assert id(buf) == first and buf.flags.writeable
+        assert pool.allocations == 1
+
+    def test_busy_buffers_never_handed_out(self):
+        pool = FramePool()
+        held = Frame(array=pool.acquire(16, 10))
+        view = Frame(array=pool.acquire(16, 10)).crop((0, 0, 4, 4))  # frame gone, view alive
+        other = pool.acquire(16, 10)
+        assert other is not held.array and not np.shares_memory(other, view.array)
+        assert pool.allocations == 3
+
+    def test_resolution_change_retires_old_size(self):
+        pool = FramePool(max_buffers=1)
+        pool.acquire(16, 10)
+        big = pool.acquire(32, 20)
+        del big
+        assert pool.acquire(32, 20).shape == (20, 32, 3)
+        assert pool.allocations == 2
+
+
+# ─── Capture paths ───────────────────────────────────────────────────
+
+class TestCapturePaths:
+    def test_broker_wraps_images(self):
+        broker = FrameBroker(lambda: Image.new("RGB", (4, 4)))
+        tf = broker.get()
+        assert isinstance(tf.frame, Frame) and tf.image is tf.frame.image
+
+    def test_http_frame_shared_by_gui_and_agent(self):
+        with StandinServer(screen_size=(40, 30)) as srv:
+            sb = Sandbox(srv.cfg())
+            frame = sb.frames.get().frame
+            assert frame.size == (40, 30)
+            # the GUI reuses the agent's frame object, not a converted copy
+            assert capture_screen_raw(sb, max_age=60.0) is frame.image
+            sb.close()
@@ -0,0 +1,106 @@
+# tests/test_frame_broker.py — Unit tests for coalesced screen capture
+import threading
+import time
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image
+
+from src.frame_broker import FrameBroker
+
+
+class SlowCapture:
+    """Capture function that takes `delay` seconds and counts calls."""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return Image.new("RGB", (4, 4))
+
+
+def _in_threads(fn, n):
+    out = [None] * n
+    def run(i):
+        out[i] = fn()
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return out
+
+
+class TestFrameBroker:
+    def test_latest_frame_reused_within_max_age(self):
+        cap = SlowCapture(delay=0.0)
+        broker = FrameBroker(cap)
+        f1 = broker.get()
+        f2 = broker.get(max_age=5.0)
+        assert f1 is f2
+        assert cap.calls == 1
+
+    def test_newer_than_forces_fresh_capture(self):
+        cap = SlowCapture(delay=0.0)
+        broker = FrameBroker(cap)
+        f1 = broker.get()
+        time.sleep(0.01)
+        f2 = broker.get(newer_than=time.time())
+        assert f2.seq == f1.seq + 1
+        assert cap.calls == 2
+
+    def test_concurrent_requests_coalesce(self):
+        cap = SlowCapture(delay=0.2)
+        broker = FrameBroker(cap)
+        t0 = time.time()
+        frames = _in_threads(lambda: broker.get(newer_than=t0), 6)
+        assert cap.calls == 1
+        assert len({f.seq for f in frames}) == 1
+
+    def test_agent_does_not_wait_behind_gui_fetch(self):
+        cap = SlowCapture(delay=0.5)
+        broker = FrameBroker(cap)
+        gui = threading.Thread(target=lambda: broker.get(max_age=0.0))
+        gui.start()
+        time.sleep(0.05)  # GUI capture in flight
+
+        t0 = time.time()
+        frame = broker.get(newer_than=t0)
+        gui.join()
+
+        assert frame.ts >= t0
+        assert cap.calls == 2  # agent started its own capture instead of reusing the stale one
+
+    def test_gui_joins_agent_fetch(self):
+        cap = SlowCapture(delay=0.3)
+        broker = FrameBroker(cap)
+        agent = threading.Thread(target=lambda: broker.get(newer_than=time.time()))
+        agent.start()
+        time.sleep(0.05)
+        broker.get(max_age=1.0)
+        agent.join()
+        assert cap.calls == 1
+
+    def test_subscribers_and_errors(self):
+        seen = []
+        broker = FrameBroker(SlowCapture(delay=0.0))
+        unsubscribe = broker.subscribe(seen.append)
+        broker.get()
+        unsubscribe()
+        broker.get(newer_than=time.time() + 1)
+        assert len(seen) == 1
+
+        def boom():
+            raise RuntimeError("capture failed")
+        bad = FrameBroker(boom)
+        with pytest.raises(RuntimeError):
+            bad.get()
+        assert bad.latest() is None
@@ -0,0 +1,107 @@
+# tests/test_frame_ring.py — Budgeted ring of recent frames and its consumers
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.config import cfg
+from src.frame import Frame, FramePool
+from src.frame_broker import FrameBroker
+from src.frame_ring import FrameRing, export_trajectory
+from src.guards import detect_screen_loop
+
+
+def screen(value, w=640, h=360):
+    return Frame(array=np.full((h, w, 3), value, dtype=np.uint8))
+
+
+class RingSandbox:
+    """Raw-pixel sandbox stand-in (FrameBroker) with a frame ring."""
+
+    capture = None
+
+    def __init__(self, arr):
+        self.arr = arr
+        self.frames = FrameBroker(lambda: Frame(array=self.arr.copy()))
+        self.ring = FrameRing()
+
+
+# ─── Storage ─────────────────────────────────────────────────────────
+
+class TestFrameRing:
+    def test_push_downscales_and_detaches_from_pool(self):
+        pool = FramePool()
+        buf = pool.acquire(1920, 1080)
+        buf[:] = 200
+        ring = FrameRing(max_dim=320)
+        item = ring.push(Frame(array=buf), "executor")
+        assert item.array.shape == (180, 320, 3) and not item.array.flags.writeable
+        assert item.array.base is None or item.array.base is not buf
+        small = ring.push(np.zeros((90, 160), np.uint8), "settle")
+        assert small.array.shape == (90, 160)  # already small: kept as is
+
+    def test_budget_drops_oldest(self):
+        ring = FrameRing(budget_bytes=3 * 180 * 320 * 3, max_dim=320)
+        for v in range(5):
+            ring.push(screen(v * 40))
+        assert len(ring) == 3 and ring.nbytes <= ring.budget_bytes
+        assert [int(f.array[0, 0, 0]) for f in ring.frames()] == [80, 120, 160]
+
+    def test_latest_by_label_and_time(self):
+        ring = FrameRing()
+        a = ring.push(screen(10), "executor", ts=100.0)
+        ring.push(screen(20), "verifier", ts=101.0)
+        b = ring.push(screen(30), "executor", ts=102.0)
+        assert ring.latest("executor") is b
+        assert ring.latest("executor", before=102.0) is a
+        assert ring.latest("settle") is None
+
+    def test_export_round_trip(self, tmp_path):
+        ring = FrameRing()
+        ring.push(screen(10), "executor")
+        ring.push(np.zeros((90, 160), np.uint8), "settle")
+        path = str(tmp_path / "traj" / "t.npz")
+        assert ring.export(path) == 2
+        with np.load(path) as data:
+            index = json.loads(str(data["index"]))
+            assert [e["label"] for e in index] == ["executor", "settle"]
+            assert data[f"frame_{index[0]['seq']}"].shape == (180, 320, 3)
+
+    def test_export_trajectory_switch(self, tmp_path, monkeypatch):
+        sb = RingSandbox(np.zeros((200, 320, 3), np.uint8))
+        sb.ring.push(screen(5))
+        monkeypatch.setattr(cfg, "TRAJECTORY_PATH", "")
+        assert export_trajectory(sb) == 0
+        assert export_trajectory(sb, str(tmp_path / "t.npz")) == 1
+        assert export_trajectory(object(), str(tmp_path / "u.npz")) == 0
+
+    def test_export_only_this_objective(self, tmp_path):
+        sb = RingSandbox(np.zeros((200, 320, 3), np.uint8))
+        sb.ring.push(screen(5), "executor", ts=100.0)  # an earlier objective
+        sb.ring.push(screen(9), "executor", ts=200.0)
+        sb.ring.push(screen(9), "verifier", ts=201.0)
+        path = str(tmp_path / "t.npz")
+        assert export_trajectory(sb, path, since=150.0) == 2
+        with np.load(path) as data:
+            assert [e["ts"] for e in json.loads(str(data["index"]))] == [200.0, 201.0]
+        assert export_trajectory(sb, str(tmp_path / "u.npz"), since=300.0) == 0
+        assert not os.path.exists(tmp_path / "u.npz")
+
+
+# ─── Consumers ───────────────────────────────────────────────────────
+
+class TestConsumers:
+    def test_screen_loop_detection(self):
+        ring = FrameRing()
+        ring.push(screen(50), "executor", ts=1.0)
+        ring.push(screen(200), "verifier", ts=2.0)
+        ring.push(screen(50), "executor", ts=3.0)
+        assert detect_screen_loop(ring) == (False, "")
+        ring.push(screen(50), "executor", ts=4.0)
+        looping, why = detect_screen_loop(ring)
+        assert looping and "3 attempts" in why
+        assert not detect_screen_loop(ring, since=2.5)[0]
+        assert detect_screen_loop(None) == (False, "")
@@ -0,0 +1,104 @@
+# tests/test_grounding.py — Coarse-to-fine click refinement against the stand-in server
+import numpy as np
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image, ImageDraw
+
+from src.config import cfg
+from src.grounding import crop_to_screen, needs_zoom, refine_click, zoom_box
+from src.sandbox import Sandbox, _norm_to_px
+from tests.standin_server import StandinServer
+
+TARGET = (1500, 300, 1510, 310)  # a 10x10 "tray icon" on a 1920x1080 desktop
+
+
+def _desktop():
+    img = Image.new("RGB", (1920, 1080), "white")
+    ImageDraw.Draw(img).rectangle(TARGET, fill=(255, 0, 0))
+    return img
+
+
+def red_finder(seen=None):
+    """A stand-in for ask_zoom_point: locates the red square on the crop it is given."""
+
+    def ask(llm, objective, target, crop):
+        if seen is not None:
+            seen.append(crop.size)
+        arr = crop.array
+        ys, xs = np.nonzero((arr[..., 0] > 200) & (arr[..., 1] < 60))
+        if not len(xs):
+            return {"found": False}
+        h, w = arr.shape[:2]
+        return {"found": True, "x": xs.mean() / (w - 1), "y": ys.mean() / (h - 1)}
+    return ask
+
+
+# ─── When to zoom ────────────────────────────────────────────────────
+
+class TestNeedsZoom:
+    def test_low_confidence_or_small_target(self):
+        assert needs_zoom({"action": "CLICK", "x": 0.5, "y": 0.5, "confidence": 0.3, "target": "Firefox"})
+        assert needs_zoom({"action": "CLICK", "confidence": 0.8, "target": "Close button"})
+        assert not needs_zoom({"action": "CLICK", "confidence": 0.8, "target": "Firefox window"})
+
+    def test_confident_small_target_is_not_zoomed(self):
+        assert not needs_zoom({"action": "CLICK", "confidence": 0.95, "target": "Close button"})
+
+    def test_whole_words_only(self):
+        assert needs_zoom({"action": "CLICK", "confidence": 0.8, "target": "second tab"})
+        assert needs_zoom({"action": "CLICK", "confidence": 0.8, "target": "Tabs bar"})
+        for target in ("Data table", "closed issues", "Menubar", "Iconography page", "tabular view"):
+            assert not needs_zoom({"action": "CLICK", "confidence": 0.8, "target": target})
+
+    def test_only_clicks(self, monkeypatch):
+        assert not needs_zoom({"action": "TYPE", "text": "hi", "confidence": 0.1})
+        monkeypatch.setattr(cfg, "ZOOM_GROUNDING", False)
+        assert not needs_zoom({"action": "CLICK", "confidence": 0.1})
+
+
+# ─── Geometry ────────────────────────────────────────────────────────
+
+class TestGeometry:
+    def test_box_centred_and_kept_on_screen(self):
+        assert zoom_box(0.5, 0.5, (1920, 1080), 480) == (719, 299, 1199, 779)
+        assert zoom_box(0.99, 0.01, (1920, 1080), 480) == (1440, 0, 1920, 480)
+        assert zoom_box(0.5, 0.5, (400, 300), 480) == (0, 0, 400, 300)
+
+    @pytest.mark.parametrize("xc,yc", [(0.0, 0.0), (0.37, 0.81), (1.0, 1.0)])
+    def test_crop_point_maps_to_exact_pixel(self, xc, yc):
+        box, screen = (1440, 0, 1920, 480), (1920, 1080)
+        cx, cy = _norm_to_px(xc, yc, 480, 480)
+        assert _norm_to_px(*crop_to_screen(xc, yc, box, screen), *screen) == (1440 + cx, cy)
+
+
+# ─── refine_click ────────────────────────────────────────────────────
+
+class TestRefineClick:
+    def test_refines_to_target_at_full_resolution(self):
+        with StandinServer(screen_size=(1920, 1080), server_crop=True) as srv:
+            srv.set_screen(_desktop())
+            sb = Sandbox(srv.cfg())
+            seen = []
+            coarse = {"action": "CLICK", "x": 0.80, "y": 0.30, "target": "tray icon"}  # ~40 px off
+            out, refined = refine_click(None, sb, "open tray", coarse, ask=red_finder(seen))
+            assert refined and out is not coarse and coarse["x"] == 0.80
+            px, py = sb._norm_to_px(out["x"], out["y"])
+            assert TARGET[0] <= px <= TARGET[2] and TARGET[1] <= py <= TARGET[3]
+            assert seen == [(480, 480)]  # full-resolution crop, not the 640 px downscale
+            sb.close()
+
+    def test_not_found_or_error_keeps_coarse_click(self):
+        with StandinServer(screen_size=(1920, 1080), server_crop=True) as srv:
+            srv.set_screen(_desktop())
+            sb = Sandbox(srv.cfg())
+            coarse = {"action": "CLICK", "x": 0.2, "y": 0.7, "target": "icon"}
+            assert refine_click(None, sb, "o", coarse, ask=red_finder()) == (coarse, False)
+
+            def broken(*a):
+                raise ValueError("Model output is not JSON")
+            assert refine_click(None, sb, "o", coarse, ask=broken) == (coarse, False)
+            sb.close()
@@ -0,0 +1,148 @@
+# tests/test_rfb.py — RFB framebuffer client against an in-process fake VNC server
+import socket
+import struct
+import threading
+import time
+import pytest
+import sys
+import os
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.rfb import RFBClient
+from src.sandbox import Sandbox
+from tests.standin_server import StandinServer
+
+
+W, H = 8, 6
+
+
+def _recv_exact(conn, n):
+    buf = b""
+    while len(buf) < n:
+        chunk = conn.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("client closed")
+        buf += chunk
+    return buf
+
+
+class FakeVncServer:
+    """
+    RFB 3.8, security type None. First (full) update: one Raw rect where pixel
+    (x, y) is R=x*10, G=y*10, B=7. Second update: CopyRect of the 2x2 block at
+    (0, 0) onto (6, 4). Later requests are left unanswered.
+    """
+
+    def __init__(self):
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(1)
+        self.port = self._sock.getsockname()[1]
+        self.requests = []
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        conn, _ = self._sock.accept()
+        try:
+            conn.sendall(b"RFB 003.008\n")
+            _recv_exact(conn, 12)
+            conn.sendall(b"\x01\x01")           # one security type: None
+            _recv_exact(conn, 1)
+            conn.sendall(struct.pack("!I", 0))  # SecurityResult OK
+            _recv_exact(conn, 1)                # ClientInit
+            name = b"fake"
+            conn.sendall(struct.pack("!HH", W, H) + b"\0" * 16 + struct.pack("!I", len(name)) + name)
+            _recv_exact(conn, 20)               # SetPixelFormat
+            _, n = struct.unpack("!BxH", _recv_exact(conn, 4))
+            _recv_exact(conn, 4 * n)            # SetEncodings
+
+            for i in range(3):
+                req = struct.unpack("!BBHHHH", _recv_exact(conn, 10))
+                self.requests.append(req)
+                if i == 0:
+                    px = bytearray()
+                    for y in range(H):
+                        for x in range(W):
+                            px += bytes((7, y * 10, x * 10, 0))  # B, G, R, X
+                    conn.sendall(struct.pack("!BxH", 0, 1) + struct.pack("!HHHHi", 0, 0, W, H, 0) + px)
+                elif i == 1:
+                    conn.sendall(struct.pack("!BxH", 0, 1) + struct.pack("!HHHHi", 6, 4, 2, 2, 1)
+                                 + struct.pack("!HH", 0, 0))
+            time.sleep(5)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def close(self):
+        self._sock.close()
+
+
+@pytest.fixture
+def vnc():
+    srv = FakeVncServer()
+    yield srv
+    srv.close()
+
+
+def _wait_for(pred, timeout=3.0):
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        if pred():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestRFBClient:
+    def test_raw_and_copyrect(self, vnc):
+        client = RFBClient("127.0.0.1", vnc.port, update_interval=0.0)
+        client.start()
+        try:
+            assert client.size() == (W, H)
+            assert _wait_for(lambda: client.update_count >= 2)
+            rgb = client.snapshot_rgb()
+            assert rgb.shape == (H, W, 3)
+            assert tuple(rgb[2, 3]) == (30, 20, 7)
+            # CopyRect moved the (0,0) 2x2 block to (6,4)
+            assert np.array_equal(rgb[4:6, 6:8], rgb[0:2, 0:2])
+            # region copy: only the box is sliced out
+            assert np.array_equal(client.snapshot_rgb(box=(1, 2, 5, 5)), rgb[2:5, 1:5])
+            # copy into a caller's buffer; a stale shape gets a fresh array instead
+            out = np.empty((H, W, 3), dtype=np.uint8)
+            assert client.snapshot_rgb(out=out) is out and np.array_equal(out, rgb)
+            assert client.snapshot_rgb(out=np.empty((1, 1, 3), dtype=np.uint8)).shape == (H, W, 3)
+            # first request full, later ones incremental
+            assert vnc.requests[0][1] == 0
+            assert vnc.requests[1][1] == 1
+        finally:
+            client.close()
+
+    def test_sandbox_vnc_backend(self, vnc):
+        with StandinServer(screen_size=(32, 32)) as api:
+            sb = Sandbox(api.cfg(CAPTURE_BACKEND="vnc", VNC_PORT=vnc.port))
+            try:
+                img = sb.screenshot()
+                assert img.size == (W, H)
+                assert not any(c == "screenshot" for c, _ in api.calls)
+                # frames land in recycled buffers once the previous one is released
+                f = sb.grab_frame()
+                assert f.array.shape == (H, W, 3)
+                del f
+                for _ in range(5):
+                    sb.grab_frame()
+                assert sb.capture._pool.allocations <= 2
+            finally:
+                sb.close()
+
+    def test_sandbox_vnc_fallback_to_http(self):
+        with StandinServer(screen_size=(32, 32)) as api:
+            closed = socket.socket()
+            closed.bind(("127.0.0.1", 0))
+            port = closed.getsockname()[1]
+            closed.close()
+            sb = Sandbox(api.cfg(CAPTURE_BACKEND="vnc", VNC_PORT=port, VNC_CONNECT_TIMEOUT=1.0))
+            assert sb.screenshot().size == (32, 32)
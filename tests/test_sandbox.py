@@ -0,0 +1,353 @@
+# tests/test_sandbox.py — Unit tests for the Sandbox REST wrapper (local stand-in server)
+import base64
+import json
+import socket
+import threading
+import time
+import pytest
+import sys
+import os
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.sandbox import Sandbox, _CmdStreamParser, _parse_resolution, _parse_sse_or_json
+from tests.standin_server import StandinDockerEngine, StandinServer
+
+
+@pytest.fixture
+def server():
+    with StandinServer(screen_size=(320, 200)) as srv:
+        yield srv
+
+
+# ─── Response parsing ────────────────────────────────────────────────
+
+class TestParseSseOrJson:
+    def test_plain_json(self):
+        assert _parse_sse_or_json('{"success": true}') == {"success": True}
+
+    def test_sse_returns_last_event(self):
+        text = 'data: {"n": 1}\n\ndata: {"n": 2}\n\n'
+        assert _parse_sse_or_json(text) == {"n": 2}
+
+    def test_empty_raises(self):
+        with pytest.raises(ValueError):
+            _parse_sse_or_json("   ")
+
+
+# ─── Pooled transport ────────────────────────────────────────────────
+
+class TestPooledTransport:
+    def test_commands_reuse_connection(self, server):
+        sb = Sandbox(server.cfg())
+        for _ in range(20):
+            assert sb._post_cmd("move_cursor", {"x": 1, "y": 1})["success"] is True
+        sb.close()
+        assert len(server.calls) == 20
+        assert server.connections == 1
+
+    def test_threads_share_pool(self, server):
+        sb = Sandbox(server.cfg(HTTP_POOL_SIZE=4))
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(10):
+                    sb._post_cmd("press_key", {"key": "a"})
+            except Exception as e:  # pragma: no cover - surfaced below
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        sb.close()
+
+        assert not errors
+        assert len(server.calls) == 40
+        assert server.connections <= 4
+
+    def test_per_command_timeout(self, server):
+        sb = Sandbox(server.cfg(HTTP_TIMEOUT=30.0, HTTP_CMD_TIMEOUTS=(("move_cursor", 2.5),)))
+        assert sb._cmd_timeout("move_cursor") == 2.5
+        assert sb._cmd_timeout("screenshot") == 30.0
+
+    def test_screenshot_and_size(self, server):
+        sb = Sandbox(server.cfg())
+        assert sb.screenshot().size == (320, 200)
+        assert sb.get_screen_size() == (320, 200)
+
+
+# ─── Batching ────────────────────────────────────────────────────────
+
+class TestBatch:
+    def test_send_many_pipelines_in_order(self, server):
+        sb = Sandbox(server.cfg())
+        cmds = [("move_cursor", {"x": i, "y": i}) for i in range(5)]
+        results = sb.send_many(cmds)
+        assert results == [{"success": True}] * 5
+        assert server.calls == cmds
+        assert server.connections == 1
+        assert sb.pipeline_enabled is True
+
+    def test_batch_context_queues_input(self, server):
+        sb = Sandbox(server.cfg())
+        sb.get_screen_size()  # warm the geometry cache
+        with sb.batch() as b:
+            sb.mouse_move_norm(0.5, 0.5)
+            sb.mouse_down(1)
+            assert len(server.calls) == 1  # nothing sent yet
+        assert [c for c, _ in server.calls[1:]] == ["move_cursor", "mouse_down"]
+        assert len(b.results) == 2
+
+    def test_batch_not_sent_on_error(self, server):
+        sb = Sandbox(server.cfg())
+        with pytest.raises(RuntimeError):
+            with sb.batch():
+                sb.press_key("a")
+                raise RuntimeError("boom")
+        assert server.calls == []
+        sb.press_key("b")  # batching is off again
+        assert server.calls == [("press_key", {"key": "b"})]
+
+    def test_fallback_when_server_closes(self):
+        with StandinServer(keep_alive=False) as srv:
+            sb = Sandbox(srv.cfg())
+            cmds = [("press_key", {"key": k}) for k in "abc"]
+            assert len(sb.send_many(cmds)) == 3
+            assert srv.calls == cmds
+            assert sb.pipeline_enabled is False
+
+
+    def test_no_resend_after_batch_was_written(self):
+        with StandinServer(latency=0.4) as srv:
+            sb = Sandbox(srv.cfg(HTTP_TIMEOUT=0.2))
+            cmds = [("press_key", {"key": k}) for k in "abc"]
+            with pytest.raises(OSError):
+                sb.send_many(cmds)  # read timeout after the requests went out
+            time.sleep(0.6)
+            keys = [p["key"] for _, p in srv.calls]
+            assert keys and keys == ["a", "b", "c"][:len(keys)]  # nothing was sent a second time
+
+
+# ─── Streaming /cmd parser ───────────────────────────────────────────
+
+def _feed_all(body: bytes, chunk: int):
+    p = _CmdStreamParser()
+    for i in range(0, len(body), chunk):
+        p.feed(body[i:i + chunk])
+    return p.close()
+
+
+class TestCmdStreamParser:
+    IMG = base64.b64encode(bytes(range(256)) * 40).decode()
+
+    @pytest.mark.parametrize("chunk", [1, 7, 4096])
+    def test_json_image_decoded_from_buffer(self, chunk):
+        body = json.dumps({"success": True, "image_data": self.IMG, "extra": 1}).encode()
+        res = _feed_all(body, chunk)
+        assert res == {"success": True, "image_bytes": bytes(range(256)) * 40, "extra": 1}
+
+    @pytest.mark.parametrize("chunk", [1, 13, 4096])
+    def test_sse_last_event_wins(self, chunk):
+        ev1 = json.dumps({"progress": 0.5})
+        ev2 = json.dumps({"success": True, "image_data": self.IMG})
+        body = f"event: msg\ndata: {ev1}\n\ndata: {ev2}\r\n\r\n".encode()
+        res = _feed_all(body, chunk)
+        assert res["image_bytes"] == base64.b64decode(self.IMG)
+
+    @pytest.mark.parametrize("text", [
+        '{"success": true, "width": 3, "height": 4}',
+        'data: {"a": 1}\n\ndata: {"a": 2}',
+        'noise before {"success": false} noise after',
+    ])
+    def test_matches_text_parser(self, text):
+        assert _feed_all(text.encode(), 5) == _parse_sse_or_json(text)
+
+    def test_escaped_image_takes_plain_path(self):
+        body = b'{"success": true, "image_data": "ab\\/cd"}'
+        assert _feed_all(body, 4) == {"success": True, "image_data": "ab/cd"}
+
+    def test_empty_raises(self):
+        with pytest.raises(ValueError):
+            _feed_all(b"  \n ", 2)
+
+
+# ─── API readiness ───────────────────────────────────────────────────
+
+def _free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def _ready_cfg(port, **kw):
+    return SimpleNamespace(API_HOST="127.0.0.1", API_PORT=port, HTTP_TIMEOUT=30.0,
+                           API_READY_MIN_INTERVAL=0.02, API_READY_INTERVAL=0.2,
+                           API_PROBE_TIMEOUT=0.2, **kw)
+
+
+class TestWaitApiReady:
+    def test_server_coming_up_late_records_phases(self):
+        port = _free_port()
+        holder = {}
+        timer = threading.Timer(0.3, lambda: holder.setdefault("srv", StandinServer(port=port).start()))
+        timer.start()
+        sb = Sandbox(_ready_cfg(port))
+        try:
+            t0 = time.time()
+            sb._wait_api_ready(timeout=5.0)
+            assert time.time() - t0 < 1.5
+            assert set(sb.ready_phases) == {"port_open", "http", "ready"}
+            assert sb.ready_phases["port_open"] >= 0.25
+        finally:
+            timer.join()
+            holder["srv"].stop()
+            sb.close()
+
+    def test_hung_port_does_not_stall_on_http_timeout(self):
+        hung = socket.socket()
+        hung.bind(("127.0.0.1", 0))
+        hung.listen(16)  # accepts (backlog) but never answers
+        sb = Sandbox(_ready_cfg(hung.getsockname()[1]))
+        try:
+            t0 = time.time()
+            with pytest.raises(TimeoutError):
+                sb._wait_api_ready(timeout=1.0)
+            assert time.time() - t0 < 2.0  # HTTP_TIMEOUT is 30 s
+        finally:
+            hung.close()
+            sb.close()
+
+    def test_missing_status_endpoint_falls_back_to_cmd(self):
+        with StandinServer(status_endpoint=False) as srv:
+            sb = Sandbox(_ready_cfg(srv.port))
+            sb._wait_api_ready(timeout=2.0)
+            assert srv.calls == [("get_screen_size", {})]
+            sb.close()
+
+    def test_exited_container_fails_fast(self):
+        with StandinDockerEngine() as docker:
+            sb = Sandbox(_ready_cfg(_free_port(), DOCKER_HOST=docker.docker_host,
+                                    SANDBOX_NAME="sb_crash", API_STATE_INTERVAL=0.1))
+
+            def crash():
+                docker.containers["sb_crash"]["State"] = {
+                    "Running": False, "Status": "exited", "ExitCode": 137,
+                }
+            threading.Timer(0.2, crash).start()
+            t0 = time.time()
+            with pytest.raises(RuntimeError, match="exited"):
+                sb.start()
+            assert time.time() - t0 < 2.0
+            sb.close()
+
+
+# ─── Screen geometry ─────────────────────────────────────────────────
+
+class TestScreenGeometry:
+    def test_pointer_commands_need_no_size_round_trip(self, server):
+        sb = Sandbox(server.cfg())
+        for i in range(20):
+            sb.mouse_move_norm(i / 20, 0.5)
+        assert [c for c, _ in server.calls].count("get_screen_size") == 1
+
+    def test_frame_dimensions_seed_and_update_geometry(self, server):
+        sb = Sandbox(server.cfg())
+        sb.screenshot()
+        sb.left_click_norm(0.5, 0.5)
+        assert ("get_screen_size", {}) not in server.calls
+        assert server.calls[-1] == ("left_click", {"x": 159, "y": 99})
+
+        server.screen_size = (640, 400)  # resolution change inside the VM
+        server._png = None
+        sb.screenshot()
+        sb.left_click_norm(0.5, 0.5)
+        assert server.calls[-1] == ("left_click", {"x": 319, "y": 199})
+
+    def test_invalidate_requeries(self, server):
+        sb = Sandbox(server.cfg())
+        assert sb.get_screen_size() == (320, 200)
+        server.screen_size = (100, 50)
+        assert sb.get_screen_size() == (320, 200)
+        sb.invalidate_screen_size()
+        assert sb.get_screen_size() == (100, 50)
+
+    def test_start_uses_vnc_resolution(self):
+        with StandinDockerEngine() as docker, StandinServer(screen_size=(64, 48)) as api:
+            sb = Sandbox(api.cfg(DOCKER_HOST=docker.docker_host, SANDBOX_NAME="sb_geo",
+                                 VNC_RESOLUTION="1024x768"))
+            sb.start()
+            api.calls.clear()
+            sb.left_click_norm(0.5, 0.5)
+            assert api.calls == [("left_click", {"x": 511, "y": 383})]
+            sb.close()
+
+    def test_parse_resolution(self):
+        assert _parse_resolution("1920x1080") == (1920, 1080)
+        assert _parse_resolution("bogus") is None
+        assert _parse_resolution("0x10") is None
+
+
+# ─── Region / scaled screenshots ─────────────────────────────────────
+
+def _gradient(w, h):
+    arr = np.zeros((h, w, 3), dtype=np.uint8)
+    arr[..., 0] = np.arange(w, dtype=np.uint8)[None, :]
+    arr[..., 1] = np.arange(h, dtype=np.uint8)[:, None]
+    return Image.fromarray(arr, "RGB")
+
+
+class TestPartialScreenshot:
+    def test_client_side_crop_and_scale(self, server):
+        server.set_screen(_gradient(200, 100))
+        sb = Sandbox(server.cfg())
+        crop = sb.screenshot(region=(10, 20, 50, 40))
+        assert crop.size == (40, 20)
+        assert crop.getpixel((0, 0))[:2] == (10, 20)
+        assert sb.server_crop is False  # server ignored the params; not asked again
+        assert sb.screenshot(max_dim=50).size == (50, 25)
+        shots = [p for c, p in server.calls if c == "screenshot"]
+        assert shots[0] == {"region": {"x": 10, "y": 20, "width": 40, "height": 20}}
+        assert shots[1] == {}
+
+    def test_server_side_crop_and_scale(self):
+        with StandinServer(server_crop=True) as srv:
+            srv.set_screen(_gradient(200, 100))
+            sb = Sandbox(srv.cfg())
+            crop = sb.screenshot(region=(10, 20, 50, 40), max_dim=20)
+            assert crop.size == (20, 10)
+            assert sb.server_crop is True
+            assert sb.screenshot(max_dim=100).size == (100, 50)
+            assert [p for c, p in srv.calls if c == "screenshot"][-1] == {"max_dim": 100}
+
+    def test_rejected_params_fall_back_to_client_crop(self):
+        with StandinServer(server_crop="reject") as srv:
+            srv.set_screen(_gradient(200, 100))
+            sb = Sandbox(srv.cfg())
+            crop = sb.screenshot(region=(10, 20, 50, 40), max_dim=20)
+            assert crop.size == (20, 10)
+            assert sb.server_crop is False
+            assert sb.screenshot(region=(0, 0, 100, 50)).size == (100, 50)
+            shots = [p for c, p in srv.calls if c == "screenshot"]
+            # rejected once, retried bare; later calls go straight to the full frame
+            assert shots == [{"region": {"x": 10, "y": 20, "width": 40, "height": 20}, "max_dim": 20}, {}, {}]
+
+    def test_region_is_clipped_to_screen(self, server):
+        sb = Sandbox(server.cfg())
+        assert sb.screenshot(region=(300, 150, 400, 400)).size == (20, 50)
+        with pytest.raises(ValueError):
+            sb.screenshot(region=(500, 500, 600, 600))
+
+    def test_full_frame_unchanged(self, server):
+        sb = Sandbox(server.cfg(SCREENSHOT_SERVER_CROP=False))
+        assert sb.screenshot().size == (320, 200)
+        assert sb.screenshot(max_dim=1000).size == (320, 200)
+        assert all(p == {} for c, p in server.calls if c == "screenshot")
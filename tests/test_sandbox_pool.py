@@ -0,0 +1,140 @@
+# tests/test_sandbox_pool.py — Warm sandbox pool: slot allocation, instant hand-out, recycling
+import time
+import pytest
+import sys
+import os
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.sandbox_pool import SandboxPool
+
+
+class FakeSandbox:
+    """Stands in for Sandbox: start() takes `boot` seconds (docker run + API readiness)."""
+
+    instances = []
+
+    def __init__(self, cfg, boot=0.3):
+        self.cfg = cfg
+        self.container_name = cfg.SANDBOX_NAME
+        self.boot = boot
+        self.started = False
+        self.stopped = False
+        self.closed = False
+        FakeSandbox.instances.append(self)
+
+    def start(self):
+        time.sleep(self.boot)
+        self.started = True
+
+    def stop(self):
+        self.stopped = True
+
+    def close(self):
+        self.closed = True
+
+
+def _cfg(**kw):
+    ns = SimpleNamespace(POOL_SIZE=2, POOL_NAME_PREFIX="t", POOL_PORT_BASE=30000, POOL_RECYCLE="replace",
+                         POOL_RETRY_DELAY=0.01)
+    for k, v in kw.items():
+        setattr(ns, k, v)
+    return ns
+
+
+def _wait_for(pred, timeout=3.0):
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        if pred():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture(autouse=True)
+def _reset_instances():
+    FakeSandbox.instances = []
+
+
+class TestSandboxPool:
+    def test_slot_cfg_unique_names_and_ports(self):
+        pool = SandboxPool(_cfg(), sandbox_factory=FakeSandbox)
+        a, b = pool.slot_cfg(0), pool.slot_cfg(1)
+        assert (a.SANDBOX_NAME, b.SANDBOX_NAME) == ("t_0", "t_1")
+        ports = {a.API_PORT, a.VNC_PORT, a.NOVNC_PORT, b.API_PORT, b.VNC_PORT, b.NOVNC_PORT}
+        assert len(ports) == 6
+        assert pool.cfg.__dict__.get("SANDBOX_NAME") is None  # base cfg untouched
+
+    def test_acquire_is_instant_once_warm(self):
+        with SandboxPool(_cfg(), sandbox_factory=FakeSandbox) as pool:
+            assert _wait_for(lambda: pool.ready_count() == 2)
+            t0 = time.time()
+            sb = pool.acquire(timeout=1)
+            assert time.time() - t0 < 0.05
+            assert sb.started
+            pool.release(sb, recycle="reuse")
+
+    def test_replace_boots_fresh_container_in_same_slot(self):
+        with SandboxPool(_cfg(POOL_SIZE=1), sandbox_factory=lambda c: FakeSandbox(c, boot=0.05)) as pool:
+            sb = pool.acquire(timeout=2)
+            pool.release(sb)
+            sb2 = pool.acquire(timeout=2)
+            assert sb2 is not sb
+            assert sb.stopped and sb.closed
+            assert sb2.container_name == sb.container_name
+            pool.release(sb2, recycle="reuse")
+
+    def test_reuse_returns_same_sandbox(self):
+        with SandboxPool(_cfg(POOL_SIZE=1), sandbox_factory=lambda c: FakeSandbox(c, boot=0.0)) as pool:
+            with pool.lease(timeout=2, recycle="reuse") as sb:
+                pass
+            with pool.lease(timeout=2, recycle="reuse") as sb2:
+                assert sb2 is sb
+
+    def test_failed_start_is_retried(self):
+        attempts = []
+
+        def factory(c):
+            sb = FakeSandbox(c, boot=0.0)
+            if not attempts:
+                sb.start = lambda: (_ for _ in ()).throw(RuntimeError("docker down"))
+            attempts.append(sb)
+            return sb
+
+        with SandboxPool(_cfg(POOL_SIZE=1), sandbox_factory=factory) as pool:
+            sb = pool.acquire(timeout=2)
+            assert len(attempts) == 2 and sb is attempts[1]
+            assert attempts[0].stopped
+            pool.release(sb, recycle="reuse")
+
+    def test_acquire_timeout_and_foreign_release(self):
+        with SandboxPool(_cfg(POOL_SIZE=1), sandbox_factory=lambda c: FakeSandbox(c, boot=1.0)) as pool:
+            with pytest.raises(TimeoutError):
+                pool.acquire(timeout=0.05)
+            with pytest.raises(ValueError):
+                pool.release(FakeSandbox(_cfg(SANDBOX_NAME="x")))
+
+    def test_close_stops_idle_and_leased(self):
+        pool = SandboxPool(_cfg(), sandbox_factory=lambda c: FakeSandbox(c, boot=0.0)).start()
+        leased = pool.acquire(timeout=2)
+        assert _wait_for(lambda: pool.ready_count() == 1)
+        pool.close()
+        assert all(sb.stopped for sb in FakeSandbox.instances)
+        assert leased.stopped
+
+    def test_reset_policy_restores_baseline(self):
+        class ResettableSandbox(FakeSandbox):
+            def capture_baseline(self):
+                return "baseline-" + self.container_name
+
+            def reset(self, baseline):
+                self.reset_to = baseline
+
+        with SandboxPool(_cfg(POOL_SIZE=1, POOL_RECYCLE="reset"),
+                         sandbox_factory=lambda c: ResettableSandbox(c, boot=0.0)) as pool:
+            sb = pool.acquire(timeout=2)
+            pool.release(sb)
+            assert pool.acquire(timeout=2) is sb
+            assert sb.reset_to == "baseline-t_0"
+            assert not sb.stopped
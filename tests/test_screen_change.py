@@ -0,0 +1,283 @@
+# tests/test_screen_change.py — Thumbnail diffs and wait_for_screen_stable against the stand-in server
+import threading
+import time
+import numpy as np
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image
+
+from src.config import cfg
+from src.frame import Frame
+from src.frame_broker import FrameBroker
+from src.sandbox import Sandbox
+from src.vision import capture_screen
+from src.screen_change import (
+    busy_region, change_fraction, cheap_sampling, frame_thumb, grab_thumb, reuse_frame, stamp_frame,
+    wait_for_screen_stable, wait_until_idle,
+)
+from tests.standin_server import StandinServer
+
+
+class Flicker:
+    """Repaints the stand-in screen with a new colour every `period` s for `duration` s."""
+
+    def __init__(self, srv, duration, period=0.04):
+        self.srv, self.duration, self.period = srv, duration, period
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        t0, c = time.time(), 0
+        while time.time() - t0 < self.duration:
+            c = (c + 97) % 256
+            self.srv.set_screen(Image.new("RGB", (320, 200), (c, c, c)))
+            time.sleep(self.period)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.thread.join()
+
+
+class RawSandbox:
+    """Sandbox stand-in with a raw-pixel backend: frames come from a FrameBroker."""
+
+    capture = None
+
+    def __init__(self, arr):
+        self.arr = arr
+        self.frames = FrameBroker(lambda: Frame(array=self.arr.copy()))
+
+
+class Spinner:
+    """Rotates a 24x24 'spinner' on a RawSandbox screen every `period` s for `duration` s."""
+
+    def __init__(self, sb, duration, period=0.03):
+        self.sb, self.duration, self.period = sb, duration, period
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        t0, i = time.time(), 0
+        base = self.sb.arr.copy()
+        while time.time() - t0 < self.duration:
+            arr = base.copy()
+            spin = np.zeros((24, 24, 3), np.uint8)
+            q = i % 4
+            spin[(q // 2) * 12:(q // 2) * 12 + 12, (q % 2) * 12:(q % 2) * 12 + 12] = 255
+            arr[100:124, 150:174] = spin
+            self.sb.arr = arr
+            i += 1
+            time.sleep(self.period)
+        self.sb.arr = base
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.thread.join()
+
+
+# ─── Diffs ───────────────────────────────────────────────────────────
+
+class TestChangeFraction:
+    def test_identical_and_noise(self):
+        a = np.full((10, 10), 100, dtype=np.uint8)
+        assert change_fraction(a, a) == 0.0
+        assert change_fraction(a, a + 10) == 0.0  # below CHANGE_PIXEL_DELTA: noise
+        b = a.copy()
+        b[:2] = 200
+        assert change_fraction(a, b) == pytest.approx(0.2)
+
+    def test_shape_change_is_full_change(self):
+        assert change_fraction(np.zeros((4, 4), np.uint8), np.zeros((4, 5), np.uint8)) == 1.0
+
+    def test_frame_thumb_small_and_memoized(self):
+        f = Frame(array=np.zeros((1080, 1920, 3), dtype=np.uint8))
+        t = frame_thumb(f, 160)
+        assert max(t.shape) <= 160 and t.dtype == np.uint8
+        assert frame_thumb(f, 160) is t
+
+
+# ─── wait_for_screen_stable ──────────────────────────────────────────
+
+class TestWaitForScreenStable:
+    def test_static_screen_returns_fast(self):
+        with StandinServer(screen_size=(320, 200)) as srv:
+            sb = Sandbox(srv.cfg())
+            since = time.time()
+            waited = wait_for_screen_stable(sb, timeout=3.0, interval=0.05, stable_samples=2)
+            assert waited < 0.5
+            shots = lambda: sum(1 for c, _ in srv.calls if c == "screenshot")
+            assert shots() == 3  # two calm diffs
+            capture_screen(sb, newer_than=since)
+            assert shots() == 3  # the capture after the wait is its last sample
+            sb.close()
+
+    def test_needs_two_fresh_samples(self):
+        sb = RawSandbox(np.zeros((200, 320, 3), dtype=np.uint8))
+        wait_for_screen_stable(sb, timeout=2.0, interval=0.02, stable_samples=1)
+        assert sb.frames.captures == 2
+        wait_for_screen_stable(sb, timeout=2.0, interval=0.02, stable_samples=1)
+        assert sb.frames.captures == 4  # nothing carried over from the previous wait
+
+    def test_fixed_sleep_leaves_a_fresh_frame(self, monkeypatch):
+        monkeypatch.setattr(cfg, "WAIT_FOR_STABLE_SCREEN", False)
+        monkeypatch.setattr(cfg, "WAIT_BEFORE_SCREENSHOT_SEC", 0.05)
+        sb = RawSandbox(np.full((200, 320, 3), 128, np.uint8))
+        since = time.time()
+        sb.frames.get()  # e.g. a GUI refresh just as the wait begins
+        sb.arr = np.zeros((200, 320, 3), np.uint8)
+        wait_for_screen_stable(sb)
+        sb.arr = np.full((200, 320, 3), 255, np.uint8)
+        # neither the GUI frame nor a new capture: the sample taken after the sleep
+        assert capture_screen(sb, newer_than=since).array.max() == 0
+        assert sb.frames.captures == 2
+
+    def test_waits_for_animation_to_end(self):
+        with StandinServer(screen_size=(320, 200)) as srv:
+            sb = Sandbox(srv.cfg())
+            with Flicker(srv, duration=0.5):
+                waited = wait_for_screen_stable(sb, timeout=3.0, interval=0.05, stable_samples=2)
+            assert 0.4 <= waited < 2.0
+            sb.close()
+
+    def test_timeout_caps_the_wait(self):
+        with StandinServer(screen_size=(320, 200)) as srv:
+            sb = Sandbox(srv.cfg())
+            with Flicker(srv, duration=0.6, period=0.01):
+                waited = wait_for_screen_stable(sb, timeout=0.3, interval=0.05)
+            assert 0.3 <= waited < 0.6
+            sb.close()
+
+    def test_raw_backend_uses_frame_broker(self):
+        sb = RawSandbox(np.zeros((200, 320, 3), dtype=np.uint8))
+        assert grab_thumb(sb).shape == (100, 160)
+        assert wait_for_screen_stable(sb, timeout=2.0, interval=0.02) < 0.5
+        assert sb.frames.captures >= 3
+
+    def test_disabled_is_fixed_sleep(self, monkeypatch):
+        monkeypatch.setattr(cfg, "WAIT_FOR_STABLE_SCREEN", False)
+        monkeypatch.setattr(cfg, "WAIT_BEFORE_SCREENSHOT_SEC", 0.15)
+        assert 0.15 <= wait_for_screen_stable(object()) < 0.4
+
+    def test_sampling_error_falls_back_to_fixed_sleep(self, monkeypatch, capsys):
+        monkeypatch.setattr(cfg, "WAIT_BEFORE_SCREENSHOT_SEC", 0.15)
+
+        class Broken:
+            def screenshot(self, **kw):
+                raise ConnectionError("down")
+
+        assert 0.15 <= wait_for_screen_stable(Broken()) < 0.4
+        assert "fixed" in capsys.readouterr().out
+
+
+# ─── Frame reuse ─────────────────────────────────────────────────────
+
+class TestFrameReuse:
+    def test_unchanged_screen_reuses_frame(self):
+        sb = RawSandbox(np.zeros((200, 320, 3), dtype=np.uint8))
+        shot = Frame(array=np.zeros((100, 160, 3), dtype=np.uint8))
+        stamped = stamp_frame(sb, shot)
+        assert reuse_frame(sb, stamped) is shot
+
+    def test_changed_screen_is_not_reused(self):
+        sb = RawSandbox(np.zeros((200, 320, 3), dtype=np.uint8))
+        stamped = stamp_frame(sb, Frame(array=np.zeros((100, 160, 3), dtype=np.uint8)))
+        sb.arr = sb.arr.copy()
+        sb.arr[50:60, 50:60] = 255
+        assert reuse_frame(sb, stamped) is None
+
+    def test_old_frame_is_not_reused(self):
+        sb = RawSandbox(np.zeros((200, 320, 3), dtype=np.uint8))
+        stamped = stamp_frame(sb, Frame(array=np.zeros((100, 160, 3), dtype=np.uint8)), ts=time.time() - 60)
+        assert reuse_frame(sb, stamped, max_age=15.0) is None
+        assert reuse_frame(sb, None) is None
+
+    def test_disabled_or_broken_sampling(self, monkeypatch):
+        class Broken:
+            def screenshot(self, **kw):
+                raise ConnectionError("down")
+
+        shot = Frame(array=np.zeros((100, 160, 3), dtype=np.uint8))
+        assert stamp_frame(Broken(), shot) is None
+        stamped = stamp_frame(Broken(), shot, thumb=np.zeros((10, 10), np.uint8))
+        assert reuse_frame(Broken(), stamped) is None
+        monkeypatch.setattr(cfg, "REUSE_FRAMES", False)
+        assert stamp_frame(RawSandbox(np.zeros((20, 20, 3), np.uint8)), shot) is None
+
+
+# ─── Loading detection ───────────────────────────────────────────────
+
+class TestLoadingDetection:
+    def test_busy_region_finds_moving_pixels(self):
+        still = [np.full((50, 80), 90, np.uint8) for _ in range(4)]
+        assert busy_region(still) is None
+        moving = [t.copy() for t in still]
+        for i, t in enumerate(moving):
+            t[10:14, 20:24] = 255 if i % 2 else 0
+        assert busy_region(moving) == (20, 10, 24, 14)
+        caret = [t.copy() for t in still]
+        caret[1][30, 40] = 255
+        assert busy_region(caret) is None  # one pixel: below LOADING_MIN_PIXELS
+
+    def test_spinner_passes_settle_but_not_idle_wait(self):
+        sb = RawSandbox(np.full((200, 320, 3), 60, np.uint8))
+        with Spinner(sb, duration=0.6):
+            time.sleep(0.05)
+            assert wait_for_screen_stable(sb, timeout=2.0, interval=0.03) < 0.4  # < CHANGE_THRESHOLD
+            idle = wait_until_idle(sb, timeout=3.0, interval=0.03)
+        assert idle.idle and idle.was_busy and idle.calls_saved == 2
+        assert idle.waited >= 0.2
+
+    def test_gives_up_while_still_busy(self):
+        sb = RawSandbox(np.full((200, 320, 3), 60, np.uint8))
+        with Spinner(sb, duration=1.0):
+            time.sleep(0.05)
+            idle = wait_until_idle(sb, timeout=0.4, interval=0.03)
+        assert not idle.idle and idle.calls_saved == 0 and idle.region is not None
+        l, t, r, b = idle.busy_box()
+        assert l <= 150 / 320 < r and t <= 100 / 200 < b  # the spinner at (150, 100)
+
+    def test_static_screen_and_switch(self, monkeypatch):
+        sb = RawSandbox(np.full((200, 320, 3), 60, np.uint8))
+        idle = wait_until_idle(sb, timeout=2.0, interval=0.02)
+        assert idle.idle and not idle.was_busy and idle.waited < 0.3 and idle.calls_saved == 0
+        monkeypatch.setattr(cfg, "WAIT_FOR_IDLE", False)
+        monkeypatch.setattr(cfg, "WAIT_BEFORE_SCREENSHOT_SEC", 0.05)
+        assert wait_until_idle(object()).idle
+
+    def test_post_action_wait_costs_no_more_than_settle(self):
+        from src.actions import ActionResult, had_no_effect
+        sb = RawSandbox(np.full((200, 320, 3), 60, np.uint8))
+        before = grab_thumb(sb, cfg.ACTION_CHANGE_DIM)
+        res = ActionResult("CLICK", changed=False, before=before)
+        start = sb.frames.captures
+        wait_for_screen_stable(sb, timeout=2.0, interval=0.02)  # old flow: settle, then the idle wait
+        settle = sb.frames.captures - start
+
+        start = sb.frames.captures
+        since = time.time()
+        assert wait_until_idle(sb, timeout=2.0, interval=0.02).idle
+        assert had_no_effect(sb, res, since)
+        capture_screen(sb, newer_than=since)
+        # the idle window is the settle wait; the no-effect check and the capture reuse its last sample
+        assert sb.frames.captures - start == cfg.LOADING_WINDOW
+        assert sb.frames.captures - start <= settle + cfg.LOADING_WINDOW
+
+    def test_http_sampling_interval_is_not_the_raw_one(self, monkeypatch):
+        monkeypatch.setattr(cfg, "LOADING_INTERVAL", 0.01)
+        monkeypatch.setattr(cfg, "WAIT_CHANGE_INTERVAL", 0.1)
+        assert cheap_sampling(RawSandbox(np.zeros((20, 20, 3), np.uint8)))
+        with StandinServer(screen_size=(320, 200)) as srv:
+            sb = Sandbox(srv.cfg())
+            assert not cheap_sampling(sb)
+            idle = wait_until_idle(sb, timeout=2.0, window=3)
+            assert idle.idle and idle.waited >= 0.2  # two gaps of WAIT_CHANGE_INTERVAL
+            assert sum(1 for c, _ in srv.calls if c == "screenshot") == 3
+            sb.close()
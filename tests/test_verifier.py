@@ -1,12 +1,20 @@
 # tests/test_verifier.py — Unit tests for VerifierResult data model and validation
+import base64
 import json
 import pytest
 import sys
 import os
+from io import BytesIO
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from src.verifier import VerifierResult, validate_verifier_json, _parse_verifier_output
+from PIL import Image, ImageDraw
+
+from src.config import cfg
+from src.frame import Frame
+from src.planner import PlanStep
+from src.vision import image_tokens
+from src.verifier import VerifierResult, validate_verifier_json, verify_step, _parse_verifier_output
 
 
 # ─── Sample valid verifier data ──────────────────────────────────────
@@ -123,3 +131,71 @@ class TestParseVerifierOutput:
         assert vr.done is False
         assert vr.failure_type == "OTHER"
         assert vr.confidence == 0.1
+
+
+# ─── verify_step payload ─────────────────────────────────────────────
+
+class RecordingLLM:
+    """Captures the chat request and answers with a fixed verdict."""
+
+    def __init__(self):
+        self.messages = None
+
+    def create_chat_completion(self, messages, **kw):
+        self.messages = messages
+        return {"choices": [{"message": {"content": json.dumps(VALID_DONE)}}]}
+
+
+def _decode_uri(uri):
+    return Image.open(BytesIO(base64.b64decode(uri.split(",", 1)[1])))
+
+
+def _screens():
+    before = Image.new("RGB", (640, 360), (40, 90, 160))
+    after = before.copy()
+    ImageDraw.Draw(after).rectangle((260, 140, 380, 200), fill=(240, 240, 240))
+    return Frame(image=before), Frame(image=after)
+
+
+class TestVerifyStepPayload:
+    STEP = PlanStep(id="S1", title="Open dialog", success_criteria=["dialog visible"])
+
+    def _images(self, llm):
+        return [c for c in llm.messages[1]["content"] if c["type"] == "image_url"]
+
+    def test_full_frame_without_before(self):
+        llm = RecordingLLM()
+        _, after = _screens()
+        assert verify_step(llm, self.STEP, after).done
+        assert len(self._images(llm)) == 1
+
+    def test_one_close_up_with_before_and_source(self, monkeypatch):
+        monkeypatch.setattr(cfg, "VERIFIER_CROP", True)
+        llm = RecordingLLM()
+        before, after = _screens()
+        assert verify_step(llm, self.STEP, after, before=before, source=after).done
+        assert len(self._images(llm)) == 1
+        assert "close-up" in llm.messages[1]["content"][-1]["text"]
+
+    def test_busy_region_is_named_in_the_prompt(self):
+        llm = RecordingLLM()
+        _, after = _screens()
+        verify_step(llm, self.STEP, after, busy=(0.5, 0.0, 0.75, 0.25))
+        assert "(0.5, 0.0) to (0.75, 0.25)" in llm.messages[1]["content"][-1]["text"]
+
+    def test_crop_is_off_by_default(self):
+        llm = RecordingLLM()
+        before, after = _screens()
+        verify_step(llm, self.STEP, after, before=before, source=after)
+        assert "close-up" not in llm.messages[1]["content"][-1]["text"]
+
+    @pytest.mark.parametrize("crop", [False, True])
+    def test_request_fits_the_context(self, monkeypatch, crop):
+        monkeypatch.setattr(cfg, "VERIFIER_CROP", crop)
+        llm = RecordingLLM()
+        before, after = _screens()
+        verify_step(llm, self.STEP, after, before=before, source=after)
+        text = llm.messages[0]["content"] + llm.messages[1]["content"][-1]["text"]
+        images = [_decode_uri(c["image_url"]["url"]) for c in self._images(llm)]
+        used = sum(image_tokens(img.size) for img in images) + len(text) // 3 + 300
+        assert len(images) == 1 and used <= cfg.N_CTX
@@ -0,0 +1,256 @@
+# tests/test_vision.py — In-memory screenshot -> VLM payload and background persistence
+import base64
+import os
+import sys
+import time
+from io import BytesIO
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image, ImageDraw
+
+from src import vision
+from src.config import cfg
+from src.frame import Frame
+from src.frame_broker import FrameBroker
+from src.sandbox import Sandbox
+from src.vision import (
+    capture_screen,
+    change_focus,
+    draw_preview,
+    encode_frame,
+    encode_png,
+    export_previews,
+    flush_previews,
+    flush_saved_frames,
+    frame_to_data_uri,
+    image_tokens,
+    save_frame_async,
+    source_frame,
+    to_data_uri,
+    vlm_frame,
+)
+from tests.standin_server import StandinServer
+
+
+def _decode_uri(uri):
+    head, b64 = uri.split(",", 1)
+    assert head == "data:image/png;base64"
+    return Image.open(BytesIO(base64.b64decode(b64)))
+
+
+# ─── Payload memoization ─────────────────────────────────────────────
+
+class TestPayload:
+    def test_encoded_once_per_frame(self, monkeypatch):
+        calls = []
+        real = vision.base64.b64encode
+        monkeypatch.setattr(vision.base64, "b64encode", lambda b: calls.append(1) or real(b))
+        f = Frame(image=Image.new("RGB", (20, 10), (1, 2, 3)))
+        uri = to_data_uri(f)
+        assert to_data_uri(f) is uri
+        assert len(calls) == 1
+        assert _decode_uri(uri).getpixel((5, 5)) == (1, 2, 3)
+
+    @pytest.mark.parametrize("fmt, mime", [("JPEG", "image/jpeg"), ("jpg", "image/jpeg"), ("WEBP", "image/webp")])
+    def test_lossy_formats(self, fmt, mime):
+        f = Frame(image=Image.new("RGB", (32, 24), (200, 40, 40)))
+        uri = frame_to_data_uri(f, fmt=fmt, quality=80, subsampling="4:2:0")
+        head, b64 = uri.split(",", 1)
+        assert head == f"data:{mime};base64"
+        px = Image.open(BytesIO(base64.b64decode(b64))).convert("RGB").getpixel((10, 10))
+        assert all(abs(a - b) <= 8 for a, b in zip(px, (200, 40, 40)))
+
+    def test_settings_memoized_separately(self):
+        f = Frame(image=Image.new("RGB", (32, 24)))
+        hi = encode_frame(f, "JPEG", quality=95)
+        lo = encode_frame(f, "JPEG", quality=20)
+        assert hi is not lo
+        assert encode_frame(f, "JPEG", quality=95) is hi
+        with pytest.raises(ValueError):
+            encode_frame(f, "BMP")
+
+    def test_config_selects_format(self, monkeypatch):
+        monkeypatch.setattr(cfg, "VLM_IMAGE_FORMAT", "WEBP")
+        assert to_data_uri(Frame(image=Image.new("RGB", (8, 8)))).startswith("data:image/webp;base64,")
+
+    def test_path_and_image_inputs(self, tmp_path):
+        img = Image.new("RGB", (8, 8), (9, 9, 9))
+        p = tmp_path / "s.png"
+        img.save(p)
+        assert to_data_uri(str(p)).startswith("data:image/png;base64,")
+        assert _decode_uri(to_data_uri(img)).size == (8, 8)
+
+    def test_vlm_frame_resized_once(self):
+        f = Frame(image=Image.new("RGB", (1280, 720)))
+        small = vlm_frame(f, 640)
+        assert small.size == (640, 360)
+        assert vlm_frame(f, 640) is small
+
+
+# ─── capture_screen ──────────────────────────────────────────────────
+
+class TestCaptureScreen:
+    def test_returns_frame_without_touching_disk(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(cfg, "SAVE_SCREENSHOTS", False)
+        with StandinServer(screen_size=(1280, 800)) as srv:
+            sb = Sandbox(srv.cfg())
+            shot = capture_screen(sb, str(tmp_path / "screen.png"))
+            assert isinstance(shot, Frame)
+            assert shot.size == (cfg.MAX_DIM, cfg.MAX_DIM * 800 // 1280)
+            flush_saved_frames(2.0)
+            assert not (tmp_path / "screen.png").exists()
+            sb.close()
+
+    def test_saved_in_background_with_same_bytes(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(cfg, "SAVE_SCREENSHOTS", True)
+        path = tmp_path / "sub" / "screen.png"
+        with StandinServer(screen_size=(320, 200)) as srv:
+            sb = Sandbox(srv.cfg())
+            shot = capture_screen(sb, str(path))
+            assert flush_saved_frames(5.0)
+            assert path.read_bytes() == encode_png(shot)
+            assert [p.name for p in path.parent.iterdir()] == ["screen.png"]  # no temp files left
+            sb.close()
+
+    def test_draw_preview_accepts_frames(self, tmp_path):
+        out = tmp_path / "p.png"
+        draw_preview(Frame(image=Image.new("RGB", (50, 40))), 0.5, 0.5, str(out))
+        assert flush_previews(5.0)
+        assert Image.open(out).getpixel((24, 19)) == (255, 0, 0)
+
+
+# ─── Background writer ───────────────────────────────────────────────
+
+class TestWriter:
+    def test_latest_frame_per_path_wins(self, tmp_path):
+        path = str(tmp_path / "s.png")
+        for c in range(5):
+            save_frame_async(Frame(image=Image.new("RGB", (4, 4), (c, c, c))), path)
+        assert flush_saved_frames(5.0)
+        assert Image.open(path).getpixel((0, 0)) == (4, 4, 4)
+
+    def test_write_errors_are_reported_not_raised(self, tmp_path, capsys):
+        blocker = tmp_path / "file"
+        blocker.write_text("x")
+        save_frame_async(Frame(image=Image.new("RGB", (4, 4))), str(blocker / "s.png"))
+        assert flush_saved_frames(5.0)
+        assert "could not save" in capsys.readouterr().out
+
+
+# ─── Click previews ──────────────────────────────────────────────────
+
+@pytest.fixture
+def previews(monkeypatch):
+    """A fresh preview writer (the module one keeps state across tests)."""
+    w = vision._PreviewWriter()
+    monkeypatch.setattr(vision, "_previews", w)
+    return w
+
+
+class TestPreviews:
+    def test_submit_never_waits_for_the_encoder(self, tmp_path, monkeypatch, previews):
+        real = vision.encode_png
+        monkeypatch.setattr(vision, "encode_png", lambda f: (time.sleep(0.1), real(f))[1])
+        monkeypatch.setattr(cfg, "PREVIEW_QUEUE_SIZE", 2)
+        frame = Frame(image=Image.new("RGB", (64, 48)))
+        t0 = time.perf_counter()
+        for i in range(10):
+            draw_preview(frame, 0.5, 0.5, str(tmp_path / f"p{i}.png"))
+        assert time.perf_counter() - t0 < 0.1
+        assert flush_previews(5.0)
+        assert previews.dropped > 0 and (tmp_path / "p9.png").exists()  # newest always kept
+
+    def test_disabled_writes_nothing(self, tmp_path, monkeypatch, previews):
+        monkeypatch.setattr(cfg, "PREVIEW_ENABLED", False)
+        draw_preview(Frame(image=Image.new("RGB", (50, 40))), 0.5, 0.5, str(tmp_path / "p.png"))
+        assert flush_previews(5.0)
+        assert not list(tmp_path.iterdir())
+
+    def test_contact_sheet_and_animation(self, tmp_path, monkeypatch, previews):
+        frame = Frame(image=Image.new("RGB", (640, 360), (40, 90, 160)))
+        monkeypatch.setattr(cfg, "PREVIEW_SHEET_PATH", "")
+        draw_preview(frame, 0.5, 0.5, str(tmp_path / "off.png"))
+        assert export_previews(str(tmp_path / "none.png")) == 0  # nothing kept while off
+
+        monkeypatch.setattr(cfg, "PREVIEW_SHEET_PATH", str(tmp_path / "sheet.png"))
+        monkeypatch.setattr(cfg, "PREVIEW_SHEET_DIM", 160)
+        for i in range(3):
+            draw_preview(frame, 0.2 * (i + 1), 0.5, str(tmp_path / f"p{i}.png"))
+        assert export_previews() == 3
+        sheet = Image.open(tmp_path / "sheet.png")
+        assert sheet.size == (2 * 160, 2 * (90 + 14))  # 2x2 grid, label strip under each
+        assert sheet.getpixel((int(0.2 * 159), 45)) == (255, 0, 0)
+        assert export_previews() == 0  # taken
+
+        for i in range(3):
+            draw_preview(frame, 0.2 * (i + 1), 0.5, str(tmp_path / f"q{i}.png"))
+        assert export_previews(str(tmp_path / "clicks.gif")) == 3
+        assert Image.open(tmp_path / "clicks.gif").n_frames == 3
+
+    def test_sheet_keeps_only_the_newest(self, tmp_path, monkeypatch, previews):
+        frame = Frame(image=Image.new("RGB", (64, 36)))
+        monkeypatch.setattr(cfg, "PREVIEW_SHEET_PATH", str(tmp_path / "sheet.png"))
+        monkeypatch.setattr(cfg, "PREVIEW_SHEET_MAX", 4)
+        for i in range(10):  # an entry point that never exported
+            draw_preview(frame, 0.5, 0.5, str(tmp_path / f"p{i}.png"))
+        assert flush_previews(5.0)
+        assert [name for name, _ in vision._previews.take_sheet()] == [f"p{i}.png" for i in range(6, 10)]
+
+
+# ─── Verifier focus crop ─────────────────────────────────────────────
+
+def _desktop(dialog=None, size=(640, 360)):
+    img = Image.new("RGB", size, (40, 90, 160))
+    d = ImageDraw.Draw(img)
+    d.rectangle((0, size[1] - 24, size[0], size[1]), fill=(30, 30, 40))
+    if dialog:
+        d.rectangle(dialog, fill=(240, 240, 240), outline=(0, 0, 0))
+        d.text((dialog[0] + 8, dialog[1] + 8), "Save changes?", fill=(0, 0, 0))
+    return Frame(image=img)
+
+
+class TestChangeFocus:
+    @pytest.fixture(autouse=True)
+    def _crop_on(self, monkeypatch):
+        monkeypatch.setattr(cfg, "VERIFIER_CROP", True)
+
+    def test_crop_comes_from_the_full_resolution_frame(self):
+        before = vlm_frame(_desktop(size=(1920, 1080)))
+        source = _desktop(dialog=(780, 420, 1140, 600), size=(1920, 1080))
+        after = vlm_frame(source)
+        crop = change_focus(before, after, source, max_tokens=4096)
+        l, t = (260 - 60) * 3, (140 - 60) * 3  # grown by half the change size on each side
+        assert crop.size[0] > after.size[0] / 2  # 3x the detail of the 640 px VLM view
+        assert (crop.array == source.array[t:t + crop.size[1], l:l + crop.size[0]]).all()
+
+    def test_crop_is_scaled_to_the_token_budget(self):
+        before = vlm_frame(_desktop(size=(1920, 1080)))
+        source = _desktop(dialog=(780, 420, 1140, 600), size=(1920, 1080))
+        crop = change_focus(before, vlm_frame(source), source, max_tokens=cfg.IMAGE_MIN_TOKENS)
+        assert image_tokens(crop.size) <= cfg.IMAGE_MIN_TOKENS
+        assert change_focus(before, vlm_frame(source), source, max_tokens=cfg.IMAGE_MIN_TOKENS - 1) is None
+
+    def test_full_frame_when_nothing_large_or_diffuse(self, monkeypatch):
+        before = _desktop()
+        focus = lambda after, source=None: change_focus(before, after, source or after, 4096)
+        assert focus(_desktop()) is None
+        assert focus(_desktop(dialog=(40, 40, 600, 300))) is None
+        spread = Image.new("RGB", (640, 360), (40, 90, 160))
+        ImageDraw.Draw(spread).rectangle((0, 0, 8, 8), fill="white")
+        ImageDraw.Draw(spread).rectangle((630, 320, 639, 359), fill="white")
+        assert focus(Frame(image=spread)) is None  # two far-apart specks
+        assert focus(_desktop(dialog=(260, 140, 380, 200), size=(800, 450))) is None
+        assert change_focus(before, _desktop(dialog=(260, 140, 380, 200)), None, 4096) is None
+        monkeypatch.setattr(cfg, "VERIFIER_CROP", False)
+        assert focus(_desktop(dialog=(260, 140, 380, 200))) is None
+
+    def test_source_frame_is_the_captured_one(self):
+        source = _desktop(size=(1280, 720))
+        sb = type("Sb", (), {"frames": FrameBroker(lambda: source)})()
+        shot = capture_screen(sb)
+        assert source_frame(sb, shot) is source
+        assert source_frame(sb, _desktop()) is None
+        assert source_frame(object(), shot) is None
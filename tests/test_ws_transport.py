@@ -0,0 +1,158 @@
+# tests/test_ws_transport.py — WebSocket command transport against the stand-in server
+import threading
+import time
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.sandbox import Sandbox
+from src.ws_transport import (
+    WebSocketTransport,
+    WebSocketUnsupported,
+    _FrameReader,
+    _encode_frame,
+    _mask,
+)
+from tests.standin_server import StandinServer
+
+
+class SlowScreenshotServer(StandinServer):
+    """Screenshots take 0.3 s; everything else answers immediately."""
+
+    def handle_cmd(self, command, params):
+        if command == "screenshot":
+            time.sleep(0.3)
+        return super().handle_cmd(command, params)
+
+
+class _BytesSock:
+    def __init__(self, data):
+        self.data = data
+
+    def recv(self, n):
+        out, self.data = self.data[:n], self.data[n:]
+        return out
+
+
+# ─── Framing ─────────────────────────────────────────────────────────
+
+class TestFraming:
+    def test_rfc6455_masked_hello(self):
+        # RFC 6455 5.7: masked "Hello" with key 37 fa 21 3d
+        key = bytes.fromhex("37fa213d")
+        assert _mask(b"Hello", key) == bytes.fromhex("7f9f4d5158")
+        frame = bytes.fromhex("818537fa213d7f9f4d5158")
+        assert _FrameReader(_BytesSock(frame)).read_frame() == (True, 0x1, b"Hello")
+
+    @pytest.mark.parametrize("n", [0, 125, 126, 65535, 65536])
+    def test_round_trip_lengths(self, n):
+        payload = bytes(range(256)) * (n // 256) + bytes(n % 256)
+        for mask in (True, False):
+            frame = _encode_frame(0x2, payload, mask=mask)
+            assert _FrameReader(_BytesSock(frame)).read_frame() == (True, 0x2, payload)
+
+
+# ─── Transport ───────────────────────────────────────────────────────
+
+class TestWebSocketTransport:
+    def test_requests_share_one_connection(self):
+        with StandinServer() as srv:
+            ws = WebSocketTransport(f"ws://127.0.0.1:{srv.port}/ws")
+            for i in range(10):
+                assert ws.request("move_cursor", {"x": i, "y": i}, timeout=2) == {"success": True}
+            assert srv.ws_connections == 1
+            ws.close()
+
+    def test_out_of_order_replies_are_matched_by_id(self):
+        with SlowScreenshotServer() as srv:
+            ws = WebSocketTransport(f"ws://127.0.0.1:{srv.port}/ws")
+            done = []
+            t = threading.Thread(target=lambda: done.append(("shot", ws.request("screenshot", {}, 5))))
+            t.start()
+            time.sleep(0.05)
+            res = ws.request("press_key", {"key": "a"}, timeout=5)
+            done.append(("key", res))
+            t.join()
+            assert [name for name, _ in done] == ["key", "shot"]
+            assert "image_data" in done[1][1]
+            ws.close()
+
+    def test_id_less_server_answers_in_order(self):
+        with StandinServer(ws_echo_ids=False) as srv:
+            ws = WebSocketTransport(f"ws://127.0.0.1:{srv.port}/ws")
+            res = ws.request_many([("get_screen_size", {}), ("press_key", {"key": "x"})], timeout=2)
+            assert "size" in res[0] and res[1] == {"success": True}
+            ws.close()
+
+    def test_id_less_timeout_does_not_hand_late_reply_to_next_request(self):
+        with StandinServer(ws_echo_ids=False, latency=0.3) as srv:
+            ws = WebSocketTransport(f"ws://127.0.0.1:{srv.port}/ws")
+            with pytest.raises(TimeoutError):
+                ws.request("screenshot", {}, timeout=0.1)
+            # the screenshot reply arrives before this one; it must not be taken for it
+            assert ws.request("left_click", {"x": 1, "y": 1}, timeout=2) == {"success": True}
+            assert ws.connects == 2
+            ws.close()
+
+    def test_reconnects_after_drop(self):
+        with StandinServer() as srv:
+            ws = WebSocketTransport(f"ws://127.0.0.1:{srv.port}/ws")
+            ws.request("press_key", {"key": "a"}, timeout=2)
+            srv.drop_websockets()
+            t0 = time.time()
+            while ws.connected and time.time() - t0 < 2:
+                time.sleep(0.01)
+            assert ws.request("press_key", {"key": "b"}, timeout=2) == {"success": True}
+            assert ws.connects == 2
+            ws.close()
+
+    def test_heartbeat_timeout_drops_dead_connection(self):
+        with StandinServer(ws_answer_pings=False) as srv:
+            ws = WebSocketTransport(f"ws://127.0.0.1:{srv.port}/ws",
+                                    heartbeat_interval=0.05, heartbeat_timeout=0.2)
+            ws.request("press_key", {"key": "a"}, timeout=2)
+            time.sleep(0.5)
+            assert srv.ws_pings >= 1
+            assert not ws.connected
+            ws.request("press_key", {"key": "b"}, timeout=2)
+            assert ws.connects == 2
+            ws.close()
+
+    def test_upgrade_refused(self):
+        with StandinServer(websocket=False) as srv:
+            ws = WebSocketTransport(f"ws://127.0.0.1:{srv.port}/ws")
+            with pytest.raises(WebSocketUnsupported):
+                ws.request("press_key", {"key": "a"}, timeout=2)
+
+
+# ─── Sandbox integration ─────────────────────────────────────────────
+
+class TestSandboxWebSocket:
+    def test_sandbox_over_websocket(self):
+        with StandinServer(screen_size=(120, 80)) as srv:
+            sb = Sandbox(srv.cfg(SANDBOX_TRANSPORT="ws"))
+            assert sb.screenshot().size == (120, 80)
+            with sb.batch() as b:
+                sb.mouse_move_norm(0.5, 0.5)
+                sb.mouse_down(1)
+            assert len(b.results) == 2
+            assert srv.connections == 1 and srv.ws_connections == 1
+            sb.close()
+
+    def test_ready_without_status_endpoint(self):
+        with StandinServer(status_endpoint=False, latency=0.05) as srv:
+            sb = Sandbox(srv.cfg(SANDBOX_TRANSPORT="ws"))
+            sb._wait_api_ready(2.0)  # /cmd probe over the WebSocket with a (connect, read) timeout
+            assert ("get_screen_size", {}) in srv.calls and srv.ws_connections == 1
+            sb.close()
+
+    def test_falls_back_to_http_without_ws_endpoint(self):
+        with StandinServer(websocket=False) as srv:
+            sb = Sandbox(srv.cfg(SANDBOX_TRANSPORT="ws"))
+            sb.press_key("a")
+            sb.press_key("b")
+            assert sb._ws is None
+            assert [c for c, _ in srv.calls] == ["press_key", "press_key"]
+            sb.close()